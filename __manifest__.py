@@ -2,7 +2,7 @@
 
 {
     "name": "DEHU Notifications",
-    "version": "1.0.0",
+    "version": "1.0.1",
     "category": "Government",
     "summary": "Recibe y almacena notificaciones de DEHU",
     "description": """
@@ -23,6 +23,9 @@
         "data/dehu_data.xml",
         "views/dehu_notification_views.xml",
         "views/dehu_configuration_views.xml",
+        "views/dehu_webhook_batch_views.xml",
+        "views/dehu_sync_run_views.xml",
+        "views/dehu_receipt_export_views.xml",
     ],
     "installable": True,
     "application": True,
@@ -1,11 +1,17 @@
 """Controladores para la gestión de notificaciones DEHú vía webhooks."""
 
+import hmac
 import json
 import logging
+import tempfile
+import zipfile
 
-from dateutil import parser as date_parser
-from odoo import fields, http
+from odoo import http
 from odoo.http import request
+from werkzeug.wsgi import wrap_file
+
+from ..models.dehu_operation_stat import METRICS_FLUSH_INTERVAL
+from ..models.dehu_sync_run import render_metrics, track
 
 _logger = logging.getLogger(__name__)
 
@@ -13,72 +19,163 @@ _logger = logging.getLogger(__name__)
 class DehuController(http.Controller):
     """Controlador para manejar webhooks de DEHú."""
 
-    @http.route("/dehu/notification/update", type="json", auth="none", methods=["POST"])
+    @http.route(
+        "/dehu/notification/update",
+        type="http",
+        auth="none",
+        methods=["POST"],
+        csrf=False,
+    )
     def notification_update(self, **kwargs):
         """Endpoint para recibir actualizaciones de DEHú (webhook).
 
+        Recibe un cuerpo JSON ``{"notifications": [...]}`` y responde con el
+        estado HTTP real: 202 si el lote se encola, 200 si la entrega ya se
+        había recibido, 400 si el contenido no es válido y 500 si no se ha
+        podido encolar, en cuyo caso el emisor debe reintentar.
+
         Args:
             **kwargs: Parámetros de la petición
 
         Returns:
-            dict: Respuesta con el estado del procesamiento
+            Response: Respuesta JSON con el estado del procesamiento
+        """
+        with track("webhook"):
+            result, status = self._notification_update()
+        request.env["dehu.operation.stat"].sudo()._flush_metrics(METRICS_FLUSH_INTERVAL)
+        return request.make_json_response(result, status=status)
+
+    def _notification_update(self):
+        """Valida y encola el lote recibido.
+
+        Returns:
+            tuple: (cuerpo de la respuesta, estado HTTP)
         """
         try:
-            # Compatibilidad: obtener JSON del cuerpo
-            if hasattr(request, "jsonrequest"):
-                data = request.jsonrequest
-            else:
-                data = json.loads(request.httprequest.get_data().decode("utf-8"))
-            notifications = data.get("notifications", [])
-            notification_model = request.env["dehu.notification"].sudo()
-            for notif_data in notifications:
-                # Adaptar fecha ISO a formato Odoo
-                fecha = notif_data.get("fechaPuestaDisposicion")
-                if fecha:
-                    try:
-                        # Soporta ISO 8601 y zonas horarias
-                        fecha_odoo = fields.Datetime.to_string(date_parser.parse(fecha))
-                    except Exception:
-                        fecha_odoo = False
-                else:
-                    fecha_odoo = False
-
-                notification = notification_model.search(
-                    [
-                        ("dehu_id", "=", notif_data.get("identificador")),
-                        ("origin_code", "=", notif_data.get("codigoOrigen")),
-                    ],
-                    limit=1,
-                )
-                if notification:
-                    # Actualizar notificación existente
-                    notification.write(
-                        {
-                            "status": notif_data.get("estado", "pending"),
-                            "available_date": fecha_odoo,
-                        }
-                    )
-                else:
-                    # Crear nueva notificación
-                    organismo_emisor = notif_data.get("organismoEmisor", {})
-                    titular = notif_data.get("titular", {})
-
-                    notification_model.create(
-                        {
-                            "dehu_id": notif_data.get("identificador"),
-                            "origin_code": notif_data.get("codigoOrigen"),
-                            "subject": notif_data.get("concepto"),
-                            "description": notif_data.get("descripcion"),
-                            "notification_type": notif_data.get("tipoEnvio"),
-                            "available_date": fecha_odoo,
-                            "issuer_entity": organismo_emisor.get("nombreOrganismo"),
-                            "holder_nif": titular.get("nifTitular"),
-                            "holder_name": titular.get("nombreTitular"),
-                            "status": "pending",
-                        }
-                    )
+            data = json.loads(request.httprequest.get_data().decode("utf-8"))
+        except ValueError:
+            return {"error": "Invalid JSON"}, 400
+        try:
+            notifications = (
+                data.get("notifications", []) if isinstance(data, dict) else None
+            )
+            if not isinstance(notifications, list) or not all(
+                isinstance(notif_data, dict) and notif_data.get("identificador")
+                for notif_data in notifications
+            ):
+                return {"error": "Invalid payload"}, 400
 
-            return {"status": "success", "message": "Notificaciones procesadas"}
+            # El lote se aplica en segundo plano (ver dehu.webhook.batch)
+            delivery_id = request.httprequest.headers.get("X-Delivery-Id") or data.get(
+                "deliveryId"
+            )
+            batch = (
+                request.env["dehu.webhook.batch"]
+                .sudo()
+                ._enqueue(notifications, delivery_id=delivery_id)
+            )
+            if not batch:
+                return {"status": "duplicate"}, 200
+            return {
+                "status": "accepted",
+                "batch_id": batch.id,
+                "message": "Notificaciones encoladas",
+            }, 202
         except Exception as exc:
             _logger.error("Error processing notification update: %s", str(exc))
-            return {"error": str(exc)}
+            return {"error": str(exc)}, 500
+
+    @http.route("/dehu/metrics", type="http", auth="none", methods=["GET"])
+    def metrics(self, **kwargs):
+        """Expone las métricas de DEHú en formato Prometheus.
+
+        Los contadores se leen de ``dehu.operation.stat``, donde vuelca sus
+        métricas cada worker, de modo que incluyen también las llamadas
+        hechas desde las tareas programadas.
+
+        El acceso requiere el token del parámetro del sistema
+        ``dehu_notifications.metrics_token``, enviado como cabecera
+        ``Authorization: Bearer <token>``; sin token configurado el endpoint
+        está desactivado.
+
+        Returns:
+            Response: Métricas en texto plano
+        """
+        env = request.env(su=True)
+        token = env["ir.config_parameter"].get_param("dehu_notifications.metrics_token")
+        authorization = request.httprequest.headers.get("Authorization", "")
+        if not token or not hmac.compare_digest(authorization, f"Bearer {token}"):
+            return request.not_found()
+        stat_model = env["dehu.operation.stat"]
+        stat_model._flush_metrics()
+        body = render_metrics(
+            stat_model._get_samples(), env["dehu.sync.run"]._get_queue_depths()
+        )
+        return request.make_response(
+            body, headers=[("Content-Type", "text/plain; version=0.0.4")]
+        )
+
+    @http.route(
+        "/dehu/receipts/zip/<int:export_id>",
+        type="http",
+        auth="user",
+        methods=["GET"],
+    )
+    def receipts_zip(self, export_id, **kwargs):
+        """Descarga en un ZIP los acuses PDF de varias notificaciones.
+
+        Las notificaciones se leen de la selección guardada en el asistente
+        ``dehu.receipt.export``, que ya ha obtenido de DEHú en segundo plano
+        los acuses que faltaban; la petición solo incluye los ya guardados.
+        El ZIP se escribe en un fichero temporal copiando cada acuse desde el
+        filestore por bloques y se envía en streaming, de modo que nunca se
+        carga el archivo completo en memoria.
+
+        Args:
+            export_id: Identificador del asistente de descarga
+
+        Returns:
+            Response: Archivo ZIP con los acuses
+        """
+        export = request.env["dehu.receipt.export"].browse(export_id).exists()
+        if not export or export.create_uid != request.env.user:
+            return request.not_found()
+        notifications = export.notification_ids
+        notifications.check_access("read")
+
+        attachment_model = request.env["ir.attachment"].sudo()
+        receipts = attachment_model.search(
+            [
+                ("res_model", "=", "dehu.notification"),
+                ("res_field", "=", "receipt_content"),
+                ("res_id", "in", notifications.ids),
+            ]
+        )
+        names = {
+            notification.id: f"{notification.notification_key}_"
+            f"{notification.receipt_name or 'acuse.pdf'}"
+            for notification in notifications
+        }
+        archive_file = tempfile.TemporaryFile()
+        with zipfile.ZipFile(archive_file, "w", zipfile.ZIP_DEFLATED) as archive:
+            for receipt in receipts:
+                if receipt.store_fname:
+                    archive.write(
+                        attachment_model._full_path(receipt.store_fname),
+                        names[receipt.res_id],
+                    )
+                else:
+                    archive.writestr(names[receipt.res_id], receipt.raw)
+        size = archive_file.tell()
+        archive_file.seek(0)
+
+        response = request.make_response(
+            wrap_file(request.httprequest.environ, archive_file),
+            headers=[
+                ("Content-Type", "application/zip"),
+                ("Content-Length", str(size)),
+                ("Content-Disposition", 'attachment; filename="acuses_dehu.zip"'),
+            ],
+        )
+        response.direct_passthrough = True
+        return response
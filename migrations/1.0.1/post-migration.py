@@ -0,0 +1,57 @@
+"""Calcula el hash SHA-256 de los documentos y anexos ya descargados."""
+
+import hashlib
+import logging
+
+from odoo import SUPERUSER_ID, api
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _backfill_hashes(env, model_name, field_name, hash_vals):
+    """Rellena el hash de los registros cuyo ``ir.attachment`` tiene contenido."""
+    attachment_model = env["ir.attachment"]
+    domain = [
+        ("res_model", "=", model_name),
+        ("res_field", "=", field_name),
+        ("res_id", "!=", False),
+    ]
+    offset = 0
+    while True:
+        attachments = attachment_model.search(
+            domain, order="id", limit=BATCH_SIZE, offset=offset
+        )
+        if not attachments:
+            break
+        for attachment in attachments:
+            raw = attachment.raw
+            # Un adjunto sin contenido no debe respaldar un hash
+            if not raw:
+                continue
+            record = env[model_name].browse(attachment.res_id).exists()
+            if record:
+                record.write(hash_vals(hashlib.sha256(raw).hexdigest()))
+        attachments.invalidate_recordset(["raw"])
+        offset += BATCH_SIZE
+    _logger.info("DEHú: hashes computed for %s.%s", model_name, field_name)
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    _backfill_hashes(
+        env,
+        "dehu.notification",
+        "document_content",
+        lambda digest: {
+            "document_hash": digest,
+            "document_hash_algorithm": "SHA-256",
+        },
+    )
+    _backfill_hashes(
+        env,
+        "dehu.notification.attachment",
+        "content",
+        lambda digest: {"content_hash": digest},
+    )
@@ -1,4 +1,10 @@
 from . import dehu_notification
 from . import dehu_configuration
+from . import dehu_poll_request
 from . import dehu_notification_attachment
 from . import dehu_synchronizer
+from . import dehu_webhook_batch
+from . import dehu_sync_run
+from . import dehu_operation_stat
+from . import dehu_archive_blob
+from . import dehu_receipt_export
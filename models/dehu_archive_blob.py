@@ -0,0 +1,170 @@
+"""Modelo para el almacenamiento en frío de contenidos DEHú archivados."""
+
+import hashlib
+import logging
+import zlib
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+from .dehu_transport import SpooledPayload
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Niveles rápidos: los lotes de archivado mantienen bloqueadas sus filas
+# mientras comprimen, y los PDF apenas ganan con niveles más altos
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+
+def _compress(raw):
+    """Comprime un contenido con zstd si está disponible, o con zlib.
+
+    Returns:
+        tuple: (códec, contenido comprimido)
+    """
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required to restore this archive")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class DehuArchiveBlob(models.Model):
+    """Modelo para guardar comprimidos los contenidos de notificaciones antiguas.
+
+    Cada registro sustituye al ``ir.attachment`` de un campo binario de una
+    notificación o de un anexo, y permite restaurarlo bajo demanda.
+    """
+
+    _name = "dehu.archive.blob"
+    _description = _("DEHU Archived Content")
+
+    res_model = fields.Char(_("Model"), required=True, readonly=True)
+    res_field = fields.Char(_("Field"), required=True, readonly=True)
+    res_id = fields.Integer(_("Record ID"), required=True, readonly=True)
+    notification_id = fields.Many2one(
+        "dehu.notification",
+        string=_("Notification"),
+        required=True,
+        ondelete="cascade",
+        readonly=True,
+        index=True,
+    )
+    codec = fields.Char(_("Codec"), required=True, readonly=True)
+    payload = fields.Binary(_("Compressed Content"), readonly=True, attachment=True)
+    mimetype = fields.Char(_("MIME Type"), readonly=True)
+    original_size = fields.Integer(_("Original Size"), readonly=True)
+    compressed_size = fields.Integer(_("Compressed Size"), readonly=True)
+    sha256 = fields.Char(_("SHA-256"), readonly=True)
+
+    @api.model
+    def _archive_field(self, records, field_name, notification_of):
+        """Archiva comprimido el campo binario de los registros indicados.
+
+        Args:
+            records: Registros propietarios del campo
+            field_name: Nombre del campo binario
+            notification_of: Función que devuelve la notificación de un registro
+
+        Returns:
+            int: Bytes liberados del almacenamiento principal
+        """
+        synchronizer = self.env["dehu.synchronizer"]
+        attachments = (
+            self.env["ir.attachment"]
+            .sudo()
+            .search(
+                [
+                    ("res_model", "=", records._name),
+                    ("res_field", "=", field_name),
+                    ("res_id", "in", records.ids),
+                ]
+            )
+        )
+        freed = 0
+        for attachment in attachments:
+            raw = attachment.raw
+            if not raw:
+                continue
+            codec, compressed = _compress(raw)
+            record = records.browse(attachment.res_id)
+            blob = self.create(
+                {
+                    "res_model": records._name,
+                    "res_field": field_name,
+                    "res_id": record.id,
+                    "notification_id": notification_of(record).id,
+                    "codec": codec,
+                    "mimetype": attachment.mimetype,
+                    "original_size": len(raw),
+                    "compressed_size": len(compressed),
+                    "sha256": hashlib.sha256(raw).hexdigest(),
+                }
+            )
+            if not synchronizer._store_payload(
+                blob, "payload", SpooledPayload(compressed)
+            ):
+                # Sin copia comprimida no se vacía el original
+                _logger.error(
+                    "DEHú: could not archive %s.%s of record %s",
+                    records._name,
+                    field_name,
+                    record.id,
+                )
+                blob.unlink()
+                continue
+            synchronizer._store_payload(record, field_name, None)
+            freed += len(raw)
+        return freed
+
+    def _restore(self):
+        """Restaura los contenidos archivados en sus campos originales.
+
+        Raises:
+            UserError: Si un contenido restaurado no coincide con el archivado
+        """
+        synchronizer = self.env["dehu.synchronizer"]
+        for blob in self:
+            attachment = (
+                self.env["ir.attachment"]
+                .sudo()
+                .search(
+                    [
+                        ("res_model", "=", self._name),
+                        ("res_field", "=", "payload"),
+                        ("res_id", "=", blob.id),
+                    ],
+                    limit=1,
+                )
+            )
+            raw = _decompress(blob.codec, attachment.raw) if attachment else b""
+            if hashlib.sha256(raw).hexdigest() != blob.sha256:
+                raise UserError(
+                    _("The archived content of %s.%s %s is corrupted.")
+                    % (blob.res_model, blob.res_field, blob.res_id)
+                )
+            record = self.env[blob.res_model].browse(blob.res_id).exists()
+            if (
+                record
+                and raw
+                and not synchronizer._store_payload(
+                    record, blob.res_field, SpooledPayload(raw), blob.mimetype
+                )
+            ):
+                raise UserError(
+                    _("The archived content of %s.%s %s could not be restored.")
+                    % (blob.res_model, blob.res_field, blob.res_id)
+                )
+        self.unlink()
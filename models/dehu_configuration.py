@@ -1,9 +1,12 @@
 """Modelo para la configuración de conexión con DEHú."""
 
 import logging
+from datetime import timedelta
 
 from odoo import _, api, fields, models
 
+from .dehu_notification import normalize_nif
+
 _logger = logging.getLogger(__name__)
 
 
@@ -22,12 +25,34 @@ class DehuConfiguration(models.Model):
         [
             ("production", _("Production")),
             ("sandbox", _("Sandbox")),
+            ("custom", _("Custom")),
         ],
         string=_("Environment"),
         default="sandbox",
     )
     wsdl_url = fields.Char(_("WSDL URL"), compute="_compute_wsdl_url", store=True)
+    custom_wsdl_url = fields.Char(
+        _("Custom WSDL URL"),
+        help=_(
+            "WSDL of a LEMA-compatible service, e.g. a local stand-in used "
+            "for testing or benchmarking."
+        ),
+    )
     api_key = fields.Char(_("API Key"), required=True)
+    transport = fields.Selection(
+        [
+            ("zeep", _("zeep (WSDL)")),
+            ("lxml", _("Lightweight (lxml)")),
+        ],
+        string=_("SOAP Transport"),
+        default="zeep",
+        required=True,
+        help=_(
+            "zeep builds the client from the WSDL. The lightweight transport "
+            "uses prebuilt request templates for the LEMA operations used by "
+            "this module and does not need zeep to be installed."
+        ),
+    )
     certificate = fields.Binary(_("X.509 Certificate"))
     certificate_filename = fields.Char(_("Certificate Name"))
     company_id = fields.Many2one(
@@ -35,11 +60,170 @@ class DehuConfiguration(models.Model):
     )
     active = fields.Boolean(_("Active"), default=True)
 
-    @api.depends("environment")
+    # Sincronización incremental
+    last_sync_date = fields.Datetime(
+        _("Last Synchronization"),
+        readonly=True,
+        help=_("Last 'fechaHasta' successfully queried in DEHú."),
+    )
+    sync_overlap_minutes = fields.Integer(
+        _("Sync Overlap (minutes)"),
+        default=15,
+        help=_("Margin subtracted from the last synchronization date on each query."),
+    )
+    initial_sync_days = fields.Integer(
+        _("Initial Sync Window (days)"),
+        default=30,
+        help=_("Days queried on the first or on a full synchronization."),
+    )
+    last_sync_duration = fields.Float(_("Last Sync Duration (s)"), readonly=True)
+    last_sync_envelopes_seen = fields.Integer(_("Envelopes Seen"), readonly=True)
+    last_sync_envelopes_created = fields.Integer(_("Envelopes Created"), readonly=True)
+    last_sync_error = fields.Text(_("Last Sync Error"), readonly=True)
+    poll_min_interval = fields.Integer(
+        _("Min. Polling Interval (minutes)"),
+        default=5,
+        help=_("Polling interval while new envelopes keep arriving."),
+    )
+    poll_max_interval = fields.Integer(
+        _("Max. Polling Interval (minutes)"),
+        default=60,
+        help=_("Polling interval reached after consecutive queries without news."),
+    )
+    idle_polls = fields.Integer(_("Queries Without News"), readonly=True)
+    next_poll_date = fields.Datetime(_("Next Query"), readonly=True)
+    sync_window_hours = fields.Integer(
+        _("Sync Window (hours)"),
+        default=24,
+        help=_("Maximum time range requested to DEHú in a single query."),
+    )
+    sync_window_max_envelopes = fields.Integer(
+        _("Max. Envelopes per Window"),
+        default=500,
+        help=_(
+            "When a query returns this many envelopes the window is split in "
+            "halves. Zero disables the limit."
+        ),
+    )
+    retention_months = fields.Integer(
+        _("Retention (months)"),
+        default=0,
+        help=_(
+            "Documents of processed notifications older than this are moved "
+            "to compressed archive storage. Zero disables archiving."
+        ),
+    )
+    connect_timeout = fields.Integer(
+        _("Connect Timeout (s)"),
+        default=10,
+        help=_("Maximum time to establish the connection with DEHú."),
+    )
+    read_timeout = fields.Integer(
+        _("Read Timeout (s)"),
+        default=120,
+        help=_("Maximum time waiting for data from DEHú on each SOAP call."),
+    )
+    attachment_download_workers = fields.Integer(
+        _("Parallel Attachment Downloads"),
+        default=4,
+        help=_("Maximum number of annexes downloaded concurrently."),
+    )
+    process_batch_size = fields.Integer(
+        _("Processing Batch Size"),
+        default=50,
+        help=_("Queued notifications accepted and committed per batch."),
+    )
+    process_workers = fields.Integer(
+        _("Parallel Acceptances"),
+        default=4,
+        help=_("Maximum number of queued notifications accepted concurrently."),
+    )
+    auto_accept = fields.Boolean(
+        _("Automatic Acceptance"),
+        help=_(
+            "Accept and download pending notifications automatically, those "
+            "closest to their acceptance deadline first."
+        ),
+    )
+    auto_accept_time_budget = fields.Integer(
+        _("Acceptance Time Budget (s)"),
+        default=240,
+        help=_(
+            "Maximum time spent accepting notifications on each run. The "
+            "remaining ones are accepted on the next run. Zero disables the limit."
+        ),
+    )
+    expiring_soon_count = fields.Integer(
+        _("Expiring Soon"), compute="_compute_expiring_soon_count"
+    )
+
+    @api.depends("environment", "custom_wsdl_url")
     def _compute_wsdl_url(self):
         """Calcula la URL del WSDL según el entorno configurado."""
         for record in self:
-            if record.environment == "production":
+            if record.environment == "custom":
+                record.wsdl_url = record.custom_wsdl_url
+            elif record.environment == "production":
                 record.wsdl_url = "https://gd-dehuws.redsara.es/ws/v2/lema?wsdl"
             else:
                 record.wsdl_url = "https://se-gd-dehuws.redsara.es/ws/v2/lema?wsdl"
+
+    def _compute_expiring_soon_count(self):
+        """Obtiene los vencimientos próximos con una consulta agregada."""
+        counts = self.env["dehu.notification"]._get_expiring_soon_counts()
+        for record in self:
+            record.expiring_soon_count = counts.get(record, 0)
+
+    def _get_poll_interval(self, idle_polls):
+        """Calcula la espera hasta la siguiente consulta.
+
+        El intervalo parte del mínimo y se duplica con cada consulta sin
+        envíos nuevos, hasta el máximo configurado.
+        """
+        self.ensure_one()
+        minimum = max(self.poll_min_interval, 1)
+        maximum = max(self.poll_max_interval, minimum)
+        return timedelta(minutes=min(minimum * 2 ** min(idle_polls, 16), maximum))
+
+    @api.model
+    def _request_poll_for_holders(self, holder_nifs):
+        """Adelanta la consulta de las configuraciones de los titulares dados.
+
+        Se usa al recibir avisos por webhook para que la siguiente ejecución
+        de la tarea consulte de inmediato solo a los titulares afectados. La
+        petición se inserta en ``dehu.poll.request`` sin escribir en la
+        configuración, que actualiza la sincronización en curso.
+        """
+        nifs = {normalize_nif(nif) for nif in holder_nifs if nif}
+        configs = self.search([("active", "=", True)]).filtered(
+            lambda c: normalize_nif(c.company_id.vat) in nifs
+        )
+        if configs:
+            self.env["dehu.poll.request"].sudo().create(
+                [{"configuration_id": config.id} for config in configs]
+            )
+            self.env.ref(
+                "dehu_notifications.ir_cron_fetch_dehu_notifications"
+            )._trigger()
+        return configs
+
+    def action_view_expiring_soon(self):
+        """Abre las notificaciones pendientes cuyo plazo vence pronto."""
+        self.ensure_one()
+        action = self.env["ir.actions.act_window"]._for_xml_id(
+            "dehu_notifications.action_dehu_notifications"
+        )
+        action["domain"] = [("configuration_id", "=", self.id)]
+        action["context"] = {"search_default_expiring_soon": 1}
+        return action
+
+    def action_full_resync(self):
+        """Programa una nueva consulta de la ventana inicial completa en DEHú.
+
+        Se borra la marca de sincronización y se lanza la tarea de consulta,
+        que recorre la ventana en segundo plano y guarda el informe de la
+        ejecución como cualquier otra sincronización.
+        """
+        self.write({"last_sync_date": False, "next_poll_date": False})
+        self.env.ref("dehu_notifications.ir_cron_fetch_dehu_notifications")._trigger()
+        return True
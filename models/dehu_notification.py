@@ -1,11 +1,87 @@
 """Modelo para la gestión de notificaciones DEHú."""
 
+import io
 import logging
+import re
+import threading
+from collections import defaultdict
+from datetime import timezone
 
-from odoo import _, api, fields, models
+from dateutil import parser as date_parser
+from dateutil.relativedelta import relativedelta
+from odoo import Command, _, api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index, drop_index
 
 _logger = logging.getLogger(__name__)
 
+try:
+    from pypdf import PdfReader
+except ImportError:
+    try:
+        from PyPDF2 import PdfReader
+    except ImportError:
+        PdfReader = None
+        _logger.info("pypdf is not installed: DEHU PDF contents won't be indexed")
+
+# Índice de texto completo sobre asunto, descripción y contenido extraído
+FULLTEXT_CONFIG = "spanish"
+FULLTEXT_DOCUMENT = (
+    "to_tsvector('spanish'::regconfig, coalesce(subject, '') || ' ' || "
+    "coalesce(description, '') || ' ' || coalesce(content_text, ''))"
+)
+FULLTEXT_BATCH_SIZE = 50
+ARCHIVE_BATCH_SIZE = 100
+PARTNER_MATCH_BATCH_SIZE = 1000
+# Mapa NIF -> contacto por base de datos, con la firma de res.partner con la
+# que se calculó para invalidarlo cuando cambian los NIF
+_nif_partner_cache = {}
+_nif_partner_cache_lock = threading.Lock()
+MAX_CONTENT_TEXT = 200000
+# Días naturales para acceder a una notificación antes de que se entienda
+# rechazada (art. 43.2 de la Ley 39/2015); las comunicaciones no caducan
+ACCEPTANCE_WINDOW_DAYS = {"2": 10}
+EXPIRING_SOON_DAYS = 3
+
+# Orden de los estados: una actualización nunca hace retroceder el estado
+STATUS_RANK = {
+    "pending": 0,
+    "accepted": 1,
+    "rejected": 1,
+    "expired": 1,
+    "read": 2,
+}
+
+
+def _extract_text(raw, mimetype):
+    """Extrae el texto plano de un contenido PDF o de texto."""
+    if not raw:
+        return ""
+    if mimetype == "application/pdf":
+        if PdfReader is None:
+            return ""
+        reader = PdfReader(io.BytesIO(raw))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    if mimetype and (mimetype.startswith("text/") or mimetype.endswith("xml")):
+        return raw.decode("utf-8", errors="ignore")
+    return ""
+
+
+def normalize_nif(value):
+    """Normaliza un NIF: mayúsculas, sin separadores ni prefijo de país ES."""
+    nif = re.sub(r"[^0-9A-Z]", "", (value or "").upper())
+    if len(nif) > 9 and nif.startswith("ES"):
+        nif = nif[2:]
+    return nif
+
+
+def to_utc_naive(value):
+    """Convierte una fecha con zona horaria a UTC sin zona, como la guarda Odoo."""
+    if value and value.tzinfo:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 
 class DehuNotification(models.Model):
     """Modelo para gestionar notificaciones de DEHú.
@@ -17,6 +93,13 @@ class DehuNotification(models.Model):
     _name = "dehu.notification"
     _description = _("DEHU Notification")
     _order = "available_date desc"
+    _sql_constraints = [
+        (
+            "dehu_key_unique",
+            "unique(dehu_id, origin_code)",
+            "A DEHU notification with this identifier and origin code already exists.",
+        ),
+    ]
 
     # Campos de identificación
     dehu_id = fields.Char(_("DEHU ID"), readonly=True)
@@ -25,6 +108,10 @@ class DehuNotification(models.Model):
         _("Unique Key"), compute="_compute_notification_key", store=True
     )
 
+    configuration_id = fields.Many2one(
+        "dehu.configuration", string=_("Configuration"), readonly=True, index=True
+    )
+
     # Campos de metadatos
     subject = fields.Char(_("Subject"), readonly=True)
     description = fields.Text(_("Description"), readonly=True)
@@ -36,7 +123,13 @@ class DehuNotification(models.Model):
         string=_("Type"),
         readonly=True,
     )
-    available_date = fields.Datetime(_("Available Date"), readonly=True)
+    available_date = fields.Datetime(_("Available Date"), readonly=True, index=True)
+    acceptance_deadline = fields.Datetime(
+        _("Acceptance Deadline"),
+        compute="_compute_acceptance_deadline",
+        store=True,
+        help=_("After this date the notification is deemed rejected if not accessed."),
+    )
     status = fields.Selection(
         [
             ("pending", _("Pending")),
@@ -60,15 +153,18 @@ class DehuNotification(models.Model):
 
     # Campos de documentos
     document_name = fields.Char(_("Document Name"))
-    document_content = fields.Binary(_("Document"), readonly=True)
+    document_content = fields.Binary(_("Document"), readonly=True, attachment=True)
     document_mimetype = fields.Char(_("Document MIME Type"))
     document_hash = fields.Char(_("Document Hash"))
     document_hash_algorithm = fields.Char(_("Hash Algorithm"))
-    document_metadata = fields.Text(_("Document Metadata"))
+    document_metadata = fields.Text(_("Document Metadata"), prefetch=False)
 
     # Campos de anexos
     has_attachments = fields.Boolean(
-        _("Has Attachments"), compute="_compute_has_attachments"
+        _("Has Attachments"), compute="_compute_attachment_count", store=True
+    )
+    attachment_count = fields.Integer(
+        _("Attachment Count"), compute="_compute_attachment_count", store=True
     )
     attachment_ids = fields.One2many(
         "dehu.notification.attachment", "notification_id", string=_("Attachments")
@@ -77,6 +173,50 @@ class DehuNotification(models.Model):
     # Campos de acuse
     receipt_reference = fields.Char(_("PDF Receipt Reference"))
     receipt_csv = fields.Char(_("CSV Receipt"))
+    receipt_name = fields.Char(_("Receipt Name"), readonly=True)
+    receipt_mimetype = fields.Char(_("Receipt MIME Type"), readonly=True)
+    receipt_content = fields.Binary(_("Receipt"), readonly=True, attachment=True)
+    receipt_content_csv = fields.Char(
+        _("Stored Receipt CSV"),
+        readonly=True,
+        copy=False,
+        help=_("CSV of the receipt currently stored, to detect stale copies."),
+    )
+
+    # Campos de búsqueda de texto completo
+    content_text = fields.Text(
+        _("Extracted Text"),
+        readonly=True,
+        prefetch=False,
+        help=_("Text extracted from the document and annexes for searching."),
+    )
+    fulltext_indexed = fields.Boolean(
+        _("Text Extracted"), readonly=True, copy=False, index=True
+    )
+    fulltext = fields.Char(
+        _("Full-Text Search"),
+        compute="_compute_fulltext",
+        search="_search_fulltext",
+    )
+
+    # Campos de archivado
+    storage_tier = fields.Selection(
+        [
+            ("hot", _("Active")),
+            ("cold", _("Archived")),
+        ],
+        string=_("Storage"),
+        default="hot",
+        readonly=True,
+        index=True,
+        copy=False,
+    )
+    archived_date = fields.Datetime(_("Archived On"), readonly=True, copy=False)
+
+    # Campos de procesamiento en bloque
+    processing_queued = fields.Boolean(
+        _("Queued for Processing"), readonly=True, copy=False, index=True
+    )
 
     # Campos de relación con Odoo
     partner_id = fields.Many2one("res.partner", string=_("Related Contact"))
@@ -93,8 +233,507 @@ class DehuNotification(models.Model):
         for record in self:
             record.notification_key = f"{record.dehu_id}-{record.origin_code}"
 
+    @api.depends("available_date", "notification_type")
+    def _compute_acceptance_deadline(self):
+        """Calcula el fin del plazo legal de acceso según el tipo de envío."""
+        for record in self:
+            days = ACCEPTANCE_WINDOW_DAYS.get(record.notification_type)
+            record.acceptance_deadline = (
+                record.available_date + relativedelta(days=days)
+                if days and record.available_date
+                else False
+            )
+
+    @api.model
+    def _get_expiring_soon_counts(self):
+        """Cuenta por configuración las pendientes cuyo plazo vence pronto.
+
+        Usa una única consulta agregada sobre el índice parcial de plazos
+        pendientes en lugar de leer las notificaciones.
+
+        Returns:
+            dict: Configuración -> número de notificaciones
+        """
+        now = fields.Datetime.now()
+        return dict(
+            self._read_group(
+                [
+                    ("status", "=", "pending"),
+                    ("acceptance_deadline", ">=", now),
+                    (
+                        "acceptance_deadline",
+                        "<",
+                        now + relativedelta(days=EXPIRING_SOON_DAYS),
+                    ),
+                ],
+                ["configuration_id"],
+                ["__count"],
+            )
+        )
+
     @api.depends("attachment_ids")
-    def _compute_has_attachments(self):
-        """Determina si la notificación tiene anexos."""
+    def _compute_attachment_count(self):
+        """Cuenta los anexos de las notificaciones con una única consulta."""
+        counts = dict(
+            self.env["dehu.notification.attachment"]._read_group(
+                [("notification_id", "in", self.ids)],
+                ["notification_id"],
+                ["__count"],
+            )
+        )
         for record in self:
-            record.has_attachments = bool(record.attachment_ids)
+            count = counts.get(record, 0) if record.id else len(record.attachment_ids)
+            record.attachment_count = count
+            record.has_attachments = bool(count)
+
+    def _compute_fulltext(self):
+        self.fulltext = False
+
+    def _search_fulltext(self, operator, value):
+        if operator in ("=", "ilike"):
+            negate = False
+        elif operator in ("!=", "not ilike"):
+            negate = True
+        else:
+            raise UserError(
+                _("Operator %s is not supported on the full-text search.") % operator
+            )
+        if not value:
+            # Como con ilike: el texto vacío coincide con todas
+            return [("id", "=" if negate else "!=", False)]
+        # La subconsulta se ejecuta dentro de la búsqueda, sin cargar en
+        # Python los identificadores de todas las coincidencias
+        return [
+            (
+                "id",
+                "not in" if negate else "in",
+                SQL(
+                    """SELECT id FROM dehu_notification
+                        WHERE %(document)s
+                              @@ websearch_to_tsquery(%(config)s::regconfig, %(query)s)""",
+                    document=SQL(FULLTEXT_DOCUMENT),
+                    config=FULLTEXT_CONFIG,
+                    query=value,
+                ),
+            )
+        ]
+
+    @api.model
+    def _search_fulltext_ids(self, query, limit=None):
+        """Busca en el índice de texto completo, ordenando por relevancia.
+
+        Args:
+            query: Consulta en sintaxis de buscador web (comillas, ``or``, ``-``)
+            limit: Número máximo de resultados
+
+        Returns:
+            list: Identificadores ordenados de más a menos relevante
+        """
+        self.env.cr.execute(
+            SQL(
+                """SELECT id FROM dehu_notification,
+                          websearch_to_tsquery(%(config)s::regconfig, %(query)s) q
+                    WHERE %(document)s @@ q
+                 ORDER BY ts_rank(%(document)s, q) DESC, available_date DESC
+                    LIMIT %(limit)s""",
+                config=FULLTEXT_CONFIG,
+                query=query,
+                document=SQL(FULLTEXT_DOCUMENT),
+                limit=limit,
+            )
+        )
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def search_fulltext(self, query, limit=80):
+        """Devuelve las notificaciones que coinciden con la consulta.
+
+        Args:
+            query: Texto a buscar
+            limit: Número máximo de resultados
+
+        Returns:
+            recordset: Notificaciones ordenadas por relevancia
+        """
+        self.check_access("read")
+        ids = self._search_fulltext_ids(query, limit)
+        return self.browse(ids)._filtered_access("read")
+
+    @api.model
+    def _cron_extract_content_text(self):
+        """Extrae el texto de los documentos y anexos descargados.
+
+        Procesa por lotes las notificaciones con documento aún no indexadas;
+        el índice de texto completo se actualiza al guardar cada una.
+        """
+        synchronizer = self.env["dehu.synchronizer"]
+        while True:
+            notifications = self.search(
+                [("fulltext_indexed", "=", False), ("status", "!=", "pending")],
+                limit=FULLTEXT_BATCH_SIZE,
+            )
+            if not notifications:
+                break
+            for notification in notifications:
+                try:
+                    text = notification._extract_content_text()
+                except Exception as e:
+                    _logger.warning(
+                        "Error extracting text from %s: %s",
+                        notification.notification_key,
+                        e,
+                    )
+                    text = False
+                notification.write({"content_text": text, "fulltext_indexed": True})
+            synchronizer._commit_batch()
+        return True
+
+    def _extract_content_text(self):
+        """Extrae el texto del documento principal y de los anexos."""
+        self.ensure_one()
+        attachment_model = self.env["ir.attachment"].sudo()
+        sources = attachment_model.search(
+            [
+                ("res_model", "=", self._name),
+                ("res_field", "=", "document_content"),
+                ("res_id", "=", self.id),
+            ]
+        ) | attachment_model.search(
+            [
+                ("res_model", "=", "dehu.notification.attachment"),
+                ("res_field", "=", "content"),
+                ("res_id", "in", self.attachment_ids.ids),
+            ]
+        )
+        texts = []
+        length = 0
+        for source in sources:
+            text = _extract_text(source.raw, source.mimetype)
+            if text:
+                texts.append(text)
+                length += len(text)
+            if length >= MAX_CONTENT_TEXT:
+                break
+        return "\n".join(texts)[:MAX_CONTENT_TEXT] or False
+
+    def _archive_contents(self):
+        """Pasa los documentos y anexos a almacenamiento frío comprimido.
+
+        Se conservan los metadatos, los hashes y el texto extraído, por lo que
+        las notificaciones archivadas siguen siendo localizables.
+
+        Returns:
+            int: Bytes liberados del almacenamiento principal
+        """
+        blob_model = self.env["dehu.archive.blob"]
+        freed = blob_model._archive_field(
+            self, "document_content", lambda notification: notification
+        )
+        freed += blob_model._archive_field(
+            self.attachment_ids,
+            "content",
+            lambda attachment: attachment.notification_id,
+        )
+        self.write({"storage_tier": "cold", "archived_date": fields.Datetime.now()})
+        return freed
+
+    @api.model
+    def _get_nif_partner_map(self):
+        """Devuelve el mapa de NIF normalizado a contacto comercial.
+
+        El mapa se calcula una vez y se reutiliza mientras no cambie la firma
+        de los contactos con NIF (número y última modificación), que se
+        obtiene con una única consulta agregada.
+
+        Returns:
+            dict: ``{nif: id del contacto}``
+        """
+        self.env["res.partner"].flush_model(["vat", "active", "write_date"])
+        self.env.cr.execute(
+            """SELECT count(*), max(write_date) FROM res_partner
+                WHERE vat IS NOT NULL AND active"""
+        )
+        signature = self.env.cr.fetchone()
+        dbname = self.env.cr.dbname
+        with _nif_partner_cache_lock:
+            cached = _nif_partner_cache.get(dbname)
+            if cached and cached[0] == signature:
+                return cached[1]
+
+        nif_map = {}
+        partners = (
+            self.env["res.partner"]
+            .sudo()
+            .search_read(
+                [("vat", "!=", False)], ["vat", "commercial_partner_id"], order="id"
+            )
+        )
+        for partner in partners:
+            nif = normalize_nif(partner["vat"])
+            if nif and nif not in nif_map:
+                nif_map[nif] = partner["commercial_partner_id"][0]
+        with _nif_partner_cache_lock:
+            _nif_partner_cache[dbname] = (signature, nif_map)
+        return nif_map
+
+    def _match_partners(self):
+        """Vincula las notificaciones sin contacto con el contacto de su NIF.
+
+        Se usa el NIF del titular o, en su defecto, el del receptor, y las
+        notificaciones se asignan con una escritura por contacto.
+
+        Returns:
+            int: Número de notificaciones vinculadas
+        """
+        nif_map = self._get_nif_partner_map()
+        by_partner = defaultdict(list)
+        for notification in self.filtered(lambda n: not n.partner_id):
+            partner_id = nif_map.get(normalize_nif(notification.holder_nif)) or (
+                nif_map.get(normalize_nif(notification.recipient_nif))
+            )
+            if partner_id:
+                by_partner[partner_id].append(notification.id)
+        for partner_id, ids in by_partner.items():
+            self.browse(ids).write(
+                {
+                    "partner_id": partner_id,
+                    "related_document": f"res.partner,{partner_id}",
+                }
+            )
+        return sum(len(ids) for ids in by_partner.values())
+
+    @api.model
+    def _cron_match_partners(self):
+        """Vincula por lotes con su contacto las notificaciones existentes."""
+        synchronizer = self.env["dehu.synchronizer"]
+        last_id = 0
+        matched = 0
+        while True:
+            batch = self.search(
+                [("partner_id", "=", False), ("id", ">", last_id)],
+                order="id",
+                limit=PARTNER_MATCH_BATCH_SIZE,
+            )
+            if not batch:
+                break
+            matched += batch._match_partners()
+            last_id = batch[-1].id
+            synchronizer._commit_batch()
+        _logger.info("DEHú: %s notifications linked to contacts", matched)
+        return True
+
+    def action_match_partners(self):
+        """Vincula las notificaciones seleccionadas con su contacto."""
+        self._match_partners()
+        return True
+
+    def action_download_receipts(self):
+        """Descarga en un ZIP los acuses de las notificaciones seleccionadas.
+
+        Si falta algún acuse, se muestra el asistente mientras se obtienen
+        en segundo plano.
+        """
+        self.check_access("read")
+        export = self.env["dehu.receipt.export"].create(
+            {"notification_ids": [Command.set(self.ids)]}
+        )
+        if export.state == "ready":
+            return export.action_download()
+        return export.action_refresh()
+
+    def action_rehydrate(self):
+        """Recupera los documentos y anexos archivados.
+
+        Los usuarios solo pueden leer el archivo, por lo que la restauración
+        se hace como superusuario tras comprobar el acceso a las
+        notificaciones.
+        """
+        self.check_access("write")
+        cold = self.filtered(lambda n: n.storage_tier == "cold")
+        self.env["dehu.archive.blob"].sudo().search(
+            [("notification_id", "in", cold.ids)]
+        )._restore()
+        cold.write({"storage_tier": "hot", "archived_date": False})
+        return True
+
+    @api.model
+    def _cron_archive_notifications(self):
+        """Archiva por lotes las notificaciones que superan su retención.
+
+        Cada configuración define su retención en meses; cada lote se
+        confirma por separado para no bloquear la tabla durante mucho tiempo.
+        """
+        synchronizer = self.env["dehu.synchronizer"]
+        configs = self.env["dehu.configuration"].search([("retention_months", ">", 0)])
+        for config in configs:
+            limit_date = fields.Datetime.now() - relativedelta(
+                months=config.retention_months
+            )
+            config_domain = [("configuration_id", "=", config.id)]
+            if config == configs[0]:
+                # Las recibidas solo por webhook no tienen configuración
+                config_domain = ["|", ("configuration_id", "=", False)] + config_domain
+            domain = config_domain + [
+                ("storage_tier", "=", "hot"),
+                ("status", "!=", "pending"),
+                ("available_date", "<", limit_date),
+            ]
+            while True:
+                batch = self.search(domain, limit=ARCHIVE_BATCH_SIZE)
+                if not batch:
+                    break
+                freed = batch._archive_contents()
+                synchronizer._commit_batch()
+                _logger.info(
+                    "DEHú %s: %s notifications archived, %s bytes freed",
+                    config.name,
+                    len(batch),
+                    freed,
+                )
+        return True
+
+    def init(self):
+        """Crea los índices compuestos de los listados y filtros habituales.
+
+        Los compuestos cubren también las búsquedas por su primera columna,
+        por lo que se eliminan los índices simples de versiones anteriores.
+        La búsqueda por organismo emisor (``ilike``) solo puede usar un
+        índice de trigramas, que se crea si ``pg_trgm`` está disponible.
+        """
+        for column in ("status", "holder_nif", "issuer_entity"):
+            drop_index(self.env.cr, f"{self._table}_{column}_index", self._table)
+        create_index(
+            self.env.cr,
+            "dehu_notification_status_date_index",
+            self._table,
+            ["status", "available_date DESC"],
+        )
+        create_index(
+            self.env.cr,
+            "dehu_notification_holder_date_index",
+            self._table,
+            ["holder_nif", "available_date DESC"],
+        )
+        create_index(
+            self.env.cr,
+            "dehu_notification_pending_deadline_index",
+            self._table,
+            ["acceptance_deadline", "available_date"],
+            where="status = 'pending'",
+        )
+        create_index(
+            self.env.cr,
+            "dehu_notification_fulltext_index",
+            self._table,
+            [FULLTEXT_DOCUMENT],
+            method="gin",
+        )
+        if self.env.registry.has_trigram:
+            create_index(
+                self.env.cr,
+                "dehu_notification_issuer_entity_trgm_index",
+                self._table,
+                ["issuer_entity gin_trgm_ops"],
+                method="gin",
+            )
+
+    def action_queue_processing(self):
+        """Encola las notificaciones pendientes para aceptarlas en bloque."""
+        self.filtered(lambda n: n.status == "pending").write(
+            {"processing_queued": True}
+        )
+        self.env.ref("dehu_notifications.ir_cron_process_dehu_queue")._trigger()
+        return True
+
+    @api.model
+    def _parse_webhook_date(self, value):
+        """Adapta una fecha ISO 8601 (con zona horaria) al formato de Odoo."""
+        if not value:
+            return False
+        try:
+            return fields.Datetime.to_string(to_utc_naive(date_parser.parse(value)))
+        except (ValueError, OverflowError):
+            return False
+
+    @api.model
+    def _prepare_webhook_vals(self, notif_data, available_date):
+        """Prepara los valores de creación a partir de un elemento del webhook."""
+        organismo_emisor = notif_data.get("organismoEmisor") or {}
+        titular = notif_data.get("titular") or {}
+        return {
+            "dehu_id": notif_data.get("identificador"),
+            "origin_code": notif_data.get("codigoOrigen"),
+            "subject": notif_data.get("concepto"),
+            "description": notif_data.get("descripcion"),
+            "notification_type": notif_data.get("tipoEnvio"),
+            "available_date": available_date,
+            "issuer_entity": organismo_emisor.get("nombreOrganismo"),
+            "holder_nif": titular.get("nifTitular"),
+            "holder_name": titular.get("nombreTitular"),
+            "status": "pending",
+        }
+
+    @api.model
+    def _upsert_from_webhook(self, notifications):
+        """Crea o actualiza en bloque las notificaciones recibidas por webhook.
+
+        Todas las claves se resuelven con una única búsqueda; las
+        notificaciones existentes se actualizan con una escritura por cada
+        combinación de estado y fecha, y las nuevas se crean con un solo
+        ``create()``. Las transiciones de estado son monótonas: los reintentos
+        que llegan desordenados con un estado anterior se descartan.
+
+        Args:
+            notifications: Lista de notificaciones recibidas
+
+        Returns:
+            recordset: Notificaciones creadas
+        """
+        items = {}
+        for notif_data in notifications:
+            key = (
+                notif_data.get("identificador"),
+                int(notif_data.get("codigoOrigen") or 0),
+            )
+            items[key] = notif_data
+        if not items:
+            return self.browse()
+
+        existing = {
+            (row["dehu_id"], row["origin_code"]): row
+            for row in self.search_read(
+                [("dehu_id", "in", list({key[0] for key in items}))],
+                ["dehu_id", "origin_code", "status", "available_date"],
+            )
+        }
+        updates = defaultdict(list)
+        vals_list = []
+        for key, notif_data in items.items():
+            available_date = self._parse_webhook_date(
+                notif_data.get("fechaPuestaDisposicion")
+            )
+            if key in existing:
+                current = existing[key]
+                status = notif_data.get("estado", "pending")
+                if status not in STATUS_RANK:
+                    _logger.warning(
+                        "Ignoring unknown DEHú status %r for %s", status, key
+                    )
+                    continue
+                if STATUS_RANK[status] < STATUS_RANK.get(current["status"], 0):
+                    continue
+                if status == current[
+                    "status"
+                ] and available_date == fields.Datetime.to_string(
+                    current["available_date"]
+                ):
+                    continue
+                updates[(status, available_date)].append(current["id"])
+            else:
+                vals_list.append(self._prepare_webhook_vals(notif_data, available_date))
+
+        for (status, available_date), ids in updates.items():
+            self.browse(ids).write({"status": status, "available_date": available_date})
+        created = self.create(vals_list)
+        created._match_partners()
+        return created
@@ -21,7 +21,20 @@ class DehuNotificationAttachment(models.Model):
     notification_id = fields.Many2one(
         "dehu.notification", string=_("Notification"), required=True, ondelete="cascade"
     )
-    content = fields.Binary(_("Content"), readonly=True)
+    content = fields.Binary(_("Content"), readonly=True, attachment=True)
+    content_hash = fields.Char(_("Content Hash"), readonly=True)
     mimetype = fields.Char(_("MIME Type"), readonly=True)
     reference = fields.Char(_("Reference"), readonly=True)
-    metadata = fields.Text(_("Metadata"), readonly=True)
+    metadata = fields.Text(_("Metadata"), readonly=True, prefetch=False)
+    download_state = fields.Selection(
+        [
+            ("done", _("Downloaded")),
+            ("failed", _("Failed")),
+        ],
+        string=_("Download Status"),
+        default="done",
+        readonly=True,
+        index=True,
+    )
+    download_attempts = fields.Integer(_("Download Attempts"), readonly=True)
+    download_error = fields.Text(_("Download Error"), readonly=True)
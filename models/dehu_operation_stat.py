@@ -0,0 +1,105 @@
+"""Modelo con las métricas de operaciones DEHú agregadas entre workers."""
+
+import json
+import logging
+import time
+
+from odoo import _, api, fields, models
+from odoo.tools import SQL
+
+from .dehu_sync_run import requeue_samples, take_samples
+
+_logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre volcados desde las peticiones HTTP (webhook)
+METRICS_FLUSH_INTERVAL = 60
+_last_flush = 0.0
+
+
+class DehuOperationStat(models.Model):
+    """Incrementos de las métricas de operaciones DEHú.
+
+    Cada worker acumula sus métricas en memoria (ver ``dehu_sync_run``) y las
+    vuelca aquí como filas nuevas, sin actualizar filas existentes, para que
+    los volcados concurrentes de varios workers no se bloqueen entre sí. El
+    endpoint de métricas suma las filas, de modo que expone también las
+    llamadas SOAP hechas desde los workers de cron. La autolimpieza compacta
+    las filas en un único total por serie.
+    """
+
+    _name = "dehu.operation.stat"
+    _description = _("DEHU Operation Statistic")
+    _log_access = False
+
+    metric = fields.Char(_("Metric"), required=True, readonly=True)
+    sample = fields.Char(_("Sample"), required=True, readonly=True)
+    labels = fields.Char(_("Labels"), readonly=True)
+    value = fields.Float(_("Value"), readonly=True)
+
+    @api.model
+    def _flush_metrics(self, min_interval=0):
+        """Vuelca las métricas en memoria del worker a la base de datos.
+
+        Se usa un cursor propio para que los incrementos se guarden aunque la
+        transacción en curso se revierta; si el volcado falla, vuelven a
+        memoria para el siguiente intento.
+
+        Args:
+            min_interval: Segundos mínimos desde el volcado anterior
+        """
+        global _last_flush
+        now = time.monotonic()
+        if min_interval and now - _last_flush < min_interval:
+            return
+        _last_flush = now
+        samples = take_samples()
+        if not samples:
+            return
+        try:
+            with self.env.registry.cursor() as cr:
+                self.with_env(self.env(cr=cr, su=True)).create(
+                    [
+                        {
+                            "metric": metric,
+                            "sample": sample,
+                            "labels": json.dumps(labels),
+                            "value": value,
+                        }
+                        for metric, sample, labels, value in samples
+                    ]
+                )
+        except Exception as e:
+            requeue_samples(samples)
+            _logger.warning("Error saving DEHú metrics: %s", str(e))
+
+    @api.model
+    def _get_samples(self):
+        """Devuelve el total de cada serie sumando los volcados de los workers.
+
+        Returns:
+            list: Valores ``(métrica, muestra, etiquetas, valor)``
+        """
+        return [
+            (metric, sample, tuple(map(tuple, json.loads(labels))), value)
+            for metric, sample, labels, value in self._read_group(
+                [], ["metric", "sample", "labels"], ["value:sum"]
+            )
+        ]
+
+    @api.autovacuum
+    def _gc_compact_stats(self):
+        """Sustituye los incrementos de cada serie por su total."""
+        self.env.cr.execute(
+            SQL(
+                """
+                WITH deleted AS (
+                    DELETE FROM %(table)s RETURNING metric, sample, labels, value
+                )
+                INSERT INTO %(table)s (metric, sample, labels, value)
+                SELECT metric, sample, labels, SUM(value)
+                  FROM deleted
+              GROUP BY metric, sample, labels
+                """,
+                table=SQL.identifier(self._table),
+            )
+        )
@@ -0,0 +1,30 @@
+"""Modelo para las peticiones de consulta anticipada a DEHú."""
+
+from odoo import _, fields, models
+
+
+class DehuPollRequest(models.Model):
+    """Petición de consultar cuanto antes una configuración.
+
+    El webhook registra aquí los avisos de sus titulares en lugar de escribir
+    en ``dehu.configuration``, cuya fila actualiza la sincronización al
+    terminar cada ejecución: las inserciones no compiten con esa escritura
+    ni se pierden si llegan durante la consulta. La sincronización borra las
+    peticiones que había al empezar.
+    """
+
+    _name = "dehu.poll.request"
+    _description = _("DEHU Poll Request")
+    _order = "id"
+
+    configuration_id = fields.Many2one(
+        "dehu.configuration",
+        string=_("Configuration"),
+        required=True,
+        ondelete="cascade",
+        readonly=True,
+        index=True,
+    )
+    request_date = fields.Datetime(
+        _("Requested"), default=fields.Datetime.now, readonly=True
+    )
@@ -0,0 +1,97 @@
+"""Asistente para descargar en un ZIP los acuses de varias notificaciones."""
+
+import logging
+
+from odoo import _, api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class DehuReceiptExport(models.TransientModel):
+    """Selección de notificaciones cuyos acuses se descargan en un ZIP.
+
+    La selección se guarda en el servidor, de modo que la URL de descarga
+    solo lleva el identificador del asistente sea cual sea el número de
+    notificaciones. Los acuses que aún no están guardados se obtienen de DEHú
+    en segundo plano, fuera de la petición HTTP.
+    """
+
+    _name = "dehu.receipt.export"
+    _description = _("DEHU Receipt Export")
+
+    notification_ids = fields.Many2many(
+        "dehu.notification", string=_("Notifications"), readonly=True
+    )
+    fetch_done = fields.Boolean(_("Receipts Fetched"), readonly=True)
+    notification_count = fields.Integer(
+        _("Notifications"), compute="_compute_receipt_counts"
+    )
+    missing_count = fields.Integer(
+        _("Receipts Pending"), compute="_compute_receipt_counts"
+    )
+    state = fields.Selection(
+        [
+            ("fetching", _("Fetching")),
+            ("ready", _("Ready")),
+        ],
+        string=_("Status"),
+        compute="_compute_receipt_counts",
+    )
+
+    @api.depends("notification_ids", "fetch_done")
+    def _compute_receipt_counts(self):
+        for export in self:
+            missing = export.notification_ids.filtered(
+                lambda n: n.receipt_csv and n.receipt_content_csv != n.receipt_csv
+            )
+            export.notification_count = len(export.notification_ids)
+            export.missing_count = len(missing)
+            export.state = "fetching" if missing and not export.fetch_done else "ready"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        exports = super().create(vals_list)
+        if exports.filtered(lambda export: export.state == "fetching"):
+            self.env.ref("dehu_notifications.ir_cron_fetch_dehu_receipts")._trigger()
+        return exports
+
+    def action_refresh(self):
+        """Vuelve a mostrar el asistente con el estado actualizado."""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+        }
+
+    def action_download(self):
+        """Descarga el ZIP con los acuses ya guardados."""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_url",
+            "url": f"/dehu/receipts/zip/{self.id}",
+            "target": "self",
+        }
+
+    @api.model
+    def _cron_fetch_receipts(self):
+        """Obtiene de DEHú los acuses pendientes de las descargas solicitadas."""
+        synchronizer = self.env["dehu.synchronizer"]
+        for export in self.search([("fetch_done", "=", False)]):
+            try:
+                failed = synchronizer.fetch_missing_receipts(export.notification_ids)
+                if failed:
+                    _logger.warning(
+                        "DEHú receipt export %s: %s receipts could not be fetched",
+                        export.id,
+                        len(failed),
+                    )
+            except Exception as e:
+                synchronizer._rollback_batch()
+                _logger.error(
+                    "Error fetching DEHú receipts for export %s: %s", export.id, str(e)
+                )
+            export.fetch_done = True
+            synchronizer._commit_batch()
@@ -0,0 +1,242 @@
+"""Modelo y métricas de las ejecuciones de sincronización con DEHú."""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Métricas acumuladas en memoria por cada worker hasta que se vuelcan a
+# dehu.operation.stat, desde donde se exponen en formato Prometheus
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+METRIC_HELP = {
+    "dehu_operations_total": ("counter", "DEHU operations by result."),
+    "dehu_operation_duration_seconds": (
+        "histogram",
+        "Duration of DEHU operations in seconds.",
+    ),
+    "dehu_downloaded_bytes_total": ("counter", "Bytes downloaded from DEHU."),
+    "dehu_queue_depth": ("gauge", "Items waiting in DEHU work queues."),
+}
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+SYNC_RUN_RETENTION_DAYS = 30
+_metrics_lock = threading.Lock()
+_counters = defaultdict(float)
+_histograms = {}
+_pending_samples = []
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """Incrementa un contador."""
+    with _metrics_lock:
+        _counters[(name, _labels_key(labels))] += value
+
+
+def observe(name, value, **labels):
+    """Registra una observación en un histograma."""
+    key = (name, _labels_key(labels))
+    with _metrics_lock:
+        buckets, total, count = _histograms.get(
+            key, ([0] * len(LATENCY_BUCKETS), 0.0, 0)
+        )
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                buckets[index] += 1
+        _histograms[key] = (buckets, total + value, count + 1)
+
+
+@contextmanager
+def track(operation):
+    """Mide la duración y el resultado de una operación."""
+    start = time.monotonic()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        observe(
+            "dehu_operation_duration_seconds",
+            time.monotonic() - start,
+            operation=operation,
+        )
+        increment("dehu_operations_total", operation=operation, outcome=outcome)
+
+
+def take_samples():
+    """Vacía las métricas acumuladas por el worker.
+
+    Returns:
+        list: Incrementos ``(métrica, muestra, etiquetas, valor)`` desde la
+        última llamada, incluidos los que no se pudieron guardar
+    """
+    with _metrics_lock:
+        samples = list(_pending_samples)
+        _pending_samples.clear()
+        for (name, labels), value in _counters.items():
+            samples.append((name, name, labels, value))
+        for (name, labels), (buckets, total, count) in _histograms.items():
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                samples.append(
+                    (
+                        name,
+                        f"{name}_bucket",
+                        labels + (("le", str(bound)),),
+                        bucket_count,
+                    )
+                )
+            samples.append((name, f"{name}_bucket", labels + (("le", "+Inf"),), count))
+            samples.append((name, f"{name}_sum", labels, total))
+            samples.append((name, f"{name}_count", labels, count))
+        _counters.clear()
+        _histograms.clear()
+    return samples
+
+
+def requeue_samples(samples):
+    """Devuelve a memoria unos incrementos que no se pudieron guardar."""
+    with _metrics_lock:
+        _pending_samples.extend(samples)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(f'{name}="{value}"' for name, value in labels)
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _sample_sort_key(sample):
+    """Agrupa las series de un histograma y ordena sus cubos por límite."""
+    metric, sample_name, labels, _value = sample
+    series = tuple(label for label in labels if label[0] != "le")
+    suffix = sample_name[len(metric) :]
+    bound = dict(labels).get("le")
+    return (
+        series,
+        HISTOGRAM_SUFFIXES.index(suffix) if suffix in HISTOGRAM_SUFFIXES else 0,
+        float(bound) if bound else 0.0,
+    )
+
+
+def render_metrics(samples, gauges=None):
+    """Devuelve las métricas en el formato de texto de Prometheus.
+
+    Args:
+        samples: Valores acumulados ``(métrica, muestra, etiquetas, valor)``
+        gauges: Valores puntuales ``{(nombre, ((etiqueta, valor), ...)): valor}``
+
+    Returns:
+        str: Métricas serializadas
+    """
+    by_metric = defaultdict(list)
+    for sample in samples:
+        by_metric[sample[0]].append(sample)
+    for (name, labels), value in (gauges or {}).items():
+        by_metric[name].append((name, name, labels, value))
+
+    lines = []
+    for name in sorted(by_metric):
+        metric_type, description = METRIC_HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for _metric, sample_name, labels, value in sorted(
+            by_metric[name], key=_sample_sort_key
+        ):
+            lines.append(
+                f"{sample_name}{_format_labels(labels)} {_format_value(value)}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+class DehuSyncRun(models.Model):
+    """Histórico de ejecuciones de sincronización con DEHú.
+
+    Guarda la duración y el volumen de cada ejecución para dimensionar la
+    frecuencia de las tareas y el número de workers, y detectar
+    regresiones. Se conservan los últimos ``SYNC_RUN_RETENTION_DAYS`` días.
+    """
+
+    _name = "dehu.sync.run"
+    _description = _("DEHU Synchronization Run")
+    _order = "start_date desc, id desc"
+
+    configuration_id = fields.Many2one(
+        "dehu.configuration",
+        string=_("Configuration"),
+        ondelete="cascade",
+        readonly=True,
+        index=True,
+    )
+    operation = fields.Selection(
+        [
+            ("fetch", _("Fetch")),
+            ("queue", _("Processing Queue")),
+            ("webhook", _("Webhook")),
+        ],
+        string=_("Operation"),
+        required=True,
+        readonly=True,
+    )
+    start_date = fields.Datetime(
+        _("Start"), default=fields.Datetime.now, readonly=True, index=True
+    )
+    duration = fields.Float(_("Duration (s)"), readonly=True)
+    envelopes_seen = fields.Integer(_("Envelopes Seen"), readonly=True)
+    envelopes_created = fields.Integer(_("Envelopes Created"), readonly=True)
+    notifications_processed = fields.Integer(
+        _("Notifications Processed"), readonly=True
+    )
+    # Float: un entero de PostgreSQL desborda a partir de 2 GiB
+    bytes_downloaded = fields.Float(
+        _("Bytes Downloaded"), readonly=True, digits=(16, 0)
+    )
+    state = fields.Selection(
+        [
+            ("done", _("Done")),
+            ("error", _("Error")),
+        ],
+        string=_("Status"),
+        default="done",
+        readonly=True,
+    )
+    error_message = fields.Text(_("Error"), readonly=True)
+
+    @api.model
+    def _get_queue_depths(self):
+        """Devuelve el tamaño de las colas de trabajo como métricas puntuales."""
+        depths = {
+            "processing": self.env["dehu.notification"].search_count(
+                [("processing_queued", "=", True)]
+            ),
+            "webhook": self.env["dehu.webhook.batch"].search_count(
+                [("state", "=", "pending")]
+            ),
+            "failed_attachments": self.env["dehu.notification.attachment"].search_count(
+                [("download_state", "=", "failed")]
+            ),
+        }
+        return {
+            ("dehu_queue_depth", (("queue", queue),)): depth
+            for queue, depth in depths.items()
+        }
+
+    @api.autovacuum
+    def _gc_old_runs(self):
+        """Elimina las ejecuciones más antiguas que SYNC_RUN_RETENTION_DAYS."""
+        limit_date = fields.Datetime.now() - timedelta(days=SYNC_RUN_RETENTION_DAYS)
+        self.search([("start_date", "<", limit_date)]).unlink()
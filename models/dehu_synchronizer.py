@@ -1,11 +1,33 @@
-import base64
 import logging
+import os
+import random
+import shutil
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 
-from odoo import _, models
+import requests
+from odoo import _, api, fields, models
 from odoo.exceptions import UserError
-from zeep import Client, Settings
-from zeep.wsse.username import UsernameToken
+from odoo.modules import module
+from odoo.tools import SQL
+from odoo.tools import config as odoo_config
+from psycopg2.errors import SerializationFailure
+from requests.adapters import HTTPAdapter
+
+from .dehu_notification import to_utc_naive
+from .dehu_sync_run import increment, track
+from .dehu_transport import (
+    PAYLOAD_CHUNK_SIZE,
+    DehuSoapFault,
+    DehuTransportError,
+    LxmlTransport,
+    SpooledPayload,
+    ZeepTransport,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -14,6 +36,132 @@ DEHU_NOTIFICATION_MODEL = "dehu.notification"
 DEHU_NOTIFICATION_ATTACHMENT_MODEL = "dehu.notification.attachment"
 NO_ACTIVE_CONFIG_ERROR = _("No active DEHú configuration found")
 
+# Caché de clientes SOAP por proceso (worker): evita descargar y parsear
+# el WSDL/XSD en cada llamada y reutiliza las conexiones HTTP keep-alive.
+CLIENT_CACHE_SIZE = 8
+HTTP_POOL_SIZE = 10
+HASH_ALGORITHM = "SHA-256"
+DEFAULT_SYNC_WORKERS = 4
+MIN_SYNC_WINDOW = timedelta(minutes=1)
+# Opciones del paginador de localiza() (apartados 3.1.1.1 y 3.1.2.1 de LEMA)
+PAGE_OPTION = "dehu.paginador.pagina"
+TOTAL_RESULTS_OPTION = "dehu.paginador.totalResultados"
+TOTAL_PAGES_OPTION = "dehu.paginador.totalPag"
+# Reintentos de las llamadas SOAP ante fallos transitorios
+WSDL_TIMEOUT = 30
+MAX_CALL_ATTEMPTS = 4
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# Un endpoint con CIRCUIT_FAILURE_THRESHOLD fallos seguidos deja de llamarse
+# durante CIRCUIT_RESET_TIMEOUT segundos
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 60
+# Códigos de SOAP Fault de DEHú por superar el límite de peticiones
+# (apartado 4 de LEMA); los límites diarios (4303, 4305) no se reintentan
+TRANSIENT_FAULT_CODES = {"3005", "3006", "4304", "4306"}
+MAX_ATTACHMENT_ATTEMPTS = 5
+_client_cache = OrderedDict()
+_client_cache_lock = threading.Lock()
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def _get_wsdl_cache_path():
+    """Devuelve la ruta de la caché en disco del WSDL, compartida entre workers."""
+    return os.path.join(odoo_config["data_dir"], "dehu_wsdl_cache.db")
+
+
+def _build_session():
+    """Crea una sesión HTTP con un pool de conexiones persistentes."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _get_paginator_option(response, name):
+    """Devuelve como entero una opción del paginador de localiza(), si viene."""
+    options = getattr(response, "opcionesRespuestaLocaliza", None)
+    for option in getattr(options, "opcion", None) or []:
+        if (getattr(option, "tipo", None) or "").strip() == name:
+            value = str(getattr(option, "_value_1", None) or "").strip()
+            return int(value) if value.isdigit() else None
+    return None
+
+
+def _is_true(value):
+    """Interpreta un booleano LEMA, que puede llegar como '1' o 'true'."""
+    return str(value).strip().lower() in ("1", "true")
+
+
+class DehuCircuitOpenError(Exception):
+    """Se rechaza una llamada porque el endpoint está marcado como caído."""
+
+
+class CircuitBreaker:
+    """Cortacircuitos por endpoint, compartido por los hilos del worker.
+
+    Tras ``CIRCUIT_FAILURE_THRESHOLD`` fallos seguidos el circuito se abre y
+    las llamadas se rechazan sin esperar a la red. Pasado
+    ``CIRCUIT_RESET_TIMEOUT`` se deja pasar una llamada de prueba: si tiene
+    éxito el circuito se cierra y si falla vuelve a abrirse.
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_call(self, endpoint):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < CIRCUIT_RESET_TIMEOUT:
+                raise DehuCircuitOpenError(f"DEHú endpoint unavailable: {endpoint}")
+            # Semiabierto: esta llamada hace de prueba
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+                self.opened_at = time.monotonic()
+
+
+def _get_circuit_breaker(endpoint):
+    with _circuit_breakers_lock:
+        return _circuit_breakers.setdefault(endpoint, CircuitBreaker())
+
+
+def _is_transient_error(error):
+    """Indica si un error justifica reintentar la llamada."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, DehuTransportError) and error.status_code:
+        return error.status_code in (408, 429) or error.status_code >= 500
+    if isinstance(error, DehuSoapFault):
+        return error.code in TRANSIENT_FAULT_CODES
+    return False
+
+
+def _spool_download(content):
+    """Vuelca un contenido descargado de DEHú y lo suma a las métricas.
+
+    El transporte lxml entrega las partes MTOM ya volcadas a disco; el resto
+    de contenidos (bytes devueltos por zeep o base64 en línea) se copian.
+    """
+    payload = (
+        content if isinstance(content, SpooledPayload) else SpooledPayload(content)
+    )
+    increment("dehu_downloaded_bytes_total", payload.size)
+    return payload
+
 
 class DehuSynchronizer(models.Model):
     """Sincronizador con DEHú: gestiona la comunicación con el sistema DEHú del Gobierno de España."""
@@ -22,104 +170,445 @@ class DehuSynchronizer(models.Model):
     _description = "Sincronizador con DEHú"
 
     def _get_dehu_client(self, config):
-        """Crea y configura el cliente SOAP para DEHú.
+        """Obtiene el cliente SOAP para DEHú, reutilizando el de la caché.
+
+        Los clientes se guardan por base de datos y configuración junto con
+        los campos de conexión con los que se crearon (WSDL, credencial,
+        transporte y timeouts), de forma que solo un cambio en esos campos
+        invalida el cliente anterior; los datos de seguimiento que la
+        sincronización escribe en la configuración no afectan. Cuando la
+        caché se llena se descarta el cliente usado hace más tiempo, y los
+        clientes descartados cierran sus conexiones.
 
         Args:
             config: Configuración de DEHú
 
         Returns:
-            Client: Cliente SOAP configurado
+            Transporte SOAP configurado
 
         Raises:
             UserError: Si hay error al crear el cliente
         """
-        try:
-            settings = Settings(
-                strict=False,
-                xml_huge_tree=True,
-                extra_http_headers={"Expect": "100-continue", "Content-Length": "0"},
-            )
+        key = (self.env.cr.dbname, config.id)
+        signature = (
+            config.wsdl_url,
+            config.api_key,
+            config.transport,
+            config.connect_timeout,
+            config.read_timeout,
+        )
+        with _client_cache_lock:
+            cached = _client_cache.get(key)
+            if cached is not None and cached[0] == signature:
+                _client_cache.move_to_end(key)
+                return cached[1]
 
-            client = Client(
-                config.wsdl_url,
-                wsse=UsernameToken(config.api_key, ""),
-                settings=settings,
-            )
-            return client
+        try:
+            client = self._create_dehu_client(config)
         except Exception as e:
             _logger.error("Error creating DEHú client: %s", str(e))
             raise UserError(_("Error creating DEHú client: %s") % str(e)) from e
 
-    def fetch_pending_notifications(self):
+        evicted = []
+        with _client_cache_lock:
+            cached = _client_cache.get(key)
+            if cached is not None and cached[0] == signature:
+                # Otro hilo ha creado el mismo cliente mientras tanto
+                evicted.append(client)
+                client = cached[1]
+            else:
+                if cached is not None:
+                    evicted.append(cached[1])
+                _client_cache[key] = (signature, client)
+            _client_cache.move_to_end(key)
+            while len(_client_cache) > CLIENT_CACHE_SIZE:
+                evicted.append(_client_cache.popitem(last=False)[1][1])
+        for stale in evicted:
+            stale.close()
+        return client
+
+    def _create_dehu_client(self, config):
+        """Crea y configura un nuevo cliente SOAP para DEHú.
+
+        El transporte se elige en la configuración: zeep interpreta el WSDL
+        y solo se importa aquí, y lxml usa plantillas de petición propias.
+
+        Args:
+            config: Configuración de DEHú
+
+        Returns:
+            Transporte con el método ``call(operation, **params)``
+        """
+        operation_timeout = (config.connect_timeout, config.read_timeout)
+        with track("wsdl_load"):
+            if config.transport == "lxml":
+                return LxmlTransport(
+                    config.wsdl_url,
+                    config.api_key,
+                    _build_session(),
+                    operation_timeout,
+                )
+            return ZeepTransport(
+                config.wsdl_url,
+                config.api_key,
+                _build_session(),
+                WSDL_TIMEOUT,
+                operation_timeout,
+                _get_wsdl_cache_path(),
+            )
+
+    def fetch_pending_notifications(self, full_resync=False):
         """Obtiene notificaciones pendientes de DEHú.
 
+        Args:
+            full_resync: Si es True se ignora la marca de sincronización y se
+                consulta de nuevo la ventana inicial completa
+
+        Se sincronizan todas las configuraciones activas, cada una con el NIF
+        de su compañía. Con varias configuraciones se reparten en un pool de
+        hilos acotado, cada una con su propio cursor, de forma que un
+        endpoint lento o con errores no bloquea ni deshace el resto.
+
         Returns:
             bool: True si la operación fue exitosa
 
         Raises:
-            UserError: Si no hay configuración activa o hay errores
+            UserError: Si no hay configuración activa
         """
-        config = self.env[DEHU_CONFIGURATION_MODEL].search(
-            [("active", "=", True)], limit=1
-        )
-        if not config:
+        configs = self.env[DEHU_CONFIGURATION_MODEL].search([("active", "=", True)])
+        if not configs:
             raise UserError(NO_ACTIVE_CONFIG_ERROR)
+        self._sync_configurations(configs, full_resync=full_resync)
+        return True
 
-        try:
-            client = self._get_dehu_client(config)
+    def _cron_adaptive_fetch(self):
+        """Sincroniza las configuraciones a las que les toca consultar DEHú.
+
+        La tarea se ejecuta con frecuencia, pero cada configuración solo se
+        consulta cuando llega su ``next_poll_date``, que se acerca cuando las
+        últimas consultas encontraron envíos nuevos y se aleja mientras no los
+        hay. Las configuraciones con avisos del webhook para su titular
+        (``dehu.poll.request``) se consultan de inmediato.
+
+        Returns:
+            bool: True si la operación fue exitosa
+        """
+        configs = self.env[DEHU_CONFIGURATION_MODEL].search(
+            [
+                ("active", "=", True),
+                "|",
+                ("next_poll_date", "=", False),
+                ("next_poll_date", "<=", fields.Datetime.now()),
+            ]
+        )
+        requested = self.env["dehu.poll.request"].sudo().search([]).configuration_id
+        configs |= requested.filtered("active")
+        if configs:
+            self._sync_configurations(configs)
+        return True
+
+    def _sync_configurations(self, configs, full_resync=False):
+        """Sincroniza varias configuraciones, en paralelo si procede."""
+        workers = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("dehu_notifications.sync_workers", DEFAULT_SYNC_WORKERS)
+        )
+        if len(configs) == 1 or workers <= 1 or self._in_test():
+            for config in configs:
+                self._sync_configuration(config, full_resync=full_resync)
+            return
 
-            # Parámetros para localiza()
-            fecha_desde = (datetime.now() - timedelta(days=30)).strftime(
-                "%Y-%m-%dT%H:%M:%S"
+        with ThreadPoolExecutor(max_workers=min(workers, len(configs))) as executor:
+            list(
+                executor.map(
+                    lambda config_id: self._sync_configuration_isolated(
+                        config_id, full_resync
+                    ),
+                    configs.ids,
+                )
             )
-            fecha_hasta = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
 
-            params = {
-                "nifTitular": config.company_id.vat or "",
-                "fechaDesde": fecha_desde,
-                "fechaHasta": fecha_hasta,
-            }
+    def _sync_configuration_isolated(self, config_id, full_resync=False):
+        """Sincroniza una configuración desde un hilo, con su propio cursor."""
+        with self.env.registry.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, self.env.context)
+            config = env[DEHU_CONFIGURATION_MODEL].browse(config_id)
+            return env["dehu.synchronizer"]._sync_configuration(
+                config, full_resync=full_resync
+            )
 
-            response = client.service.localiza(**params)
+    def _sync_configuration(self, config, full_resync=False):
+        """Sincroniza una configuración y guarda el informe de la ejecución.
 
-            notifications = []
-            if hasattr(response, "envios") and hasattr(response.envios, "item"):
-                notifications = response.envios.item
-
-            notification_model = self.env[DEHU_NOTIFICATION_MODEL]
-            for notif in notifications:
-                existing = notification_model.search(
-                    [
-                        ("dehu_id", "=", notif.identificador),
-                        ("origin_code", "=", notif.codigoOrigen),
-                    ],
-                    limit=1,
+        Los errores se registran en la configuración en lugar de propagarse,
+        para no interrumpir la sincronización del resto. Tampoco se propaga
+        un fallo al guardar el informe (por ejemplo, un conflicto de
+        serialización con otra escritura en la configuración).
+
+        Returns:
+            dict: Informe con la duración y los envíos vistos y creados
+        """
+        start = time.monotonic()
+        start_date = fields.Datetime.now()
+        report = {"seen": 0, "created": 0, "error": False}
+        # Las peticiones que lleguen durante la consulta se atienden en la
+        # siguiente ejecución
+        poll_requests = (
+            self.env["dehu.poll.request"]
+            .sudo()
+            .search([("configuration_id", "=", config.id)])
+        )
+        try:
+            report.update(
+                self._fetch_configuration_notifications(config, full_resync=full_resync)
+            )
+        except Exception as e:
+            self._rollback_batch()
+            report["error"] = str(e)
+        report["duration"] = time.monotonic() - start
+        try:
+            # Un aviso del webhook reinicia el intervalo de consulta
+            previous_idle_polls = 0 if poll_requests else config.idle_polls
+            idle_polls = 0 if report["created"] else previous_idle_polls + 1
+            with self.env.cr.savepoint():
+                config.write(
+                    {
+                        "idle_polls": idle_polls,
+                        "next_poll_date": fields.Datetime.now()
+                        + config._get_poll_interval(idle_polls),
+                        "last_sync_duration": report["duration"],
+                        "last_sync_envelopes_seen": report["seen"],
+                        "last_sync_envelopes_created": report["created"],
+                        "last_sync_error": report["error"],
+                    }
                 )
+                self.env["dehu.sync.run"].create(
+                    {
+                        "configuration_id": config.id,
+                        "operation": "fetch",
+                        "start_date": start_date,
+                        "duration": report["duration"],
+                        "envelopes_seen": report["seen"],
+                        "envelopes_created": report["created"],
+                        "state": "error" if report["error"] else "done",
+                        "error_message": report["error"],
+                    }
+                )
+                poll_requests.unlink()
+            self._commit_batch()
+        except Exception as e:
+            self._rollback_batch()
+            _logger.error(
+                "Error saving DEHú sync report for %s: %s", config.name, str(e)
+            )
+        self.env["dehu.operation.stat"]._flush_metrics()
+        _logger.info(
+            "DEHú sync %s: %s envelopes seen, %s created in %.1fs%s",
+            config.name,
+            report["seen"],
+            report["created"],
+            report["duration"],
+            f" (error: {report['error']})" if report["error"] else "",
+        )
+        return report
 
-                if not existing:
-                    notification_model.create(
-                        {
-                            "dehu_id": notif.identificador,
-                            "origin_code": notif.codigoOrigen,
-                            "subject": notif.concepto,
-                            "description": notif.descripcion,
-                            "notification_type": notif.tipoEnvio,
-                            "available_date": notif.fechaPuestaDisposicion,
-                            "issuer_entity": (notif.organismoEmisor.nombreOrganismo),
-                            "issuer_root_entity": (
-                                notif.organismoEmisorRaiz.nombreOrganismo
-                            ),
-                            "holder_nif": notif.titular.nifTitular,
-                            "holder_name": notif.titular.nombreTitular,
-                            "status": "pending",
-                        }
-                    )
+    def _get_sync_start(self, config, full_resync=False):
+        """Calcula el inicio del rango a consultar en localiza().
 
-            return True
+        Se parte de la última ``fechaHasta`` sincronizada con éxito, restando
+        un margen de solape para no perder envíos publicados con retraso. Sin
+        marca (o en una resincronización completa) se usa la ventana inicial.
+        """
+        if config.last_sync_date and not full_resync:
+            return config.last_sync_date - timedelta(
+                minutes=config.sync_overlap_minutes
+            )
+        return datetime.now() - timedelta(days=config.initial_sync_days)
+
+    def _fetch_configuration_notifications(self, config, full_resync=False):
+        """Obtiene las notificaciones nuevas de una configuración.
+
+        El rango se recorre en ventanas de tiempo adaptativas: si una ventana
+        contiene demasiados envíos se divide a la mitad y se vuelve a
+        consultar, y tras una ventana manejable se recupera progresivamente el
+        tamaño configurado. Cada ventana se lee completa, con todas sus
+        páginas, y se procesa y confirma por separado; la marca de
+        sincronización solo avanza tras leer la ventana entera, de modo que la
+        memoria queda acotada y un fallo se reanuda desde la última ventana
+        confirmada sin perder envíos.
+
+        Args:
+            config: Configuración de DEHú
+            full_resync: Si es True se consulta la ventana inicial completa
+
+        Returns:
+            dict: Número de envíos vistos (``seen``) y creados (``created``)
+
+        Raises:
+            UserError: Si hay errores
+        """
+        report = {"seen": 0, "created": 0}
+        try:
+            client = self._get_dehu_client(config)
+
+            date_to = datetime.now()
+            date_from = self._get_sync_start(config, full_resync)
+            max_window = timedelta(hours=max(config.sync_window_hours, 1))
+            max_envelopes = config.sync_window_max_envelopes
+            window = max_window
+            while date_from < date_to:
+                window_end = min(date_from + window, date_to)
+                can_split = window_end - date_from > MIN_SYNC_WINDOW
+                notifications, total = self._localiza(
+                    client,
+                    config,
+                    date_from,
+                    window_end,
+                    max_envelopes=max_envelopes if can_split else 0,
+                )
+                if can_split and max_envelopes and total >= max_envelopes:
+                    window = max((window_end - date_from) / 2, MIN_SYNC_WINDOW)
+                    continue
+
+                created = self._create_new_notifications(notifications, config)
+                report["seen"] += len(notifications)
+                report["created"] += len(created)
+                config.last_sync_date = window_end
+                self._commit_batch()
+                date_from = window_end
+                window = min(window * 2, max_window)
+            return report
         except Exception as e:
             _logger.error("Error fetching DEHú notifications: %s", str(e))
             raise UserError(_("Error fetching notifications: %s") % str(e)) from e
 
+    def _localiza(self, client, config, date_from, date_to, max_envelopes=0):
+        """Consulta localiza() para un rango de fechas, página a página.
+
+        DEHú devuelve un número limitado de envíos por página e indica con
+        ``hayMasResultados`` que quedan más, que se piden con la opción
+        ``dehu.paginador.pagina``. Se leen todas las páginas, de modo que el
+        rango se obtiene entero o la llamada falla. Si el total anunciado
+        alcanza ``max_envelopes`` se deja de leer para que el llamador divida
+        el rango.
+
+        Args:
+            max_envelopes: Total a partir del cual no se leen más páginas;
+                0 para leerlas siempre todas
+
+        Returns:
+            tuple: (envíos leídos, total de envíos del rango)
+
+        Raises:
+            UserError: Si DEHú anuncia más resultados de los que devuelve
+        """
+        params = {
+            "nifTitular": config.company_id.vat or "",
+            "fechaDesde": date_from.strftime("%Y-%m-%dT%H:%M:%S"),
+            "fechaHasta": date_to.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        notifications = []
+        page = 1
+        while True:
+            response = self._call_dehu(client, config.wsdl_url, "localiza", **params)
+            items = []
+            if hasattr(response, "envios") and hasattr(response.envios, "item"):
+                items = list(response.envios.item or [])
+            notifications.extend(items)
+            total = max(
+                _get_paginator_option(response, TOTAL_RESULTS_OPTION) or 0,
+                len(notifications),
+            )
+            if max_envelopes and total >= max_envelopes:
+                return notifications, total
+            if not _is_true(getattr(response, "hayMasResultados", False)):
+                return notifications, total
+            total_pages = _get_paginator_option(response, TOTAL_PAGES_OPTION)
+            if not items or (total_pages and page >= total_pages):
+                raise UserError(
+                    _("DEHú announced more results than returned (page %s)") % page
+                )
+            page += 1
+            params["opcionesLocaliza"] = {
+                "opcion": [{"tipo": PAGE_OPTION, "_value_1": str(page)}]
+            }
+
+    def _in_test(self):
+        """Indica si se están ejecutando tests.
+
+        ``registry.in_test_mode()`` solo es cierto con ``HttpCase``; las
+        ``TransactionCase`` se detectan por el test en curso.
+        """
+        return bool(module.current_test) or self.env.registry.in_test_mode()
+
+    def _commit_batch(self):
+        """Confirma el lote en curso salvo durante la ejecución de tests."""
+        if not self._in_test():
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def _rollback_batch(self):
+        """Deshace el lote en curso salvo durante la ejecución de tests."""
+        if not self._in_test():
+            self.env.cr.rollback()
+
+    def _prepare_notification_vals(self, notif, config):
+        """Prepara los valores de creación a partir de un envío de localiza()."""
+        return {
+            "configuration_id": config.id,
+            "dehu_id": notif.identificador,
+            "origin_code": notif.codigoOrigen,
+            "subject": notif.concepto,
+            "description": notif.descripcion,
+            "notification_type": notif.tipoEnvio,
+            "available_date": to_utc_naive(notif.fechaPuestaDisposicion),
+            "issuer_entity": notif.organismoEmisor.nombreOrganismo,
+            "issuer_root_entity": notif.organismoEmisorRaiz.nombreOrganismo,
+            "holder_nif": notif.titular.nifTitular,
+            "holder_name": notif.titular.nombreTitular,
+            "status": "pending",
+        }
+
+    def _create_new_notifications(self, notifications, config):
+        """Crea en bloque las notificaciones que aún no existen.
+
+        Las claves ``(dehu_id, origin_code)`` existentes se obtienen con una
+        única consulta y los envíos repetidos dentro de la misma respuesta se
+        descartan en memoria, de modo que todo se inserta con un solo
+        ``create()``.
+
+        Args:
+            notifications: Envíos devueltos por localiza()
+            config: Configuración de DEHú que los ha obtenido
+
+        Returns:
+            recordset: Notificaciones creadas
+        """
+        notification_model = self.env[DEHU_NOTIFICATION_MODEL]
+        if not notifications:
+            return notification_model
+
+        dehu_ids = list({notif.identificador for notif in notifications})
+        with track("orm_search"):
+            seen = {
+                (row["dehu_id"], row["origin_code"])
+                for row in notification_model.search_read(
+                    [("dehu_id", "in", dehu_ids)], ["dehu_id", "origin_code"]
+                )
+            }
+
+        vals_list = []
+        for notif in notifications:
+            key = (notif.identificador, int(notif.codigoOrigen or 0))
+            if key in seen:
+                continue
+            seen.add(key)
+            vals_list.append(self._prepare_notification_vals(notif, config))
+        with track("orm_create"):
+            created = notification_model.create(vals_list)
+        created._match_partners()
+        return created
+
     def process_notification(self, notification):
         """Procesa una notificación (aceptar y descargar contenido).
 
@@ -132,111 +621,612 @@ class DehuSynchronizer(models.Model):
         Raises:
             UserError: Si no hay configuración activa o hay errores
         """
-        config = self.env[DEHU_CONFIGURATION_MODEL].search(
-            [("active", "=", True)], limit=1
-        )
+        config = self._get_notification_configuration(notification)
         if not config:
             raise UserError(NO_ACTIVE_CONFIG_ERROR)
 
         try:
             client = self._get_dehu_client(config)
+            params = self._prepare_access_params(notification, config)
+            response = self._call_dehu(
+                client, config.wsdl_url, "peticionAcceso", **params
+            )
+            self._apply_access_response(notification, response, config, client)
+            return True
+        except Exception as e:
+            _logger.error(
+                "Error processing notification %s: %s",
+                notification.notification_key,
+                str(e),
+            )
+            raise UserError(_("Error processing notification: %s") % str(e)) from e
 
-            # Parámetros para peticionAcceso()
-            params = {
-                "identificador": notification.dehu_id,
-                "codigoOrigen": notification.origin_code,
-                "nifReceptor": config.company_id.vat or "",
-                "nombreReceptor": config.company_id.name,
-                "evento": "1",  # Aceptada
-                "concepto": notification.subject,
-            }
+    def _get_notification_configuration(self, notification):
+        """Devuelve la configuración con la que se obtuvo la notificación.
+
+        Si no consta o ya no está activa se usa la primera activa.
+        """
+        if notification.configuration_id.active:
+            return notification.configuration_id
+        return self.env[DEHU_CONFIGURATION_MODEL].search(
+            [("active", "=", True)], limit=1
+        )
+
+    def _prepare_access_params(self, notification, config):
+        """Prepara los parámetros de peticionAcceso() para una notificación."""
+        return {
+            "identificador": notification.dehu_id,
+            "codigoOrigen": notification.origin_code,
+            "nifReceptor": config.company_id.vat or "",
+            "nombreReceptor": config.company_id.name,
+            "evento": "1",  # Aceptada
+            "concepto": notification.subject,
+        }
+
+    def _apply_access_response(self, notification, response, config, client):
+        """Guarda el resultado de peticionAcceso() en la notificación.
+
+        Returns:
+            int: Bytes descargados entre documento principal y anexos
+
+        Raises:
+            UserError: Si DEHú devuelve un código de error
+        """
+        if response.codigoRespuesta != "200":
+            raise UserError(
+                _("DEHú error: %s - %s")
+                % (response.codigoRespuesta, response.descripcionRespuesta)
+            )
 
-            response = client.service.peticionAcceso(**params)
+        notification.write(
+            {
+                "status": "accepted",
+                "document_name": response.documento.nombre,
+                "document_mimetype": response.documento.mimeType,
+                "receipt_csv": response.documento.csvResguardo,
+                "processing_queued": False,
+                "fulltext_indexed": False,
+            }
+        )
 
-            # Procesar respuesta
-            if response.codigoRespuesta == "200":
-                # Actualizar notificación
+        # Descargar documento principal
+        size = 0
+        if hasattr(response.documento, "contenido"):
+            payload = _spool_download(response.documento.contenido)
+            size += payload.size
+            if self._store_payload(
+                notification,
+                "document_content",
+                payload,
+                response.documento.mimeType,
+            ):
                 notification.write(
                     {
-                        "status": "accepted",
-                        "document_name": response.documento.nombre,
-                        "document_mimetype": response.documento.mimeType,
-                        "receipt_csv": response.documento.csvResguardo,
+                        "document_hash": payload.sha256,
+                        "document_hash_algorithm": HASH_ALGORITHM,
                     }
                 )
 
-                # Descargar documento principal
-                if hasattr(response.documento, "contenido"):
-                    notification.document_content = base64.b64encode(
-                        response.documento.contenido
+        # Procesar anexos si existen
+        if hasattr(response, "anexos"):
+            size += self._process_attachments(
+                notification, response.anexos, config, client
+            )
+        return size
+
+    def process_notification_queue(self):
+        """Acepta y descarga en bloque las notificaciones encoladas.
+
+        Las notificaciones se toman por lotes de ``process_batch_size``; las
+        llamadas a peticionAcceso() de cada lote se lanzan en paralelo y sus
+        respuestas se guardan después desde el hilo principal, cada una en su
+        propio savepoint para que un error no afecte al resto del lote. Cada
+        lote se confirma por separado.
+
+        Cada configuración activa procesa sus notificaciones; las que no
+        tienen una configuración activa se procesan con la primera.
+
+        Returns:
+            bool: True si la operación fue exitosa
+        """
+        configs = self.env[DEHU_CONFIGURATION_MODEL].search([("active", "=", True)])
+        if not configs:
+            return False
+
+        notification_model = self.env[DEHU_NOTIFICATION_MODEL]
+        # Las que cambiaron de estado por otra vía ya no necesitan aceptarse
+        notification_model.search(
+            [("processing_queued", "=", True), ("status", "!=", "pending")]
+        ).write({"processing_queued": False})
+
+        for config in configs:
+            domain = [("configuration_id", "=", config.id)]
+            if config == configs[0]:
+                domain = ["|", ("configuration_id", "not in", configs.ids)] + domain
+            self._process_configuration_queue(config, domain)
+        return True
+
+    @api.model
+    def _cron_auto_accept(self):
+        """Acepta automáticamente las notificaciones pendientes más urgentes.
+
+        En las configuraciones con aceptación automática se encolan las
+        pendientes cuyo plazo de acceso no ha vencido y la cola se procesa
+        por orden de vencimiento, dentro del tiempo máximo configurado.
+
+        Returns:
+            bool: True si la operación fue exitosa
+        """
+        configs = self.env[DEHU_CONFIGURATION_MODEL].search([("active", "=", True)])
+        notification_model = self.env[DEHU_NOTIFICATION_MODEL]
+        for config in configs.filtered("auto_accept"):
+            domain = [("configuration_id", "=", config.id)]
+            if config == configs[0]:
+                domain = ["|", ("configuration_id", "not in", configs.ids)] + domain
+            notification_model.search(
+                domain
+                + [
+                    ("status", "=", "pending"),
+                    ("processing_queued", "=", False),
+                    "|",
+                    ("acceptance_deadline", "=", False),
+                    ("acceptance_deadline", ">", fields.Datetime.now()),
+                ]
+            ).write({"processing_queued": True})
+            self._commit_batch()
+            self._process_configuration_queue(
+                config, domain, time_budget=config.auto_accept_time_budget
+            )
+        return True
+
+    def _claim_queue_batch(self, domain, limit):
+        """Reserva un lote de notificaciones encoladas.
+
+        Las filas se bloquean con ``FOR UPDATE SKIP LOCKED`` hasta que se
+        confirma el lote: la tarea de la cola y la de aceptación automática
+        se saltan las notificaciones que la otra tiene reservadas. Si una
+        notificación cambió tras el inicio de la transacción, el lote se
+        deja para la siguiente ejecución. Solo se reservan notificaciones
+        pendientes, de modo que el recorrido por vencimiento usa el índice
+        parcial ``dehu_notification_pending_deadline_index``.
+
+        Args:
+            domain: Dominio adicional de las notificaciones a procesar
+            limit: Tamaño máximo del lote
+
+        Returns:
+            recordset: Notificaciones reservadas, por orden de vencimiento
+        """
+        notification_model = self.env[DEHU_NOTIFICATION_MODEL]
+        query = notification_model._search(
+            [("processing_queued", "=", True), ("status", "=", "pending")] + domain,
+            limit=limit,
+            order="acceptance_deadline asc, available_date asc, id asc",
+        )
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute(
+                    SQL(
+                        "%s FOR UPDATE OF %s SKIP LOCKED",
+                        query.select(),
+                        SQL.identifier(notification_model._table),
                     )
+                )
+        except SerializationFailure:
+            return notification_model
+        return notification_model.browse([row[0] for row in self.env.cr.fetchall()])
 
-                # Procesar anexos si existen
-                if hasattr(response, "anexos"):
-                    self._process_attachments(notification, response.anexos)
+    def _process_configuration_queue(self, config, domain, time_budget=0):
+        """Acepta y descarga por lotes las notificaciones encoladas del dominio.
 
-                return True
-            raise UserError(
-                _("DEHú error: %s - %s")
-                % (response.codigoRespuesta, response.descripcionRespuesta)
+        Los lotes se toman por orden de vencimiento del plazo de acceso, de
+        modo que las notificaciones más urgentes se aceptan primero; las
+        comunicaciones, sin plazo, quedan al final. Cada lote se reserva con
+        ``_claim_queue_batch`` para que las tareas que comparten la cola no
+        procesen dos veces la misma notificación.
+
+        Args:
+            config: Configuración de DEHú con la que se procesan
+            domain: Dominio adicional de las notificaciones a procesar
+            time_budget: Segundos tras los que no se empiezan más lotes; las
+                notificaciones restantes siguen encoladas. 0 para no limitar
+        """
+        client = self._get_dehu_client(config)
+        start = time.monotonic()
+        start_date = fields.Datetime.now()
+        processed = downloaded = 0
+        while True:
+            if time_budget and time.monotonic() - start >= time_budget:
+                _logger.info(
+                    "DEHú queue %s: time budget of %ss reached",
+                    config.name,
+                    time_budget,
+                )
+                break
+            batch = self._claim_queue_batch(domain, max(config.process_batch_size, 1))
+            if not batch:
+                break
+
+            params_list = [
+                self._prepare_access_params(notification, config)
+                for notification in batch
+            ]
+            workers = max(1, min(config.process_workers, len(batch)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(
+                    executor.map(
+                        lambda params: self._try_call_dehu(
+                            client, config.wsdl_url, "peticionAcceso", params
+                        ),
+                        params_list,
+                    )
+                )
+
+            for notification, (response, error) in zip(batch, results):
+                try:
+                    with self.env.cr.savepoint():
+                        if error:
+                            raise error
+                        downloaded += self._apply_access_response(
+                            notification, response, config, client
+                        )
+                    processed += 1
+                except Exception as e:
+                    _logger.error(
+                        "Error processing notification %s: %s",
+                        notification.notification_key,
+                        str(e),
+                    )
+                notification.processing_queued = False
+            self._commit_batch()
+
+        elapsed = max(time.monotonic() - start, 0.001)
+        if processed:
+            self.env["dehu.sync.run"].create(
+                {
+                    "configuration_id": config.id,
+                    "operation": "queue",
+                    "start_date": start_date,
+                    "duration": elapsed,
+                    "notifications_processed": processed,
+                    "bytes_downloaded": downloaded,
+                }
             )
+            self._commit_batch()
+        self.env["dehu.operation.stat"]._flush_metrics()
+        _logger.info(
+            "DEHú queue %s: %s notifications processed in %.1fs "
+            "(%.1f notifications/min, %.0f bytes/s)",
+            config.name,
+            processed,
+            elapsed,
+            processed * 60 / elapsed,
+            downloaded / elapsed,
+        )
+
+    def _try_call_dehu(self, client, endpoint, operation, params):
+        """Llama a una operación desde un hilo secundario, sin usar el ORM.
+
+        Returns:
+            tuple: (respuesta, excepción), con uno de los dos a None
+        """
+        try:
+            return self._call_dehu(client, endpoint, operation, **params), None
         except Exception as e:
-            _logger.error(
-                "Error processing notification %s: %s",
-                notification.notification_key,
-                str(e),
-            )
-            raise UserError(_("Error processing notification: %s") % str(e)) from e
+            return None, e
+
+    def _call_dehu(self, client, endpoint, operation, **params):
+        """Llama a una operación SOAP de DEHú con reintentos y cortacircuitos.
+
+        Los fallos transitorios (errores de conexión, timeouts y respuestas
+        HTTP 408, 429 o 5xx) se reintentan con espera exponencial y jitter
+        hasta ``MAX_CALL_ATTEMPTS`` veces. Los fallos consecutivos abren el
+        cortacircuitos del endpoint, que rechaza de inmediato las llamadas
+        siguientes hasta que pasa el tiempo de espera. No accede al ORM, por
+        lo que puede usarse desde hilos secundarios.
+
+        Args:
+            client: Cliente SOAP
+            endpoint: Identificador del endpoint (URL del WSDL)
+            operation: Nombre de la operación SOAP
+            **params: Parámetros de la operación
+
+        Returns:
+            Respuesta de la operación
+
+        Raises:
+            DehuCircuitOpenError: Si el endpoint está marcado como caído
+        """
+        with track(operation):
+            return self._call_dehu_with_retries(client, endpoint, operation, params)
+
+    def _call_dehu_with_retries(self, client, endpoint, operation, params):
+        breaker = _get_circuit_breaker(endpoint)
+        for attempt in range(1, MAX_CALL_ATTEMPTS + 1):
+            breaker.before_call(endpoint)
+            try:
+                response = client.call(operation, **params)
+            except Exception as e:
+                if not _is_transient_error(e):
+                    raise
+                breaker.record_failure()
+                if attempt == MAX_CALL_ATTEMPTS:
+                    raise
+                delay = random.uniform(
+                    0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt)
+                )
+                _logger.warning(
+                    "DEHú %s failed (attempt %s/%s), retrying in %.1fs: %s",
+                    operation,
+                    attempt,
+                    MAX_CALL_ATTEMPTS,
+                    delay,
+                    e,
+                )
+                time.sleep(delay)
+            else:
+                breaker.record_success()
+                return response
+
+    def _process_attachments(self, notification, attachments, config, client):
+        """Procesa los anexos de una notificación.
 
-    def _process_attachments(self, notification, attachments):
-        """Procesa los anexos de una notificación."""
+        Returns:
+            int: Bytes descargados
+        """
         attachment_model = self.env[DEHU_NOTIFICATION_ATTACHMENT_MODEL]
-        self._process_reference_attachments(notification, attachments, attachment_model)
+        size = self._process_reference_attachments(
+            notification, attachments, attachment_model, config, client
+        )
         self._process_url_attachments(notification, attachments, attachment_model)
+        return size
 
     def _process_reference_attachments(
-        self, notification, attachments, attachment_model
+        self, notification, attachments, attachment_model, config, client
     ):
-        if hasattr(attachments, "anexosReferencia") and hasattr(
-            attachments.anexosReferencia, "anexoReferencia"
+        """Descarga en paralelo los anexos por referencia de una notificación.
+
+        Las llamadas a consultaAnexos() se reparten en un pool de hilos de
+        tamaño acotado que comparte el cliente SOAP. Como los cursores de
+        Odoo no son seguros entre hilos, los anexos se crean después en un
+        único ``create()`` desde el hilo principal.
+
+        Returns:
+            int: Bytes descargados
+        """
+        if not (
+            hasattr(attachments, "anexosReferencia")
+            and hasattr(attachments.anexosReferencia, "anexoReferencia")
         ):
-            for anexo in attachments.anexosReferencia.anexoReferencia:
-                self._download_and_create_attachment(
-                    notification, anexo, attachment_model
+            return 0
+        anexos = list(attachments.anexosReferencia.anexoReferencia or [])
+        if not anexos:
+            return 0
+
+        params = {
+            "nifReceptor": config.company_id.vat or "",
+            "Identificador": notification.dehu_id,
+            "codigoOrigen": notification.origin_code,
+        }
+        workers = max(1, min(config.attachment_download_workers, len(anexos)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(
+                    lambda anexo: self._download_attachment(
+                        client, config.wsdl_url, params, anexo
+                    ),
+                    anexos,
+                )
+            )
+        vals_list = []
+        payloads = []
+        for vals, _size in results:
+            payloads.append(vals.pop("content"))
+            vals_list.append(
+                dict(
+                    vals,
+                    notification_id=notification.id,
+                    download_attempts=1,
+                )
+            )
+        for attachment, payload in zip(attachment_model.create(vals_list), payloads):
+            self._store_attachment_content(attachment, payload)
+        return sum(size for _vals, size in results)
+
+    def _store_payload(self, record, field_name, payload, mimetype=None):
+        """Guarda un contenido descargado en el filestore sin pasar por base64.
+
+        El campo se escribe directamente como ``ir.attachment``. Con el
+        almacenamiento en fichero, el contenido volcado a disco se copia por
+        bloques a su ruta del filestore, direccionada por checksum, de modo
+        que los contenidos idénticos (anexos reenviados) se guardan una sola
+        vez y nunca se vuelve a cargar el fichero entero en memoria.
+
+        ``ir.attachment`` descarta ``store_fname``, ``checksum`` y
+        ``file_size`` en ``create()`` y ``write()``, por lo que el fichero se
+        enlaza con una actualización directa tras crear el adjunto.
+
+        Args:
+            record: Registro propietario del campo binario
+            field_name: Nombre del campo binario
+            payload: SpooledPayload o None para vaciar el campo
+            mimetype: Tipo MIME del contenido
+
+        Returns:
+            bool: True si el adjunto guardado tiene contenido
+        """
+        attachment_model = self.env["ir.attachment"].sudo()
+        attachment_model.search(
+            [
+                ("res_model", "=", record._name),
+                ("res_field", "=", field_name),
+                ("res_id", "=", record.id),
+            ]
+        ).unlink()
+        stored = False
+        if payload and payload.size:
+            vals = {
+                "name": field_name,
+                "res_model": record._name,
+                "res_field": field_name,
+                "res_id": record.id,
+                "type": "binary",
+            }
+            if mimetype:
+                vals["mimetype"] = mimetype
+            file_storage = attachment_model._storage() == "file"
+            if not file_storage:
+                vals["raw"] = payload.read()
+            attachment = attachment_model.create(vals)
+            if file_storage:
+                store_fname = self._write_filestore(attachment_model, payload)
+                attachment.flush_recordset()
+                self.env.cr.execute(
+                    SQL(
+                        """
+                        UPDATE ir_attachment
+                           SET store_fname = %s, checksum = %s, file_size = %s,
+                               db_datas = NULL
+                         WHERE id = %s
+                        """,
+                        store_fname,
+                        payload.sha1,
+                        payload.size,
+                        attachment.id,
+                    )
                 )
+                attachment.invalidate_recordset()
+            stored = bool(attachment.file_size)
+        if payload:
+            payload.close()
+        record.invalidate_recordset([field_name])
+        return stored
+
+    def _store_attachment_content(self, attachment, payload):
+        """Guarda el contenido de un anexo y su hash si se ha guardado.
+
+        Returns:
+            bool: True si el anexo tiene contenido
+        """
+        if not payload:
+            return False
+        if self._store_payload(attachment, "content", payload, attachment.mimetype):
+            attachment.content_hash = payload.sha256
+            return True
+        return False
+
+    def _write_filestore(self, attachment_model, payload):
+        """Copia por bloques un contenido a su ruta del filestore.
+
+        Returns:
+            str: Nombre del fichero relativo al filestore
+        """
+        fname = f"{payload.sha1[:2]}/{payload.sha1}"
+        full_path = attachment_model._full_path(fname)
+        if not os.path.isfile(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            tmp_path = f"{full_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            payload.file.seek(0)
+            with open(tmp_path, "wb") as target:
+                shutil.copyfileobj(payload.file, target, PAYLOAD_CHUNK_SIZE)
+            os.replace(tmp_path, full_path)
+            # Como ir.attachment._file_write: si la transacción se revierte,
+            # el recolector del filestore borrará el fichero huérfano
+            attachment_model._mark_for_gc(fname)
+        return fname
+
+    def _download_attachment(self, client, endpoint, params, anexo):
+        """Descarga el contenido de un anexo por referencia.
+
+        Se ejecuta en hilos secundarios, por lo que no debe acceder al ORM.
+        Si la descarga falla se devuelve el anexo marcado como fallido para
+        que la tarea de reintentos vuelva a intentarlo más tarde.
 
-    def _download_and_create_attachment(self, notification, anexo, attachment_model):
+        Returns:
+            tuple: (valores del anexo, bytes descargados)
+        """
+        failed_vals = {
+            "name": anexo.nombre,
+            "mimetype": anexo.mimeType,
+            "reference": anexo.referenciaDocumento,
+            "content": None,
+            "download_state": "failed",
+        }
         try:
-            config = self.env[DEHU_CONFIGURATION_MODEL].search(
-                [("active", "=", True)], limit=1
+            response = self._call_dehu(
+                client,
+                endpoint,
+                "consultaAnexos",
+                referencia=anexo.referenciaDocumento,
+                **params,
             )
+            if response.codigoRespuesta != "200":
+                error = f"{response.codigoRespuesta} - {response.descripcionRespuesta}"
+                return dict(failed_vals, download_error=error), 0
+            payload = None
+            if hasattr(response.documento, "contenido"):
+                payload = _spool_download(response.documento.contenido)
+            metadata = None
+            if hasattr(response.documento, "metadatos"):
+                metadata = response.documento.metadatos
+            del response
+            vals = {
+                "name": anexo.nombre,
+                "mimetype": anexo.mimeType,
+                "reference": anexo.referenciaDocumento,
+                "content": payload,
+                "metadata": metadata,
+                "download_state": "done",
+                "download_error": False,
+            }
+            return vals, payload.size if payload else 0
+        except Exception as e:
+            _logger.error("Error downloading attachment %s: %s", anexo.nombre, str(e))
+            return dict(failed_vals, download_error=str(e)), 0
+
+    def retry_failed_attachments(self):
+        """Reintenta la descarga de los anexos que fallaron.
+
+        Cada anexo se reintenta hasta ``MAX_ATTACHMENT_ATTEMPTS`` veces; la
+        espera entre ejecuciones la marca la frecuencia de la tarea.
+
+        Returns:
+            bool: True si la operación fue exitosa
+        """
+        attachments = self.env[DEHU_NOTIFICATION_ATTACHMENT_MODEL].search(
+            [
+                ("download_state", "=", "failed"),
+                ("download_attempts", "<", MAX_ATTACHMENT_ATTEMPTS),
+            ]
+        )
+        for notification in attachments.notification_id:
+            config = self._get_notification_configuration(notification)
+            if not config:
+                continue
             client = self._get_dehu_client(config)
             params = {
                 "nifReceptor": config.company_id.vat or "",
                 "Identificador": notification.dehu_id,
                 "codigoOrigen": notification.origin_code,
-                "referencia": anexo.referenciaDocumento,
             }
-            response = client.service.consultaAnexos(**params)
-            if response.codigoRespuesta == "200":
-                content = None
-                if hasattr(response.documento, "contenido"):
-                    content = base64.b64encode(response.documento.contenido)
-                metadata = None
-                if hasattr(response.documento, "metadatos"):
-                    metadata = response.documento.metadatos
-                attachment_model.create(
-                    {
-                        "name": anexo.nombre,
-                        "notification_id": notification.id,
-                        "mimetype": anexo.mimeType,
-                        "reference": anexo.referenciaDocumento,
-                        "content": content,
-                        "metadata": metadata,
-                    }
+            for attachment in attachments.filtered(
+                lambda a, n=notification: a.notification_id == n
+            ):
+                anexo = SimpleNamespace(
+                    nombre=attachment.name,
+                    mimeType=attachment.mimetype,
+                    referenciaDocumento=attachment.reference,
                 )
-        except Exception as e:
-            _logger.error("Error downloading attachment %s: %s", anexo.nombre, str(e))
+                vals, _size = self._download_attachment(
+                    client, config.wsdl_url, params, anexo
+                )
+                payload = vals.pop("content")
+                vals["download_attempts"] = attachment.download_attempts + 1
+                attachment.write(vals)
+                if self._store_attachment_content(attachment, payload):
+                    notification.fulltext_indexed = False
+            self._commit_batch()
+        return True
 
     def _process_url_attachments(self, notification, attachments, attachment_model):
         if hasattr(attachments, "anexosUrl") and hasattr(
@@ -256,6 +1246,10 @@ class DehuSynchronizer(models.Model):
     def download_receipt_pdf(self, notification):
         """Descarga el acuse PDF de una notificación.
 
+        El acuse se guarda en la notificación junto al CSV con el que se
+        obtuvo; mientras el CSV no cambie se sirve la copia local sin volver
+        a llamar a DEHú.
+
         Args:
             notification: Notificación de la que descargar el acuse
 
@@ -268,38 +1262,121 @@ class DehuSynchronizer(models.Model):
         if not notification.receipt_csv:
             raise UserError(_("No receipt CSV available for this notification"))
 
-        config = self.env[DEHU_CONFIGURATION_MODEL].search(
-            [("active", "=", True)], limit=1
-        )
-        if not config:
-            raise UserError(NO_ACTIVE_CONFIG_ERROR)
+        if notification.receipt_content_csv != notification.receipt_csv:
+            config = self._get_notification_configuration(notification)
+            if not config:
+                raise UserError(NO_ACTIVE_CONFIG_ERROR)
 
-        try:
-            client = self._get_dehu_client(config)
+            try:
+                client = self._get_dehu_client(config)
+                response = self._call_dehu(
+                    client,
+                    config.wsdl_url,
+                    "consultaAcusePdf",
+                    **self._prepare_receipt_params(notification, config),
+                )
+                self._apply_receipt_response(notification, response)
+            except Exception as e:
+                _logger.error(
+                    "Error downloading receipt PDF for %s: %s",
+                    notification.notification_key,
+                    str(e),
+                )
+                raise UserError(_("Error downloading receipt: %s") % str(e)) from e
 
-            params = {
-                "nifReceptor": config.company_id.vat or "",
-                "Identificador": notification.dehu_id,
-                "codigoOrigen": notification.origin_code,
-                "identificadorAcusePdf": {"csvResguardo": notification.receipt_csv},
-            }
+        return {
+            "name": notification.receipt_name,
+            "content": notification.receipt_content,
+            "mimetype": notification.receipt_mimetype,
+        }
 
-            response = client.service.consultaAcusePdf(**params)
+    def _prepare_receipt_params(self, notification, config):
+        """Prepara los parámetros de consultaAcusePdf() para una notificación."""
+        return {
+            "nifReceptor": config.company_id.vat or "",
+            "Identificador": notification.dehu_id,
+            "codigoOrigen": notification.origin_code,
+            "identificadorAcusePdf": {"csvResguardo": notification.receipt_csv},
+        }
 
-            if response.codigoRespuesta == "200":
-                return {
-                    "name": response.acusePdf.nombreAcuse,
-                    "content": base64.b64encode(response.acusePdf.contenido),
-                    "mimetype": response.acusePdf.mimeType,
-                }
+    def _apply_receipt_response(self, notification, response):
+        """Guarda en la notificación el acuse devuelto por consultaAcusePdf().
+
+        Raises:
+            UserError: Si DEHú devuelve un código de error
+        """
+        if response.codigoRespuesta != "200":
             raise UserError(
                 _("DEHú error: %s - %s")
                 % (response.codigoRespuesta, response.descripcionRespuesta)
             )
-        except Exception as e:
-            _logger.error(
-                "Error downloading receipt PDF for %s: %s",
-                notification.notification_key,
-                str(e),
-            )
-            raise UserError(_("Error downloading receipt: %s") % str(e)) from e
+        notification.write(
+            {
+                "receipt_name": response.acusePdf.nombreAcuse,
+                "receipt_mimetype": response.acusePdf.mimeType,
+                "receipt_content_csv": notification.receipt_csv,
+            }
+        )
+        self._store_payload(
+            notification,
+            "receipt_content",
+            _spool_download(response.acusePdf.contenido),
+            response.acusePdf.mimeType,
+        )
+
+    def fetch_missing_receipts(self, notifications):
+        """Descarga en paralelo los acuses que aún no están guardados.
+
+        Las llamadas a consultaAcusePdf() de cada configuración se reparten
+        en un pool de hilos; los acuses se guardan después desde el hilo
+        principal, cada uno en su propio savepoint.
+
+        Args:
+            notifications: Notificaciones cuyos acuses se necesitan
+
+        Returns:
+            recordset: Notificaciones cuyo acuse no se pudo obtener
+        """
+        missing = notifications.filtered(
+            lambda n: n.receipt_csv and n.receipt_content_csv != n.receipt_csv
+        )
+        failed = self.env[DEHU_NOTIFICATION_MODEL]
+        by_config = defaultdict(lambda: self.env[DEHU_NOTIFICATION_MODEL])
+        for notification in missing:
+            by_config[
+                self._get_notification_configuration(notification)
+            ] |= notification
+
+        for config, group in by_config.items():
+            if not config:
+                failed |= group
+                continue
+            client = self._get_dehu_client(config)
+            params_list = [
+                self._prepare_receipt_params(notification, config)
+                for notification in group
+            ]
+            workers = max(1, min(config.process_workers, len(group)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(
+                    executor.map(
+                        lambda params: self._try_call_dehu(
+                            client, config.wsdl_url, "consultaAcusePdf", params
+                        ),
+                        params_list,
+                    )
+                )
+            for notification, (response, error) in zip(group, results):
+                try:
+                    with self.env.cr.savepoint():
+                        if error:
+                            raise error
+                        self._apply_receipt_response(notification, response)
+                except Exception as e:
+                    _logger.error(
+                        "Error downloading receipt PDF for %s: %s",
+                        notification.notification_key,
+                        str(e),
+                    )
+                    failed |= notification
+        return failed
@@ -0,0 +1,456 @@
+"""Transportes SOAP para las operaciones LEMA de DEHú.
+
+El sincronizador solo necesita ``call(operation, **params)``, de modo que la
+pila SOAP se elige por configuración y se carga al crear el primer cliente:
+
+- ``ZeepTransport``: cliente zeep generado a partir del WSDL. zeep se importa
+  de forma diferida, por lo que los workers que nunca llaman a DEHú no pagan
+  su coste de importación y el módulo se carga aunque no esté instalado.
+- ``LxmlTransport``: sobres SOAP precompilados con lxml para las cuatro
+  operaciones que usa el módulo, sin descargar ni interpretar el WSDL. Las
+  respuestas MTOM se leen en streaming y sus partes binarias se vuelcan a
+  ``SpooledPayload`` sin pasar enteras por memoria.
+"""
+
+import base64
+import binascii
+import copy
+import hashlib
+import re
+import tempfile
+from email.message import Message
+from email.parser import BytesHeaderParser
+from types import SimpleNamespace
+from urllib.parse import unquote
+
+from dateutil import parser as date_parser
+from lxml import etree
+
+LEMA_NAMESPACE = "http://administracion.gob.es/punto-unico-notificaciones/"
+SOAP_ENV_NS = "http://schemas.xmlsoap.org/soap/envelope/"
+WSSE_NS = (
+    "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd"
+)
+PASSWORD_TEXT = (
+    "http://docs.oasis-open.org/wss/2004/01/"
+    "oasis-200401-wss-username-token-profile-1.0#PasswordText"
+)
+XOP_NS = "http://www.w3.org/2004/08/xop/include"
+WSDL_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Elemento raíz de la petición de cada operación
+LEMA_OPERATIONS = {
+    "localiza": "Localiza",
+    "peticionAcceso": "PeticionAcceso",
+    "consultaAnexos": "ConsultaAnexos",
+    "consultaAcusePdf": "ConsultaAcusePdf",
+}
+# Tipos del esquema que el transporte lxml debe reproducir como lo haría zeep
+REPEATED_ELEMENTS = {"item", "anexoReferencia", "anexoUrl", "opcion"}
+BINARY_ELEMENTS = {"contenido"}
+DATETIME_ELEMENTS = {"fechaPuestaDisposicion", "fechaEvento"}
+# Contenidos mayores que SPOOL_MAX_MEMORY se vuelcan a un fichero temporal
+PAYLOAD_CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+
+
+class DehuTransportError(Exception):
+    """Error HTTP o de red al llamar a DEHú."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DehuSoapFault(Exception):
+    """DEHú ha respondido con un SOAP Fault.
+
+    DEHú antepone el código de error al texto del ``faultstring`` (por
+    ejemplo ``"1201 Valor NIF..."``); se guarda en ``code`` para poder
+    distinguir los errores que justifican un reintento.
+    """
+
+    def __init__(self, message):
+        super().__init__(message)
+        match = re.match(r"\s*(\d+)\b", message or "")
+        self.code = match.group(1) if match else None
+
+
+class SpooledPayload:
+    """Contenido binario volcado por bloques a un temporal.
+
+    Calcula los hashes mientras se escribe, de forma que el contenido puede
+    recibirse por partes (desde una respuesta MTOM en streaming) o copiarse
+    desde los bytes devueltos por zeep y liberarse enseguida, sin que el
+    fichero completo tenga que estar nunca en memoria.
+
+    Args:
+        content: Contenido inicial opcional
+    """
+
+    def __init__(self, content=None):
+        self.size = 0
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        self._sha1 = hashlib.sha1()
+        self._sha256 = hashlib.sha256()
+        if content:
+            view = memoryview(content)
+            for offset in range(0, len(view), PAYLOAD_CHUNK_SIZE):
+                self.write(view[offset : offset + PAYLOAD_CHUNK_SIZE])
+
+    @property
+    def sha1(self):
+        return self._sha1.hexdigest()
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    def write(self, chunk):
+        """Añade un bloque al final del contenido."""
+        self.file.write(chunk)
+        self._sha1.update(chunk)
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+
+    def read(self):
+        """Devuelve el contenido completo en memoria."""
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self):
+        self.file.close()
+
+
+class ZeepTransport:
+    """Transporte basado en el cliente zeep generado desde el WSDL.
+
+    Args:
+        wsdl_url: URL del WSDL
+        api_key: Usuario del token WS-Security
+        session: Sesión HTTP compartida
+        timeout: Timeout de la descarga del WSDL y los XSD
+        operation_timeout: Timeout (conexión, lectura) de las operaciones
+        cache_path: Fichero SQLite donde cachear el WSDL parseado
+    """
+
+    def __init__(
+        self, wsdl_url, api_key, session, timeout, operation_timeout, cache_path
+    ):
+        from zeep import Client, Settings
+        from zeep.cache import SqliteCache
+        from zeep.exceptions import Fault, TransportError
+        from zeep.transports import Transport
+        from zeep.wsse.username import UsernameToken
+
+        self.transport_error = TransportError
+        self.fault = Fault
+        self.session = session
+        session.hooks["response"].append(_check_error_response)
+        self.client = Client(
+            wsdl_url,
+            wsse=UsernameToken(api_key, ""),
+            settings=Settings(
+                strict=False,
+                xml_huge_tree=True,
+                extra_http_headers={"Expect": "100-continue", "Content-Length": "0"},
+            ),
+            transport=Transport(
+                session=session,
+                cache=SqliteCache(path=cache_path, timeout=WSDL_CACHE_TIMEOUT),
+                timeout=timeout,
+                operation_timeout=operation_timeout,
+            ),
+        )
+
+    def call(self, operation, **params):
+        try:
+            return getattr(self.client.service, operation)(**params)
+        except self.transport_error as e:
+            raise DehuTransportError(e.message, e.status_code) from e
+        except self.fault as e:
+            raise DehuSoapFault(e.message or "SOAP Fault") from e
+
+    def close(self):
+        """Cierra las conexiones HTTP del transporte."""
+        self.session.close()
+
+
+def _check_error_response(response, *args, **kwargs):
+    """Convierte en ``DehuTransportError`` las respuestas de error sin XML.
+
+    zeep interpreta el cuerpo de cualquier respuesta como XML, de modo que un
+    error HTTP con un cuerpo en texto o HTML (un 503 del balanceador) acaba
+    en una excepción interna en lugar de un error de transporte reintentable.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    if response.status_code >= 400 and "xml" not in content_type:
+        raise DehuTransportError(
+            f"Server returned HTTP status {response.status_code}",
+            response.status_code,
+        )
+
+
+class LemaResponse(SimpleNamespace):
+    """Respuesta LEMA con acceso por atributo, como los objetos de zeep.
+
+    Los elementos opcionales ausentes valen ``None`` y los repetidos una
+    lista vacía.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return [] if name in REPEATED_ELEMENTS else None
+
+
+class LxmlTransport:
+    """Transporte ligero con plantillas de petición precompiladas.
+
+    Cada operación tiene un sobre SOAP ya construido, con la cabecera
+    WS-Security incluida, que solo hay que copiar y rellenar con los
+    parámetros de la llamada. Las respuestas, tanto en línea como MTOM, se
+    convierten a objetos ``LemaResponse``.
+
+    Args:
+        wsdl_url: URL del WSDL; el endpoint es la misma URL sin la consulta
+        api_key: Usuario del token WS-Security
+        session: Sesión HTTP compartida
+        operation_timeout: Timeout (conexión, lectura) de las operaciones
+    """
+
+    def __init__(self, wsdl_url, api_key, session, operation_timeout):
+        self.endpoint = wsdl_url.split("?", 1)[0]
+        self.session = session
+        self.timeout = operation_timeout
+        self.parser = etree.XMLParser(
+            huge_tree=True, resolve_entities=False, no_network=True
+        )
+        self.templates = {
+            operation: self._build_template(api_key, operation, element)
+            for operation, element in LEMA_OPERATIONS.items()
+        }
+
+    def _build_template(self, api_key, operation, element):
+        envelope = etree.Element(
+            f"{{{SOAP_ENV_NS}}}Envelope",
+            nsmap={"soapenv": SOAP_ENV_NS, "lema": LEMA_NAMESPACE + operation},
+        )
+        header = etree.SubElement(envelope, f"{{{SOAP_ENV_NS}}}Header")
+        security = etree.SubElement(
+            header, f"{{{WSSE_NS}}}Security", nsmap={"wsse": WSSE_NS}
+        )
+        token = etree.SubElement(security, f"{{{WSSE_NS}}}UsernameToken")
+        etree.SubElement(token, f"{{{WSSE_NS}}}Username").text = api_key
+        password = etree.SubElement(token, f"{{{WSSE_NS}}}Password")
+        password.set("Type", PASSWORD_TEXT)
+        password.text = ""
+        body = etree.SubElement(envelope, f"{{{SOAP_ENV_NS}}}Body")
+        etree.SubElement(body, f"{{{LEMA_NAMESPACE}{operation}}}{element}")
+        return envelope
+
+    def call(self, operation, **params):
+        envelope = copy.deepcopy(self.templates[operation])
+        _append_params(envelope[1][0], LEMA_NAMESPACE + operation, params)
+        with self.session.post(
+            self.endpoint,
+            data=etree.tostring(envelope, xml_declaration=True, encoding="utf-8"),
+            headers={"Content-Type": "text/xml; charset=utf-8", "SOAPAction": '""'},
+            timeout=self.timeout,
+            stream=True,
+        ) as response:
+            status_code = response.status_code
+            content_type = response.headers.get("Content-Type", "")
+            try:
+                if content_type.startswith("multipart/"):
+                    content, parts = _split_multipart(
+                        content_type, response.iter_content(PAYLOAD_CHUNK_SIZE)
+                    )
+                else:
+                    content, parts = response.content, {}
+                root = etree.fromstring(content, parser=self.parser)
+            except (etree.XMLSyntaxError, ValueError) as e:
+                raise DehuTransportError(
+                    f"Invalid SOAP response: {e}", status_code
+                ) from e
+        body = root.find(f"{{{SOAP_ENV_NS}}}Body")
+        fault = body.find(f"{{{SOAP_ENV_NS}}}Fault") if body is not None else None
+        if fault is not None:
+            raise DehuSoapFault(fault.findtext("faultstring") or "SOAP Fault")
+        if status_code >= 400 or body is None or not len(body):
+            raise DehuTransportError(
+                f"Server returned HTTP status {status_code}", status_code
+            )
+        return _to_object(body[0], parts)
+
+    def close(self):
+        """Cierra las conexiones HTTP del transporte."""
+        self.session.close()
+
+
+def _append_params(parent, namespace, params):
+    """Añade los parámetros como elementos hijos, en el orden recibido.
+
+    Sigue las convenciones de zeep: una lista repite el elemento y un
+    diccionario con ``_value_1`` es un elemento con texto cuyas demás claves
+    son atributos (como ``<opcion tipo="...">valor</opcion>``).
+    """
+    for name, value in params.items():
+        for item in value if isinstance(value, list) else [value]:
+            if item is None:
+                continue
+            child = etree.SubElement(parent, f"{{{namespace}}}{name}")
+            if isinstance(item, dict) and "_value_1" in item:
+                for attribute, attribute_value in item.items():
+                    if attribute != "_value_1":
+                        child.set(attribute, str(attribute_value))
+                child.text = str(item["_value_1"])
+            elif isinstance(item, dict):
+                _append_params(child, namespace, item)
+            else:
+                child.text = str(item)
+
+
+def _split_multipart(content_type, chunks):
+    """Separa en streaming una respuesta MTOM en el XML raíz y sus partes.
+
+    El cuerpo se recorre bloque a bloque buscando los delimitadores: el XML
+    raíz se acumula en memoria y cada parte binaria se escribe directamente
+    en un ``SpooledPayload``, de modo que el consumo de memoria no depende
+    del tamaño de los documentos.
+
+    Args:
+        content_type: Cabecera Content-Type de la respuesta
+        chunks: Iterable con los bloques del cuerpo
+
+    Returns:
+        tuple: (XML raíz, diccionario Content-ID -> SpooledPayload)
+    """
+    header = Message()
+    header["Content-Type"] = content_type
+    boundary = header.get_param("boundary")
+    if not boundary:
+        raise ValueError("Multipart response without boundary")
+    start = (header.get_param("start") or "").strip("<>")
+    delimiter = b"\r\n--" + boundary.encode("latin-1")
+    # El primer delimitador puede no ir precedido de salto de línea
+    buffer = bytearray(b"\r\n")
+    root, parts, part, state = None, {}, None, "boundary"
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            if state == "boundary":
+                index = buffer.find(delimiter)
+                if index < 0 or len(buffer) < index + len(delimiter) + 2:
+                    break
+                end = index + len(delimiter)
+                if buffer[end : end + 2] == b"--":
+                    return (bytes(root) if root is not None else None), parts
+                line_end = buffer.find(b"\r\n", end)
+                if line_end < 0:
+                    break
+                del buffer[: line_end + 2]
+                state = "headers"
+            elif state == "headers":
+                # Una parte sin cabeceras empieza directamente con la línea vacía
+                if buffer.startswith(b"\r\n"):
+                    index, separator = 0, 2
+                else:
+                    index, separator = buffer.find(b"\r\n\r\n"), 4
+                if index < 0:
+                    break
+                headers = BytesHeaderParser().parsebytes(bytes(buffer[:index]))
+                del buffer[: index + separator]
+                content_id = (headers.get("Content-ID") or "").strip(" <>")
+                if root is None and (not start or content_id == start):
+                    root = bytearray()
+                    part = _PartWriter(root.extend, headers)
+                else:
+                    parts[content_id] = SpooledPayload()
+                    part = _PartWriter(parts[content_id].write, headers)
+                state = "body"
+            else:
+                index = buffer.find(delimiter)
+                if index < 0:
+                    # Se conserva lo justo para no partir un delimitador
+                    keep = len(delimiter) - 1
+                    if len(buffer) > keep:
+                        part.write(bytes(buffer[:-keep]))
+                        del buffer[:-keep]
+                    break
+                part.write(bytes(buffer[:index]))
+                part.flush()
+                del buffer[:index]
+                state = "boundary"
+    raise ValueError("Truncated multipart response")
+
+
+class _PartWriter:
+    """Escribe el cuerpo de una parte MIME, decodificando base64 si hace falta.
+
+    Args:
+        write: Función que recibe los bloques ya decodificados
+        headers: Cabeceras de la parte
+    """
+
+    def __init__(self, write, headers):
+        self.target_write = write
+        encoding = (headers.get("Content-Transfer-Encoding") or "").strip().lower()
+        self.base64 = encoding == "base64"
+        self.pending = b""
+
+    def write(self, data):
+        if not self.base64:
+            self.target_write(data)
+            return
+        # Solo se decodifican grupos completos de cuatro caracteres
+        data = self.pending + b"".join(data.split())
+        usable = len(data) - len(data) % 4
+        self.pending = data[usable:]
+        if usable:
+            self._write_decoded(data[:usable])
+
+    def flush(self):
+        if self.pending:
+            self._write_decoded(self.pending)
+            self.pending = b""
+
+    def _write_decoded(self, data):
+        try:
+            self.target_write(base64.b64decode(data))
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 part: {e}") from e
+
+
+def _to_object(element, parts):
+    """Convierte un elemento de la respuesta en valores Python."""
+    name = etree.QName(element).localname
+    children = [child for child in element if isinstance(child.tag, str)]
+    if name in BINARY_ELEMENTS:
+        include = element.find(f"{{{XOP_NS}}}Include")
+        href = element.get("href") if include is None else include.get("href")
+        if href:
+            return parts.get(unquote(href.removeprefix("cid:")))
+        if not children:
+            return base64.b64decode(element.text or "")
+    if not children:
+        text = element.text.strip() if element.text else None
+        if text and name in DATETIME_ELEMENTS:
+            return date_parser.isoparse(text)
+        # Como zeep, el texto de un elemento con atributos va en ``_value_1``
+        attributes = {
+            key: value for key, value in element.attrib.items() if "}" not in key
+        }
+        if attributes:
+            return LemaResponse(_value_1=text, **attributes)
+        return text
+
+    values = {}
+    for child in children:
+        key = etree.QName(child).localname
+        value = _to_object(child, parts)
+        if key in REPEATED_ELEMENTS:
+            values.setdefault(key, []).append(value)
+        else:
+            values[key] = value
+    return LemaResponse(**values)
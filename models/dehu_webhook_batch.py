@@ -0,0 +1,210 @@
+"""Modelo para los lotes recibidos por el webhook de DEHú."""
+
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+from psycopg2 import IntegrityError
+
+from .dehu_sync_run import track
+
+_logger = logging.getLogger(__name__)
+
+# Claves de entrega ya vistas por este worker, para descartar reintentos sin
+# consultar la base de datos
+DELIVERY_CACHE_SIZE = 4096
+DELIVERY_CACHE_TTL = 24 * 60 * 60
+# Días que se conservan los lotes aplicados, y con ellos su clave de entrega
+BATCH_RETENTION_DAYS = 7
+# Ejecuciones de la tarea que intentan aplicar un lote antes de darlo por fallido
+MAX_BATCH_ATTEMPTS = 3
+_delivery_cache = OrderedDict()
+_delivery_cache_lock = threading.Lock()
+
+
+def _delivery_cache_hit(key):
+    """Indica si la clave se vio hace menos de DELIVERY_CACHE_TTL segundos."""
+    now = time.monotonic()
+    with _delivery_cache_lock:
+        seen = _delivery_cache.get(key)
+        if seen is not None and now - seen < DELIVERY_CACHE_TTL:
+            return True
+        _delivery_cache.pop(key, None)
+        return False
+
+
+def _delivery_cache_add(key):
+    with _delivery_cache_lock:
+        _delivery_cache[key] = time.monotonic()
+        _delivery_cache.move_to_end(key)
+        while len(_delivery_cache) > DELIVERY_CACHE_SIZE:
+            _delivery_cache.popitem(last=False)
+
+
+def _delivery_cache_discard(key):
+    with _delivery_cache_lock:
+        _delivery_cache.pop(key, None)
+
+
+class DehuWebhookBatch(models.Model):
+    """Modelo para encolar los lotes recibidos por el webhook de DEHú.
+
+    El controlador guarda el contenido recibido tal cual y responde de
+    inmediato; una tarea programada aplica después los lotes pendientes.
+    """
+
+    _name = "dehu.webhook.batch"
+    _description = _("DEHU Webhook Batch")
+    _order = "id"
+    _sql_constraints = [
+        (
+            "delivery_key_unique",
+            "unique(delivery_key)",
+            "This webhook delivery has already been received.",
+        ),
+    ]
+
+    received_date = fields.Datetime(
+        _("Received"), default=fields.Datetime.now, readonly=True
+    )
+    delivery_key = fields.Char(_("Delivery Key"), readonly=True, copy=False)
+    payload = fields.Text(_("Payload"), readonly=True)
+    item_count = fields.Integer(_("Items"), readonly=True)
+    state = fields.Selection(
+        [
+            ("pending", _("Pending")),
+            ("done", _("Done")),
+            ("error", _("Error")),
+        ],
+        string=_("Status"),
+        default="pending",
+        readonly=True,
+        index=True,
+    )
+    error_message = fields.Text(_("Error"), readonly=True)
+    attempts = fields.Integer(_("Attempts"), readonly=True)
+
+    @api.model
+    def _get_delivery_key(self, notifications, delivery_id=None):
+        """Calcula la clave de idempotencia de una entrega.
+
+        Se usa el identificador de entrega si el emisor lo envía y, si no, el
+        hash del contenido normalizado.
+        """
+        if delivery_id:
+            return f"id:{delivery_id}"
+        payload = json.dumps(notifications, sort_keys=True, separators=(",", ":"))
+        return "sha256:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @api.model
+    def _enqueue(self, notifications, delivery_id=None):
+        """Encola un lote recibido y lanza su procesamiento.
+
+        Las entregas repetidas (reintentos) se descartan antes de tocar las
+        notificaciones: primero contra la caché del worker y después contra la
+        clave única indexada de los lotes conservados.
+
+        Args:
+            notifications: Lista de notificaciones recibidas
+            delivery_id: Identificador de entrega enviado por el emisor
+
+        Returns:
+            record: Lote creado, o vacío si la entrega ya se había recibido
+        """
+        key = self._get_delivery_key(notifications, delivery_id)
+        cache_key = (self.env.cr.dbname, key)
+        if _delivery_cache_hit(cache_key) or self.search_count(
+            [("delivery_key", "=", key)], limit=1
+        ):
+            return self.browse()
+        try:
+            with self.env.cr.savepoint():
+                batch = self.create(
+                    {
+                        "delivery_key": key,
+                        "payload": json.dumps(notifications),
+                        "item_count": len(notifications),
+                    }
+                )
+        except IntegrityError:
+            # Otra petición concurrente ha registrado la misma entrega
+            return self.browse()
+        # Solo se recuerda la entrega si el lote llega a confirmarse: si la
+        # transacción se revierte, el reintento del emisor debe aceptarse
+        self.env.cr.postcommit.add(functools.partial(_delivery_cache_add, cache_key))
+        self.env["dehu.configuration"]._request_poll_for_holders(
+            (notif_data.get("titular") or {}).get("nifTitular")
+            for notif_data in notifications
+        )
+        self.env.ref("dehu_notifications.ir_cron_process_dehu_webhook")._trigger()
+        return batch
+
+    @api.model
+    def _process_pending_batches(self):
+        """Aplica los lotes pendientes, confirmando cada uno por separado.
+
+        Un lote que falla sigue pendiente para la siguiente ejecución hasta
+        ``MAX_BATCH_ATTEMPTS`` intentos; después pasa a error y libera su
+        clave de entrega para que un reenvío del emisor se acepte.
+        """
+        notification_model = self.env["dehu.notification"].sudo()
+        for batch in self.search([("state", "=", "pending")]):
+            start = time.monotonic()
+            run_vals = {
+                "operation": "webhook",
+                "start_date": fields.Datetime.now(),
+                "envelopes_seen": batch.item_count,
+            }
+            try:
+                with self.env.cr.savepoint(), track("webhook_apply"):
+                    created = notification_model._upsert_from_webhook(
+                        json.loads(batch.payload)
+                    )
+                batch.state = "done"
+                run_vals["envelopes_created"] = len(created)
+            except Exception as e:
+                _logger.error("Error applying DEHú webhook batch %s: %s", batch.id, e)
+                batch._record_failure(str(e))
+                run_vals.update({"state": "error", "error_message": str(e)})
+            run_vals["duration"] = time.monotonic() - start
+            self.env["dehu.sync.run"].create(run_vals)
+            self.env["dehu.synchronizer"]._commit_batch()
+        self.env["dehu.operation.stat"]._flush_metrics()
+        return True
+
+    def _record_failure(self, message):
+        """Anota un intento fallido y da el lote por fallido al agotarlos."""
+        self.ensure_one()
+        vals = {"attempts": self.attempts + 1, "error_message": message}
+        if vals["attempts"] >= MAX_BATCH_ATTEMPTS:
+            if self.delivery_key:
+                self.env.cr.postcommit.add(
+                    functools.partial(
+                        _delivery_cache_discard,
+                        (self.env.cr.dbname, self.delivery_key),
+                    )
+                )
+            vals.update({"state": "error", "delivery_key": False})
+        self.write(vals)
+
+    def action_retry(self):
+        """Vuelve a encolar los lotes fallidos para que la tarea los aplique."""
+        self.filtered(lambda batch: batch.state == "error").write(
+            {"state": "pending", "attempts": 0}
+        )
+        self.env.ref("dehu_notifications.ir_cron_process_dehu_webhook")._trigger()
+        return True
+
+    @api.autovacuum
+    def _gc_processed_batches(self):
+        """Elimina los lotes aplicados más antiguos que BATCH_RETENTION_DAYS."""
+        limit_date = fields.Datetime.now() - timedelta(days=BATCH_RETENTION_DAYS)
+        self.search(
+            [("state", "=", "done"), ("received_date", "<", limit_date)]
+        ).unlink()
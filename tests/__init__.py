@@ -0,0 +1,7 @@
+from . import test_benchmark
+from . import test_fulltext
+from . import test_metrics
+from . import test_partner_matching
+from . import test_synchronizer
+from . import test_transport
+from . import test_webhook
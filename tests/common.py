@@ -0,0 +1,167 @@
+"""Utilidades comunes de los tests y benchmarks de DEHú."""
+
+import logging
+import math
+import time
+import tracemalloc
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from odoo.tests.common import TransactionCase
+
+from ..models import dehu_synchronizer
+from .fake_lema import FakeLemaService
+
+_logger = logging.getLogger(__name__)
+
+HOLDER_NIF = "B00000000"
+
+
+def percentile(values, percent):
+    """Devuelve el percentil (método del rango más cercano) de unos valores."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, math.ceil(len(values) * percent / 100) - 1)]
+
+
+class Benchmark:
+    """Medidas de un escenario de benchmark.
+
+    Args:
+        name: Nombre del escenario
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.timings = []
+        self.elapsed = 0.0
+        self.queries = 0
+        self.peak_memory = 0
+
+    @contextmanager
+    def timer(self):
+        """Mide una unidad de trabajo para los percentiles de latencia."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append(time.perf_counter() - start)
+
+    @property
+    def throughput(self):
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    def report(self):
+        return (
+            f"{self.name}: {self.items} items in {self.elapsed:.2f}s "
+            f"({self.throughput:.1f} items/s), "
+            f"p50 {percentile(self.timings, 50) * 1000:.1f} ms, "
+            f"p99 {percentile(self.timings, 99) * 1000:.1f} ms, "
+            f"{self.queries} queries, "
+            f"peak memory {self.peak_memory / 1024 / 1024:.1f} MB"
+        )
+
+
+@contextmanager
+def measure(env, name):
+    """Mide un escenario: tiempo, latencias, consultas SQL y memoria.
+
+    Las latencias se toman de las unidades medidas con ``Benchmark.timer()``.
+    La memoria se mide con ``tracemalloc``, lo que también ralentiza el
+    escenario: los tiempos sirven para comparar versiones entre sí, no como
+    valores absolutos.
+
+    Args:
+        env: Entorno cuyo cursor ejecuta el escenario
+        name: Nombre del escenario en el informe
+
+    Yields:
+        Benchmark: Medidas del escenario, en el que se fija ``items``
+    """
+    result = Benchmark(name)
+    env.flush_all()
+    env.invalidate_all()
+    queries = env.cr.sql_log_count
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield result
+        env.flush_all()
+    finally:
+        result.elapsed = time.perf_counter() - start
+        result.peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result.queries = env.cr.sql_log_count - queries
+    _logger.info("DEHú benchmark %s", result.report())
+
+
+class LemaRequestsMixin:
+    """Admite los timeouts ``(conexión, lectura)`` en las peticiones de los tests.
+
+    El manejador con el que Odoo intercepta las peticiones HTTP de los tests
+    compara el timeout con un número; los transportes DEHú usan una tupla.
+    """
+
+    @classmethod
+    def _request_handler(cls, s, r, /, **kw):
+        if isinstance(kw.get("timeout"), tuple):
+            kw["timeout"] = max(kw["timeout"])
+        return super()._request_handler(s, r, **kw)
+
+
+class DehuLemaCase(LemaRequestsMixin, TransactionCase):
+    """Tests con una configuración DEHú que apunta a un servicio LEMA falso.
+
+    Las subclases ajustan el servicio (envíos, tamaños, latencia, errores)
+    con ``lema_options`` y el transporte con ``transport``.
+    """
+
+    lema_options = {}
+    transport = "lxml"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.lema = FakeLemaService(holder_nif=HOLDER_NIF, **cls.lema_options)
+        cls.lema.start()
+        cls.addClassCleanup(cls.lema.stop)
+        cls.env.company.vat = HOLDER_NIF
+        cls.config = cls.env["dehu.configuration"].create(
+            {
+                "name": "LEMA de pruebas",
+                "environment": "custom",
+                "custom_wsdl_url": cls.lema.wsdl_url,
+                "api_key": "test",
+                "transport": cls.transport,
+                "company_id": cls.env.company.id,
+                "initial_sync_days": cls.lema.span.days + 1,
+                "sync_window_hours": 24 * (cls.lema.span.days + 1),
+            }
+        )
+        cls.synchronizer = cls.env["dehu.synchronizer"]
+
+    def setUp(self):
+        super().setUp()
+        self.lema.reset()
+        dehu_synchronizer._circuit_breakers.clear()
+        self.patch(dehu_synchronizer, "RETRY_BASE_DELAY", 0)
+
+    @contextmanager
+    def benchmark(self, name):
+        """Mide un escenario que llama a DEHú, con cada llamada SOAP como unidad.
+
+        Yields:
+            Benchmark: Medidas del escenario, en el que se fija ``items``
+        """
+        synchronizer_class = type(self.synchronizer)
+        call_dehu = synchronizer_class._call_dehu
+        with measure(self.env, name) as result:
+
+            def timed_call_dehu(synchronizer, *args, **kwargs):
+                with result.timer():
+                    return call_dehu(synchronizer, *args, **kwargs)
+
+            with patch.object(synchronizer_class, "_call_dehu", timed_call_dehu):
+                yield result
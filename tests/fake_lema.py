@@ -0,0 +1,698 @@
+"""Servicio LEMA falso para tests y benchmarks.
+
+Sirve un WSDL local e implementa ``localiza``, ``peticionAcceso``,
+``consultaAnexos`` y ``consultaAcusePdf`` sobre un servidor HTTP en
+``127.0.0.1``, de forma que el sincronizador puede apuntar a él con una
+configuración de entorno ``custom`` y ejercitarse con cualquiera de los dos
+transportes SOAP. El número de envíos, el tamaño de los documentos, la
+latencia y la tasa de errores son configurables, y se pueden inyectar fallos
+concretos (HTTP 503, SOAP Fault con código DEHú o conexión cortada) para las
+siguientes llamadas.
+
+No depende de Odoo: solo de la biblioteca estándar, lxml y dateutil.
+"""
+
+import base64
+import hashlib
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dateutil import parser as date_parser
+from lxml import etree
+
+LEMA_NAMESPACE = "http://administracion.gob.es/punto-unico-notificaciones/"
+SOAP_ENV_NS = "http://schemas.xmlsoap.org/soap/envelope/"
+XOP_NS = "http://www.w3.org/2004/08/xop/include"
+PAGE_SIZE = 50
+BLOCK_SIZE = 64 * 1024
+
+# Esquema de los mensajes: (nombre, tipo o lista de hijos, repetido)
+S, DT, B64, OPT = "xsd:string", "xsd:dateTime", "xsd:base64Binary", "opcion"
+OPCIONES = [("opcion", OPT, True)]
+ORGANISMO = [("codigoOrganismo", S), ("nombreOrganismo", S)]
+ITEM = [
+    ("identificador", S),
+    ("codigoOrigen", S),
+    ("concepto", S),
+    ("descripcion", S),
+    ("organismoEmisor", ORGANISMO),
+    ("organismoEmisorRaiz", ORGANISMO),
+    ("fechaPuestaDisposicion", DT),
+    ("tipoEnvio", S),
+    ("vinculo", S),
+    ("titular", [("nombreTitular", S), ("nifTitular", S)]),
+    ("metadatosPublicos", S),
+]
+DOCUMENTO = [
+    ("nombre", S),
+    ("contenido", B64),
+    ("mimeType", S),
+    ("enlaceDocumento", S),
+    ("csvResguardo", S),
+    ("metadatos", S),
+]
+ANEXOS = [
+    (
+        "anexosReferencia",
+        [
+            (
+                "anexoReferencia",
+                [("nombre", S), ("referenciaDocumento", S), ("mimeType", S)],
+                True,
+            )
+        ],
+    ),
+    (
+        "anexosUrl",
+        [("anexoUrl", [("nombre", S), ("enlaceDocumento", S), ("mimeType", S)], True)],
+    ),
+]
+RESPUESTA = [("codigoRespuesta", S), ("descripcionRespuesta", S)]
+# Operación -> (elemento y campos de la petición, elemento y campos de la respuesta)
+MESSAGES = {
+    "localiza": (
+        "Localiza",
+        [
+            ("nifTitular", S),
+            ("nifDestinatario", S),
+            ("fechaDesde", S),
+            ("fechaHasta", S),
+            ("opcionesLocaliza", OPCIONES),
+        ],
+        "RespuestaLocaliza",
+        RESPUESTA
+        + [
+            ("nifPeticion", S),
+            ("envios", [("item", ITEM, True)]),
+            ("hayMasResultados", S),
+            ("opcionesRespuestaLocaliza", OPCIONES),
+        ],
+    ),
+    "peticionAcceso": (
+        "PeticionAcceso",
+        [
+            ("identificador", S),
+            ("codigoOrigen", S),
+            ("nifReceptor", S),
+            ("nombreReceptor", S),
+            ("evento", S),
+            ("concepto", S),
+            ("opcionesPeticionAcceso", OPCIONES),
+        ],
+        "RespuestaPeticionAcceso",
+        RESPUESTA
+        + [
+            ("identificador", S),
+            ("codigoOrigen", S),
+            ("fechaEvento", DT),
+            ("documento", DOCUMENTO),
+            ("anexos", ANEXOS),
+        ],
+    ),
+    "consultaAnexos": (
+        "ConsultaAnexos",
+        [
+            ("nifReceptor", S),
+            ("Identificador", S),
+            ("codigoOrigen", S),
+            ("referencia", S),
+        ],
+        "RespuestaConsultaAnexos",
+        RESPUESTA + [("documento", DOCUMENTO)],
+    ),
+    "consultaAcusePdf": (
+        "ConsultaAcusePdf",
+        [
+            ("nifReceptor", S),
+            ("Identificador", S),
+            ("codigoOrigen", S),
+            ("identificadorAcusePdf", [("csvResguardo", S)]),
+            ("opcionesConsultaAcusePdf", OPCIONES),
+        ],
+        "RespuestaConsultaAcusePdf",
+        RESPUESTA
+        + [
+            (
+                "acusePdf",
+                [
+                    ("nombreAcuse", S),
+                    ("contenido", B64),
+                    ("mimeType", S),
+                    ("metadatos", S),
+                ],
+            )
+        ],
+    ),
+}
+
+
+def _response_namespace(operation):
+    return LEMA_NAMESPACE + "respuesta" + operation[0].upper() + operation[1:]
+
+
+def _xsd_fields(fields):
+    """Devuelve la secuencia XSD de unos campos."""
+    elements = []
+    for name, kind, *repeated in fields:
+        occurs = 'minOccurs="0"' + (' maxOccurs="unbounded"' if repeated else "")
+        if isinstance(kind, list):
+            elements.append(
+                f'<xsd:element name="{name}" {occurs}><xsd:complexType>'
+                f"{_xsd_fields(kind)}</xsd:complexType></xsd:element>"
+            )
+        elif kind == OPT:
+            elements.append(
+                f'<xsd:element name="{name}" {occurs}><xsd:complexType>'
+                '<xsd:simpleContent><xsd:extension base="xsd:string">'
+                '<xsd:attribute name="tipo" type="xsd:string"/>'
+                "</xsd:extension></xsd:simpleContent>"
+                "</xsd:complexType></xsd:element>"
+            )
+        else:
+            elements.append(f'<xsd:element name="{name}" type="{kind}" {occurs}/>')
+    return "<xsd:sequence>" + "".join(elements) + "</xsd:sequence>"
+
+
+def build_wsdl(location):
+    """Construye el WSDL de las cuatro operaciones para el endpoint dado."""
+    schemas, messages, operations, bindings = [], [], [], []
+    for operation, (
+        request,
+        request_fields,
+        response,
+        response_fields,
+    ) in MESSAGES.items():
+        for namespace, element, fields in (
+            (LEMA_NAMESPACE + operation, request, request_fields),
+            (_response_namespace(operation), response, response_fields),
+        ):
+            schemas.append(
+                f'<xsd:schema targetNamespace="{namespace}" '
+                'elementFormDefault="qualified" '
+                'xmlns:xsd="http://www.w3.org/2001/XMLSchema">'
+                f'<xsd:element name="{element}"><xsd:complexType>'
+                f"{_xsd_fields(fields)}</xsd:complexType></xsd:element>"
+                "</xsd:schema>"
+            )
+        messages.append(
+            f'<wsdl:message name="{operation}Request">'
+            f'<wsdl:part name="parameters" element="req{len(messages)}:{request}" '
+            f'xmlns:req{len(messages)}="{LEMA_NAMESPACE + operation}"/>'
+            "</wsdl:message>"
+            f'<wsdl:message name="{operation}Response">'
+            f'<wsdl:part name="parameters" element="res{len(messages)}:{response}" '
+            f'xmlns:res{len(messages)}="{_response_namespace(operation)}"/>'
+            "</wsdl:message>"
+        )
+        operations.append(
+            f'<wsdl:operation name="{operation}">'
+            f'<wsdl:input message="tns:{operation}Request"/>'
+            f'<wsdl:output message="tns:{operation}Response"/>'
+            "</wsdl:operation>"
+        )
+        bindings.append(
+            f'<wsdl:operation name="{operation}">'
+            '<soap:operation soapAction=""/>'
+            '<wsdl:input><soap:body use="literal"/></wsdl:input>'
+            '<wsdl:output><soap:body use="literal"/></wsdl:output>'
+            "</wsdl:operation>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<wsdl:definitions name="lema" '
+        f'targetNamespace="{LEMA_NAMESPACE}lema" '
+        f'xmlns:tns="{LEMA_NAMESPACE}lema" '
+        'xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/" '
+        'xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/">'
+        f'<wsdl:types>{"".join(schemas)}</wsdl:types>'
+        f'{"".join(messages)}'
+        f'<wsdl:portType name="LemaPortType">{"".join(operations)}</wsdl:portType>'
+        '<wsdl:binding name="LemaBinding" type="tns:LemaPortType">'
+        '<soap:binding style="document" '
+        'transport="http://schemas.xmlsoap.org/soap/http"/>'
+        f'{"".join(bindings)}</wsdl:binding>'
+        '<wsdl:service name="LemaService">'
+        '<wsdl:port name="LemaPort" binding="tns:LemaBinding">'
+        f'<soap:address location="{location}"/>'
+        "</wsdl:port></wsdl:service></wsdl:definitions>"
+    ).encode("utf-8")
+
+
+class Payload:
+    """Contenido binario sintético que se genera por bloques al enviarlo."""
+
+    def __init__(self, size, seed):
+        self.size = size
+        block = hashlib.sha256(seed.encode("utf-8")).digest()
+        self.block = (block * (BLOCK_SIZE // len(block) + 1))[:BLOCK_SIZE]
+
+    def chunks(self):
+        for offset in range(0, self.size, BLOCK_SIZE):
+            yield self.block[: min(BLOCK_SIZE, self.size - offset)]
+
+    def read(self):
+        return b"".join(self.chunks())
+
+
+class FakeLemaService:
+    """Servicio LEMA falso con datos sintéticos deterministas.
+
+    Args:
+        envelopes: Número de envíos que devuelve localiza()
+        holder_nif: NIF del titular de los envíos
+        span: Periodo, hasta ahora, en el que se reparten los envíos
+        page_size: Envíos por página de localiza()
+        document_size: Bytes del documento principal de cada envío
+        annexes: Anexos por referencia de cada envío
+        annex_size: Bytes de cada anexo
+        receipt_size: Bytes de cada acuse PDF
+        latency: Segundos de espera antes de responder cada llamada
+        error_rate: Probabilidad de que una llamada falle con ``error_kind``
+        error_kind: Fallo aleatorio: ``fault:<código>``, ``http:<estado>`` o
+            ``drop`` (se corta la conexión sin responder)
+        mtom: Si es True los binarios se envían como partes MTOM/XOP; si no,
+            en base64 dentro del XML
+        seed: Semilla de los datos y de los errores aleatorios
+    """
+
+    def __init__(
+        self,
+        envelopes=0,
+        holder_nif="B00000000",
+        span=timedelta(days=7),
+        page_size=PAGE_SIZE,
+        document_size=1024,
+        annexes=0,
+        annex_size=1024,
+        receipt_size=1024,
+        latency=0.0,
+        error_rate=0.0,
+        error_kind="fault:3005",
+        mtom=True,
+        seed=0,
+    ):
+        self.envelopes = envelopes
+        self.holder_nif = holder_nif
+        self.span = span
+        self.page_size = page_size
+        self.document_size = document_size
+        self.annexes = annexes
+        self.annex_size = annex_size
+        self.receipt_size = receipt_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_kind = error_kind
+        self.mtom = mtom
+        self.seed = seed
+        self.calls = Counter()
+        self.failures = Counter()
+        self.bytes_sent = 0
+        self.end_date = datetime.now(timezone.utc).replace(microsecond=0)
+        self._random = random.Random(seed)
+        self._injected = deque()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    # Ciclo de vida
+
+    def start(self):
+        """Arranca el servidor en un puerto libre de 127.0.0.1."""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _LemaRequestHandler)
+        self._server.daemon_threads = True
+        self._server.service = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-lema", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/lema"
+
+    @property
+    def wsdl_url(self):
+        return f"{self.endpoint}?wsdl"
+
+    # Control de fallos
+
+    def inject(self, *failures):
+        """Hace fallar las siguientes llamadas, una por fallo indicado.
+
+        Args:
+            *failures: ``fault:<código>``, ``http:<estado>``, ``drop`` o
+                ``ok`` para dejar pasar una llamada
+        """
+        with self._lock:
+            self._injected.extend(failures)
+
+    def reset(self):
+        """Borra los contadores y los fallos pendientes."""
+        with self._lock:
+            self.calls.clear()
+            self.failures.clear()
+            self._injected.clear()
+            self.bytes_sent = 0
+
+    def _next_failure(self):
+        with self._lock:
+            if self._injected:
+                failure = self._injected.popleft()
+                return None if failure == "ok" else failure
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self.error_kind
+        return None
+
+    # Datos sintéticos
+
+    def envelope_id(self, index):
+        return f"{self.seed:04d}{index:016d}"
+
+    def envelope_index(self, identifier):
+        identifier = identifier or ""
+        if len(identifier) == 20 and identifier.isdigit():
+            return int(identifier[4:])
+        return None
+
+    def envelope_date(self, index):
+        step = self.span / max(self.envelopes, 1)
+        return self.end_date - self.span + step * (index + 1)
+
+    def payload(self, size, *key):
+        return Payload(size, ":".join(str(part) for part in (self.seed,) + key))
+
+    def envelopes_between(self, date_from, date_to):
+        """Índices de los envíos puestos a disposición en el rango dado."""
+        return [
+            index
+            for index in range(self.envelopes)
+            if date_from <= self.envelope_date(index) <= date_to
+        ]
+
+    # Operaciones
+
+    def localiza(self, request):
+        date_from = _parse_date(request.get("fechaDesde"), self.end_date - self.span)
+        date_to = _parse_date(request.get("fechaHasta"), self.end_date)
+        indexes = self.envelopes_between(date_from, date_to)
+        pages = max(1, -(-len(indexes) // self.page_size))
+        page = int(request.get("opcion:dehu.paginador.pagina") or 1) or 1
+        selected = indexes[(page - 1) * self.page_size : page * self.page_size]
+        items = [
+            {
+                "identificador": self.envelope_id(index),
+                "codigoOrigen": "1",
+                "concepto": f"Notificación de prueba {index}",
+                "descripcion": "Notificación generada por el servicio LEMA falso",
+                "organismoEmisor": {
+                    "codigoOrganismo": f"E{index % 20:08d}",
+                    "nombreOrganismo": f"Organismo emisor {index % 20}",
+                },
+                "organismoEmisorRaiz": {
+                    "codigoOrganismo": "E00000000",
+                    "nombreOrganismo": "Ministerio de pruebas",
+                },
+                "fechaPuestaDisposicion": self.envelope_date(index).isoformat(),
+                "tipoEnvio": "2" if index % 4 else "1",
+                "vinculo": "1",
+                "titular": {
+                    "nombreTitular": "Empresa de pruebas",
+                    "nifTitular": self.holder_nif,
+                },
+            }
+            for index in selected
+        ]
+        return {
+            "codigoRespuesta": "200",
+            "descripcionRespuesta": f'Resultado de la consulta ("{len(items)}" envios)',
+            "nifPeticion": request.get("nifTitular"),
+            "envios": {"item": items},
+            "hayMasResultados": "true" if page < pages and selected else "false",
+            "opcionesRespuestaLocaliza": {
+                "opcion": [
+                    ("dehu.paginador.totalResultados", str(len(indexes))),
+                    ("dehu.paginador.totalPag", str(pages)),
+                    ("dehu.paginador.paginaActual", str(page)),
+                ]
+            },
+        }
+
+    def peticion_acceso(self, request):
+        identifier = request.get("identificador")
+        index = self.envelope_index(identifier)
+        if index is None:
+            return {"codigoRespuesta": "404", "descripcionRespuesta": "No existe"}
+        return {
+            "codigoRespuesta": "200",
+            "descripcionRespuesta": "OK",
+            "identificador": identifier,
+            "codigoOrigen": request.get("codigoOrigen"),
+            "fechaEvento": self.end_date.isoformat(),
+            "documento": {
+                "nombre": f"notificacion_{index}.pdf",
+                "contenido": self.payload(self.document_size, "document", index),
+                "mimeType": "application/pdf",
+                "csvResguardo": f"DEHU-{identifier}",
+            },
+            "anexos": {
+                "anexosReferencia": {
+                    "anexoReferencia": [
+                        {
+                            "nombre": f"anexo_{index}_{number}.pdf",
+                            "referenciaDocumento": base64.b64encode(
+                                f"{identifier}:{number}".encode()
+                            ).decode(),
+                            "mimeType": "application/pdf",
+                        }
+                        for number in range(self.annexes)
+                    ]
+                }
+            },
+        }
+
+    def consulta_anexos(self, request):
+        reference = base64.b64decode(request.get("referencia") or "").decode()
+        identifier, _sep, number = reference.partition(":")
+        if self.envelope_index(identifier) is None:
+            return {"codigoRespuesta": "404", "descripcionRespuesta": "No existe"}
+        return {
+            "codigoRespuesta": "200",
+            "descripcionRespuesta": "Consulta realizada con éxito",
+            "documento": {
+                "nombre": f"anexo_{identifier}_{number}.pdf",
+                "contenido": self.payload(self.annex_size, "annex", reference),
+                "mimeType": "application/pdf",
+                "metadatos": f"Anexo {number}",
+            },
+        }
+
+    def consulta_acuse_pdf(self, request):
+        csv = request.get("csvResguardo") or ""
+        return {
+            "codigoRespuesta": "200",
+            "descripcionRespuesta": "Consulta realizada con éxito",
+            "acusePdf": {
+                "nombreAcuse": f"CERTIFICACION_{csv}.pdf",
+                "contenido": self.payload(self.receipt_size, "receipt", csv),
+                "mimeType": "application/pdf",
+                "metadatos": csv,
+            },
+        }
+
+
+OPERATION_HANDLERS = {
+    "Localiza": ("localiza", FakeLemaService.localiza),
+    "PeticionAcceso": ("peticionAcceso", FakeLemaService.peticion_acceso),
+    "ConsultaAnexos": ("consultaAnexos", FakeLemaService.consulta_anexos),
+    "ConsultaAcusePdf": ("consultaAcusePdf", FakeLemaService.consulta_acuse_pdf),
+}
+
+
+def _parse_date(value, default):
+    if not value:
+        return default
+    date = date_parser.isoparse(value)
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+def _read_request(body):
+    """Lee los valores de una petición SOAP por nombre local.
+
+    Las opciones se devuelven como ``opcion:<tipo>`` y las claves no
+    distinguen mayúsculas (``Identificador`` e ``identificador``).
+    """
+    values = {}
+    for element in body.iter():
+        if not isinstance(element.tag, str) or len(element):
+            continue
+        name = etree.QName(element).localname
+        text = (element.text or "").strip()
+        if name == "opcion":
+            values[f"opcion:{element.get('tipo', '').strip()}"] = text
+        else:
+            values[name] = text
+            values[name[0].lower() + name[1:]] = text
+    return values
+
+
+def _build_xml(parent, namespace, values, parts):
+    """Añade los valores a la respuesta, convirtiendo los binarios."""
+    for name, value in values.items():
+        for item in value if isinstance(value, list) else [value]:
+            if item is None:
+                continue
+            if name == "opcion":
+                child = etree.SubElement(parent, f"{{{namespace}}}opcion", tipo=item[0])
+                child.text = item[1]
+                continue
+            child = etree.SubElement(parent, f"{{{namespace}}}{name}")
+            if isinstance(item, dict):
+                _build_xml(child, namespace, item, parts)
+            elif isinstance(item, Payload):
+                if parts is None:
+                    child.text = base64.b64encode(item.read()).decode()
+                else:
+                    content_id = f"{uuid.uuid4()}@fake-lema"
+                    etree.SubElement(
+                        child, f"{{{XOP_NS}}}Include", href=f"cid:{content_id}"
+                    )
+                    parts.append((content_id, item))
+            else:
+                child.text = str(item)
+
+
+def _fault(code, message):
+    envelope = etree.Element(f"{{{SOAP_ENV_NS}}}Envelope", nsmap={"soap": SOAP_ENV_NS})
+    body = etree.SubElement(envelope, f"{{{SOAP_ENV_NS}}}Body")
+    fault = etree.SubElement(body, f"{{{SOAP_ENV_NS}}}Fault")
+    etree.SubElement(fault, "faultcode").text = "soap:Server"
+    etree.SubElement(fault, "faultstring").text = f"{code} {message}"
+    return etree.tostring(envelope, xml_declaration=True, encoding="utf-8")
+
+
+class _LemaRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/lema":
+            self._send(404, "text/plain", [b"Not found"])
+            return
+        self._send(200, "text/xml; charset=utf-8", [build_wsdl(self.service.endpoint)])
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        service = self.service
+        try:
+            root = etree.fromstring(body)
+            request = root.find(f"{{{SOAP_ENV_NS}}}Body")[0]
+            element = etree.QName(request).localname
+            operation, handler = OPERATION_HANDLERS[element]
+        except (etree.XMLSyntaxError, TypeError, IndexError, KeyError):
+            self._send(500, "text/xml; charset=utf-8", [_fault(1000, "Bad request")])
+            return
+        with service._lock:
+            service.calls[operation] += 1
+        if service.latency:
+            time.sleep(service.latency)
+
+        failure = service._next_failure()
+        if failure:
+            with service._lock:
+                service.failures[failure] += 1
+            kind, _sep, value = failure.partition(":")
+            if kind == "drop":
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            if kind == "http":
+                self._send(int(value), "text/plain", [b"Service unavailable"])
+                return
+            self._send(
+                500,
+                "text/xml; charset=utf-8",
+                [_fault(value, "Ha superado el límite de peticiones")],
+            )
+            return
+
+        response = handler(service, _read_request(request))
+        namespace = _response_namespace(operation)
+        envelope = etree.Element(
+            f"{{{SOAP_ENV_NS}}}Envelope",
+            nsmap={"SOAP-ENV": SOAP_ENV_NS, "ns1": namespace},
+        )
+        response_element = etree.SubElement(
+            etree.SubElement(envelope, f"{{{SOAP_ENV_NS}}}Body"),
+            f"{{{namespace}}}Respuesta{element}",
+        )
+        parts = [] if service.mtom else None
+        _build_xml(response_element, namespace, response, parts)
+        xml = etree.tostring(envelope, xml_declaration=True, encoding="utf-8")
+        if not parts:
+            self._send(200, "text/xml; charset=utf-8", [xml])
+            return
+
+        boundary = f"uuid:{uuid.uuid4()}"
+        chunks = [
+            f"--{boundary}\r\n"
+            'Content-Type: application/xop+xml; charset=utf-8; type="text/xml"\r\n'
+            "Content-Transfer-Encoding: binary\r\n"
+            "Content-ID: <root.message@fake-lema>\r\n\r\n".encode(),
+            xml,
+        ]
+        for content_id, payload in parts:
+            chunks.append(
+                f"\r\n--{boundary}\r\n"
+                "Content-Type: application/octet-stream\r\n"
+                "Content-Transfer-Encoding: binary\r\n"
+                f"Content-ID: <{content_id}>\r\n\r\n".encode()
+            )
+            chunks.append(payload)
+        chunks.append(f"\r\n--{boundary}--\r\n".encode())
+        self._send(
+            200,
+            f'multipart/related; type="application/xop+xml"; boundary="{boundary}"; '
+            'start="<root.message@fake-lema>"; start-info="text/xml"',
+            chunks,
+        )
+
+    def _send(self, status, content_type, chunks):
+        """Envía la respuesta; los ``Payload`` se escriben por bloques."""
+        length = sum(
+            chunk.size if isinstance(chunk, Payload) else len(chunk) for chunk in chunks
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        for chunk in chunks:
+            for block in chunk.chunks() if isinstance(chunk, Payload) else [chunk]:
+                self.wfile.write(block)
+        with self.service._lock:
+            self.service.bytes_sent += length
@@ -0,0 +1,360 @@
+"""Benchmarks de extremo a extremo contra el servicio LEMA falso.
+
+No forman parte de la batería por defecto; se lanzan con
+``--test-tags dehu_benchmark`` y cada escenario deja en el log su informe
+(rendimiento, p50/p99, consultas SQL y pico de memoria).
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import requests
+from odoo.tests import tagged
+from odoo.tests.common import HttpCase, TransactionCase
+from odoo.tools import SQL
+
+from ..models.dehu_transport import LxmlTransport, ZeepTransport
+from .common import HOLDER_NIF, DehuLemaCase, measure
+
+FETCH_ENVELOPES = 1000
+DEDUP_ENVELOPES = 5000
+ACCEPT_ENVELOPES = 200
+ANNEX_ENVELOPES = 20
+LIST_NOTIFICATIONS = 100000
+LIST_REPEAT = 20
+# Índices de los listados y filtros, que se quitan para medir sin ellos
+LIST_INDEXES = (
+    "dehu_notification_available_date_index",
+    "dehu_notification_status_date_index",
+    "dehu_notification_holder_date_index",
+    "dehu_notification_pending_deadline_index",
+    "dehu_notification_fulltext_index",
+    "dehu_notification_issuer_entity_trgm_index",
+)
+LIST_FIELDS = [
+    "available_date",
+    "subject",
+    "notification_type",
+    "status",
+    "acceptance_deadline",
+    "issuer_entity",
+    "holder_name",
+    "attachment_count",
+]
+LARGE_DOCUMENT_SIZE = 100 * 1024 * 1024
+# Pico de memoria admitido al descargar en streaming documentos de 100 MB
+LARGE_DOCUMENT_MAX_PEAK = 32 * 1024 * 1024
+TRANSPORT_CALLS = 200
+# Módulos que carga cada transporte al crear el primer cliente
+TRANSPORT_IMPORTS = {
+    "zeep": "import zeep, zeep.cache, zeep.transports, zeep.wsse.username",
+    "lxml": "import lxml.etree, requests",
+}
+WEBHOOK_BATCHES = 50
+WEBHOOK_BATCH_SIZE = 100
+
+
+@tagged("post_install", "-at_install", "-standard", "dehu_benchmark")
+class TestFetchBenchmark(DehuLemaCase):
+    lema_options = {"envelopes": FETCH_ENVELOPES, "latency": 0.01}
+
+    def test_fetch(self):
+        notification_model = self.env["dehu.notification"]
+        with self.benchmark("fetch") as result:
+            self.synchronizer.fetch_pending_notifications(full_resync=True)
+            result.items = notification_model.search_count(
+                [("configuration_id", "=", self.config.id)]
+            )
+        self.assertFalse(self.config.last_sync_error)
+        self.assertEqual(result.items, FETCH_ENVELOPES)
+
+
+@tagged("post_install", "-at_install", "-standard", "dehu_benchmark")
+class TestDedupBenchmark(DehuLemaCase):
+    lema_options = {"envelopes": DEDUP_ENVELOPES, "page_size": 500}
+
+    def test_dedup(self):
+        client = self.synchronizer._get_dehu_client(self.config)
+        notifications, _total = self.synchronizer._localiza(
+            client,
+            self.config,
+            datetime.now() - timedelta(days=30),
+            datetime.now(),
+        )
+        self.assertEqual(len(notifications), DEDUP_ENVELOPES)
+        # Primera pasada: todos los envíos son nuevos; segunda: ya existen
+        for name, expected in (("dedup_new", DEDUP_ENVELOPES), ("dedup_existing", 0)):
+            with self.benchmark(name) as result, result.timer():
+                created = self.synchronizer._create_new_notifications(
+                    notifications, self.config
+                )
+                result.items = len(notifications)
+            self.assertEqual(len(created), expected)
+
+
+@tagged("post_install", "-at_install", "-standard", "dehu_benchmark")
+class TestAcceptBenchmark(DehuLemaCase):
+    lema_options = {
+        "envelopes": ACCEPT_ENVELOPES,
+        "document_size": 256 * 1024,
+        "latency": 0.02,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.synchronizer.fetch_pending_notifications(full_resync=True)
+        cls.notifications = cls.env["dehu.notification"].search(
+            [("configuration_id", "=", cls.config.id)]
+        )
+
+    def test_accept(self):
+        self.notifications.write({"processing_queued": True})
+        with self.benchmark("accept") as result:
+            self.synchronizer.process_notification_queue()
+            result.items = len(
+                self.notifications.filtered_domain([("status", "=", "accepted")])
+            )
+        self.assertEqual(result.items, ACCEPT_ENVELOPES)
+        self.assertEqual(self.lema.calls["peticionAcceso"], ACCEPT_ENVELOPES)
+
+
+@tagged("post_install", "-at_install", "-standard", "dehu_benchmark")
+class TestAnnexBenchmark(DehuLemaCase):
+    lema_options = {
+        "envelopes": ANNEX_ENVELOPES,
+        "annexes": 5,
+        "annex_size": 2 * 1024 * 1024,
+        "latency": 0.02,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.synchronizer.fetch_pending_notifications(full_resync=True)
+        cls.notifications = cls.env["dehu.notification"].search(
+            [("configuration_id", "=", cls.config.id)]
+        )
+
+    def test_annex_download(self):
+        self.notifications.write({"processing_queued": True})
+        with self.benchmark("annex_download") as result:
+            self.synchronizer.process_notification_queue()
+            result.items = self.env["dehu.notification.attachment"].search_count(
+                [("notification_id", "in", self.notifications.ids)]
+            )
+        self.assertEqual(result.items, ANNEX_ENVELOPES * 5)
+        self.assertEqual(self.lema.calls["consultaAnexos"], ANNEX_ENVELOPES * 5)
+
+
+@tagged("post_install", "-at_install", "-standard", "dehu_benchmark")
+class TestListBenchmark(TransactionCase):
+    """Latencia del listado y las búsquedas habituales con y sin índices.
+
+    Las notificaciones se insertan por SQL para que la carga sea rápida; los
+    índices se quitan dentro de un savepoint que después se revierte.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env.cr.execute(
+            """
+            INSERT INTO dehu_notification (
+                dehu_id, origin_code, notification_key, subject, description,
+                notification_type, status, available_date, acceptance_deadline,
+                issuer_entity, holder_nif, holder_name, attachment_count,
+                has_attachments, storage_tier
+            )
+            SELECT 'BENCH' || n, 1, 'BENCH' || n || '-1',
+                   'Notificación ' || n, 'Requerimiento de documentación ' || n,
+                   '2', (ARRAY['pending', 'accepted', 'read'])[n %% 3 + 1],
+                   now() at time zone 'UTC' - n * interval '1 minute',
+                   now() at time zone 'UTC' - n * interval '1 minute'
+                       + interval '10 days',
+                   'Organismo emisor ' || n %% 200, 'B' || lpad((n %% 500)::text, 8, '0'),
+                   'Titular ' || n %% 500, 0, false, 'hot'
+              FROM generate_series(1, %s) n
+            """,
+            [LIST_NOTIFICATIONS],
+        )
+        cls.env.cr.execute("ANALYZE dehu_notification")
+
+    def _run_scenarios(self, variant):
+        notification_model = self.env["dehu.notification"]
+        scenarios = {
+            "list": [],
+            "status": [("status", "=", "pending")],
+            "holder": [("holder_nif", "=", "B00000042")],
+            "issuer": [("issuer_entity", "ilike", "emisor 42")],
+            "key": [("dehu_id", "=", "BENCH4242"), ("origin_code", "=", 1)],
+            "fulltext": [("fulltext", "=", "requerimiento 4242")],
+        }
+        for name, domain in scenarios.items():
+            with measure(self.env, f"list_{name}[{variant}]") as result:
+                for _i in range(LIST_REPEAT):
+                    self.env.invalidate_all()
+                    with result.timer():
+                        notification_model.search_read(domain, LIST_FIELDS, limit=80)
+                        notification_model.search_count(domain)
+                result.items = LIST_REPEAT
+
+    def test_list_latency(self):
+        self._run_scenarios("indexed")
+        self.env.cr.execute("SAVEPOINT dehu_list_benchmark")
+        for index in LIST_INDEXES:
+            self.env.cr.execute(SQL("DROP INDEX IF EXISTS %s", SQL.identifier(index)))
+        self.env.cr.execute("ANALYZE dehu_notification")
+        self._run_scenarios("unindexed")
+        self.env.cr.execute("ROLLBACK TO SAVEPOINT dehu_list_benchmark")
+
+
+@tagged("post_install", "-at_install", "-standard", "dehu_benchmark")
+class TestLargeDocumentBenchmark(DehuLemaCase):
+    """Memoria al descargar documentos, anexos y acuses de 100 MB.
+
+    Con el transporte lxml las partes MTOM se vuelcan a disco por bloques, de
+    modo que el pico no depende del tamaño del documento.
+    """
+
+    lema_options = {
+        "envelopes": 1,
+        "document_size": LARGE_DOCUMENT_SIZE,
+        "annexes": 1,
+        "annex_size": LARGE_DOCUMENT_SIZE,
+        "receipt_size": LARGE_DOCUMENT_SIZE,
+    }
+    max_peak_memory = LARGE_DOCUMENT_MAX_PEAK
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.synchronizer.fetch_pending_notifications(full_resync=True)
+        cls.notification = cls.env["dehu.notification"].search(
+            [("configuration_id", "=", cls.config.id)]
+        )
+
+    def _check_peak_memory(self, result):
+        if self.max_peak_memory:
+            self.assertLess(result.peak_memory, self.max_peak_memory)
+
+    def test_large_document(self):
+        with self.benchmark(f"large_document[{self.transport}]") as result:
+            self.synchronizer.process_notification(self.notification)
+            result.items = 2
+        self.assertEqual(self.notification.status, "accepted")
+        self.assertEqual(
+            self.notification.attachment_ids.mapped("download_state"), ["done"]
+        )
+        self._check_peak_memory(result)
+
+    def test_large_receipt(self):
+        self.notification.receipt_csv = "CSV-LARGE"
+        client = self.synchronizer._get_dehu_client(self.config)
+        with self.benchmark(f"large_receipt[{self.transport}]") as result:
+            response = self.synchronizer._call_dehu(
+                client,
+                self.config.wsdl_url,
+                "consultaAcusePdf",
+                **self.synchronizer._prepare_receipt_params(
+                    self.notification, self.config
+                ),
+            )
+            self.synchronizer._apply_receipt_response(self.notification, response)
+            del response
+            result.items = 1
+        self.assertEqual(self.notification.receipt_content_csv, "CSV-LARGE")
+        self._check_peak_memory(result)
+
+
+@tagged("post_install", "-at_install", "-standard", "dehu_benchmark")
+class TestLargeDocumentZeepBenchmark(TestLargeDocumentBenchmark):
+    """zeep carga la respuesta completa en memoria: solo se informa del pico."""
+
+    transport = "zeep"
+    max_peak_memory = 0
+
+
+@tagged("post_install", "-at_install", "-standard", "dehu_benchmark")
+class TestTransportBenchmark(DehuLemaCase):
+    """Coste de importación, de creación del cliente y por llamada de cada transporte."""
+
+    lema_options = {"envelopes": 50}
+
+    def _create_transport(self, transport, cache_path):
+        if transport == "zeep":
+            return ZeepTransport(
+                self.lema.wsdl_url, "test", requests.Session(), 5, (5, 30), cache_path
+            )
+        return LxmlTransport(self.lema.wsdl_url, "test", requests.Session(), (5, 30))
+
+    def test_transports(self):
+        now = datetime.now(timezone.utc)
+        params = {
+            "nifTitular": self.lema.holder_nif,
+            "fechaDesde": (now - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%S"),
+            "fechaHasta": now.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        for transport, imports in TRANSPORT_IMPORTS.items():
+            # La importación se mide en un intérprete nuevo
+            with measure(self.env, f"transport_import[{transport}]") as result:
+                with result.timer():
+                    subprocess.run([sys.executable, "-c", imports], check=True)
+                result.items = 1
+
+            with tempfile.TemporaryDirectory() as cache_dir:
+                with measure(self.env, f"transport_client[{transport}]") as result:
+                    with result.timer():
+                        client = self._create_transport(
+                            transport, os.path.join(cache_dir, "wsdl.db")
+                        )
+                    result.items = 1
+                try:
+                    with measure(self.env, f"transport_call[{transport}]") as result:
+                        for _i in range(TRANSPORT_CALLS):
+                            with result.timer():
+                                response = client.call("localiza", **params)
+                        result.items = TRANSPORT_CALLS
+                finally:
+                    client.close()
+            self.assertEqual(len(response.envios.item), 50)
+
+
+@tagged("post_install", "-at_install", "-standard", "dehu_benchmark")
+class TestWebhookBenchmark(HttpCase):
+    def _webhook_payload(self, batch):
+        date = datetime.now(timezone.utc) - timedelta(days=1)
+        return {
+            "notifications": [
+                {
+                    "identificador": f"WH{batch:06d}{index:06d}",
+                    "codigoOrigen": "1",
+                    "concepto": f"Notificación {batch}-{index}",
+                    "tipoEnvio": "2",
+                    "fechaPuestaDisposicion": date.isoformat(),
+                    "organismoEmisor": {"nombreOrganismo": f"Organismo {index % 20}"},
+                    "titular": {"nifTitular": HOLDER_NIF},
+                }
+                for index in range(WEBHOOK_BATCH_SIZE)
+            ]
+        }
+
+    def test_webhook_ingestion(self):
+        with measure(self.env, "webhook_ingestion") as result:
+            for batch in range(WEBHOOK_BATCHES):
+                with result.timer():
+                    response = self.url_open(
+                        "/dehu/notification/update",
+                        data=json.dumps(self._webhook_payload(batch)),
+                        headers={"Content-Type": "application/json"},
+                    )
+                self.assertEqual(response.status_code, 202)
+            self.env["dehu.webhook.batch"]._process_pending_batches()
+            result.items = self.env["dehu.notification"].search_count(
+                [("dehu_id", "=like", "WH%")]
+            )
+        self.assertEqual(result.items, WEBHOOK_BATCHES * WEBHOOK_BATCH_SIZE)
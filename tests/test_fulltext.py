@@ -0,0 +1,49 @@
+"""Tests de la búsqueda de texto completo de notificaciones."""
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+
+@tagged("post_install", "-at_install")
+class TestFulltextSearch(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.notification_model = cls.env["dehu.notification"]
+        cls.requirement, cls.resolution = cls.notification_model.create(
+            [
+                {
+                    "dehu_id": "FT-1",
+                    "origin_code": 1,
+                    "subject": "Requerimiento de información",
+                },
+                {
+                    "dehu_id": "FT-2",
+                    "origin_code": 1,
+                    "subject": "Resolución del expediente",
+                },
+            ]
+        )
+        cls.notifications = cls.requirement | cls.resolution
+
+    def _search(self, operator, value):
+        return self.notification_model.search(
+            [("id", "in", self.notifications.ids), ("fulltext", operator, value)]
+        )
+
+    def test_positive_operators(self):
+        for operator in ("=", "ilike"):
+            self.assertEqual(self._search(operator, "requerimiento"), self.requirement)
+
+    def test_negated_operators(self):
+        for operator in ("!=", "not ilike"):
+            self.assertEqual(self._search(operator, "requerimiento"), self.resolution)
+
+    def test_empty_value(self):
+        self.assertEqual(self._search("ilike", ""), self.notifications)
+        self.assertFalse(self._search("not ilike", ""))
+
+    def test_unsupported_operator(self):
+        with self.assertRaises(UserError):
+            self._search("in", ["requerimiento"])
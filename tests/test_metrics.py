@@ -0,0 +1,182 @@
+"""Tests de las métricas de operaciones DEHú."""
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase, HttpCase, TransactionCase
+from odoo.tools import mute_logger
+
+from ..models.dehu_sync_run import (
+    LATENCY_BUCKETS,
+    increment,
+    observe,
+    render_metrics,
+    requeue_samples,
+    take_samples,
+    track,
+)
+
+DURATION = "dehu_operation_duration_seconds"
+
+
+def _by_sample(samples):
+    return {(sample, labels): value for _metric, sample, labels, value in samples}
+
+
+class TestMetricSamples(BaseCase):
+    def setUp(self):
+        super().setUp()
+        # Las métricas son globales del worker: se parte de cero
+        take_samples()
+        self.addCleanup(take_samples)
+
+    def test_take_samples_drains_counters(self):
+        increment("dehu_downloaded_bytes_total", 10)
+        increment("dehu_downloaded_bytes_total", 5)
+        self.assertEqual(
+            take_samples(),
+            [("dehu_downloaded_bytes_total", "dehu_downloaded_bytes_total", (), 15)],
+        )
+        self.assertEqual(take_samples(), [])
+
+    def test_track_records_outcome_and_duration(self):
+        with track("localiza"):
+            pass
+        with self.assertRaises(ValueError), track("localiza"):
+            raise ValueError("error")
+        samples = _by_sample(take_samples())
+        operation = (("operation", "localiza"),)
+        self.assertEqual(
+            samples[("dehu_operations_total", operation + (("outcome", "ok"),))], 1
+        )
+        self.assertEqual(
+            samples[("dehu_operations_total", operation + (("outcome", "error"),))],
+            1,
+        )
+        self.assertEqual(samples[(f"{DURATION}_count", operation)], 2)
+        self.assertEqual(
+            samples[(f"{DURATION}_bucket", operation + (("le", "+Inf"),))], 2
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        observe(DURATION, 0.3, operation="localiza")
+        observe(DURATION, 7, operation="localiza")
+        samples = _by_sample(take_samples())
+        operation = (("operation", "localiza"),)
+        expected = [int(0.3 <= bound) + int(7 <= bound) for bound in LATENCY_BUCKETS]
+        self.assertEqual(
+            [
+                samples[(f"{DURATION}_bucket", operation + (("le", str(bound)),))]
+                for bound in LATENCY_BUCKETS
+            ],
+            expected,
+        )
+        self.assertAlmostEqual(samples[(f"{DURATION}_sum", operation)], 7.3)
+
+    def test_requeued_samples_are_taken_again(self):
+        increment("dehu_downloaded_bytes_total", 10)
+        samples = take_samples()
+        requeue_samples(samples)
+        self.assertEqual(take_samples(), samples)
+
+    def test_render_histogram(self):
+        observe(DURATION, 0.3, operation="localiza")
+        lines = render_metrics(take_samples()).splitlines()
+        self.assertEqual(lines[1], f"# TYPE {DURATION} histogram")
+        self.assertIn(f'{DURATION}_bucket{{operation="localiza",le="0.25"}} 0', lines)
+        self.assertIn(f'{DURATION}_bucket{{operation="localiza",le="0.5"}} 1', lines)
+        self.assertIn(f'{DURATION}_sum{{operation="localiza"}} 0.3', lines)
+        # Cubos por límite creciente, +Inf el último, y después suma y total
+        self.assertEqual(
+            [line.split(" ")[0] for line in lines[-3:]],
+            [
+                f'{DURATION}_bucket{{operation="localiza",le="+Inf"}}',
+                f'{DURATION}_sum{{operation="localiza"}}',
+                f'{DURATION}_count{{operation="localiza"}}',
+            ],
+        )
+        bounds = [
+            float(line.split('le="')[1].split('"')[0])
+            for line in lines
+            if line.startswith(f"{DURATION}_bucket")
+        ]
+        self.assertEqual(bounds, sorted(bounds))
+
+    def test_render_gauges_and_unknown_metrics(self):
+        text = render_metrics(
+            [("custom_total", "custom_total", (), 2.5)],
+            {("dehu_queue_depth", (("queue", "webhook"),)): 3},
+        )
+        self.assertIn("# TYPE custom_total untyped\ncustom_total 2.5\n", text)
+        self.assertIn(
+            '# TYPE dehu_queue_depth gauge\ndehu_queue_depth{queue="webhook"} 3\n', text
+        )
+
+
+@tagged("post_install", "-at_install")
+class TestOperationStats(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        take_samples()
+        self.addCleanup(take_samples)
+        self.stat_model = self.env["dehu.operation.stat"]
+
+    def _test_total(self):
+        samples = _by_sample(self.stat_model._get_samples())
+        return samples.get(("dehu_downloaded_bytes_total", (("test", "stats"),)))
+
+    def test_flushed_samples_are_summed(self):
+        increment("dehu_downloaded_bytes_total", 3, test="stats")
+        self.stat_model._flush_metrics()
+        increment("dehu_downloaded_bytes_total", 4, test="stats")
+        self.stat_model._flush_metrics()
+        self.assertEqual(self._test_total(), 7)
+        self.assertEqual(take_samples(), [])
+
+    def test_compaction_keeps_totals(self):
+        for value in (3, 4):
+            increment("dehu_downloaded_bytes_total", value, test="stats")
+            self.stat_model._flush_metrics()
+        domain = [("labels", "=", '[["test", "stats"]]')]
+        self.assertEqual(self.stat_model.search_count(domain), 2)
+        self.stat_model._gc_compact_stats()
+        self.assertEqual(self.stat_model.search_count(domain), 1)
+        self.assertEqual(self._test_total(), 7)
+
+    @mute_logger("odoo.addons.dehu_notifications.models.dehu_operation_stat")
+    def test_failed_flush_keeps_samples(self):
+        increment("dehu_downloaded_bytes_total", 3, test="stats")
+
+        def failing_create(*args, **kwargs):
+            raise ValueError("error")
+
+        self.patch(type(self.stat_model), "create", failing_create)
+        self.stat_model._flush_metrics()
+        self.assertIn(
+            ("dehu_downloaded_bytes_total", (("test", "stats"),)),
+            _by_sample(take_samples()),
+        )
+
+
+@tagged("post_install", "-at_install")
+class TestMetricsEndpoint(HttpCase):
+    def test_endpoint_requires_token(self):
+        response = self.url_open("/dehu/metrics")
+        self.assertEqual(response.status_code, 404)
+        self.env["ir.config_parameter"].set_param(
+            "dehu_notifications.metrics_token", "secret"
+        )
+        response = self.url_open(
+            "/dehu/metrics", headers={"Authorization": "Bearer wrong"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_endpoint_renders_metrics(self):
+        self.env["ir.config_parameter"].set_param(
+            "dehu_notifications.metrics_token", "secret"
+        )
+        increment("dehu_downloaded_bytes_total", 3, test="endpoint")
+        response = self.url_open(
+            "/dehu/metrics", headers={"Authorization": "Bearer secret"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('dehu_downloaded_bytes_total{test="endpoint"} 3', response.text)
+        self.assertIn('dehu_queue_depth{queue="webhook"}', response.text)
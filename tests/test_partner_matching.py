@@ -0,0 +1,92 @@
+"""Tests de la vinculación de notificaciones con contactos por NIF."""
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase, TransactionCase
+
+from ..models.dehu_notification import normalize_nif
+
+
+class TestNormalizeNif(BaseCase):
+    def test_separators_and_case(self):
+        self.assertEqual(normalize_nif(" b-12.345.678 "), "B12345678")
+        self.assertEqual(normalize_nif("12345678z"), "12345678Z")
+
+    def test_spanish_country_prefix(self):
+        self.assertEqual(normalize_nif("ESB12345678"), "B12345678")
+        self.assertEqual(normalize_nif("es 12345678-Z"), "12345678Z")
+        # Un NIF que empieza por ES sin prefijo de país se conserva
+        self.assertEqual(normalize_nif("ES123"), "ES123")
+
+    def test_empty_values(self):
+        self.assertEqual(normalize_nif(None), "")
+        self.assertEqual(normalize_nif(False), "")
+        self.assertEqual(normalize_nif(" - "), "")
+
+
+@tagged("post_install", "-at_install")
+class TestPartnerMatching(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company_partner = cls.env["res.partner"].create(
+            {"name": "Empresa de pruebas", "is_company": True, "vat": "ES-B12345678"}
+        )
+        cls.contact = cls.env["res.partner"].create(
+            {"name": "Contacto", "parent_id": cls.company_partner.id}
+        )
+        cls.notification_model = cls.env["dehu.notification"]
+
+    def _create_notification(self, identifier, **vals):
+        return self.notification_model.create(
+            dict({"dehu_id": identifier, "origin_code": 1, "status": "pending"}, **vals)
+        )
+
+    def test_match_by_holder_nif(self):
+        notification = self._create_notification("N-1", holder_nif="b12345678")
+        self.assertEqual(notification._match_partners(), 1)
+        self.assertEqual(notification.partner_id, self.company_partner)
+        self.assertEqual(notification.related_document, self.company_partner)
+
+    def test_match_by_recipient_nif(self):
+        notification = self._create_notification(
+            "N-1", holder_nif="A00000000", recipient_nif="B12345678"
+        )
+        notification._match_partners()
+        self.assertEqual(notification.partner_id, self.company_partner)
+
+    def test_existing_partner_is_kept(self):
+        other = self.env["res.partner"].create({"name": "Otro"})
+        notification = self._create_notification(
+            "N-1", holder_nif="B12345678", partner_id=other.id
+        )
+        self.assertEqual(notification._match_partners(), 0)
+        self.assertEqual(notification.partner_id, other)
+
+    def test_map_follows_partner_changes(self):
+        notification = self._create_notification("N-1", holder_nif="A11111111")
+        self.assertEqual(notification._match_partners(), 0)
+        partner = self.env["res.partner"].create(
+            {"name": "Nuevo titular", "is_company": True, "vat": "A11111111"}
+        )
+        self.assertEqual(notification._match_partners(), 1)
+        self.assertEqual(notification.partner_id, partner)
+
+    def test_webhook_ingestion_matches_partners(self):
+        created = self.notification_model._upsert_from_webhook(
+            [
+                {
+                    "identificador": "N-1",
+                    "codigoOrigen": "1",
+                    "titular": {"nifTitular": "B12345678"},
+                }
+            ]
+        )
+        self.assertEqual(created.partner_id, self.company_partner)
+
+    def test_backfill_links_existing_notifications(self):
+        notifications = self._create_notification(
+            "N-1", holder_nif="B12345678"
+        ) | self._create_notification("N-2", holder_nif="A00000000")
+        self.notification_model._cron_match_partners()
+        self.assertEqual(notifications[0].partner_id, self.company_partner)
+        self.assertFalse(notifications[1].partner_id)
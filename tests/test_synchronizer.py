@@ -0,0 +1,430 @@
+"""Tests del sincronizador contra el servicio LEMA falso."""
+
+import base64
+import hashlib
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import requests
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+from odoo.tools import mute_logger
+from psycopg2 import IntegrityError
+
+from ..models import dehu_synchronizer
+from ..models.dehu_synchronizer import (
+    CircuitBreaker,
+    DehuCircuitOpenError,
+    _is_transient_error,
+)
+from ..models.dehu_transport import DehuSoapFault, DehuTransportError, SpooledPayload
+from .common import DehuLemaCase
+
+ENVELOPES = 120
+
+
+@tagged("post_install", "-at_install")
+class TestFetchNotifications(DehuLemaCase):
+    lema_options = {"envelopes": ENVELOPES}
+
+    def _localiza_all(self):
+        client = self.synchronizer._get_dehu_client(self.config)
+        notifications, _total = self.synchronizer._localiza(
+            client,
+            self.config,
+            datetime.now() - timedelta(days=30),
+            datetime.now(),
+        )
+        return notifications
+
+    def test_fetch_creates_each_envelope_once(self):
+        report = self.synchronizer._sync_configuration(self.config, full_resync=True)
+        self.assertEqual((report["seen"], report["created"]), (ENVELOPES, ENVELOPES))
+        self.assertFalse(report["error"])
+
+        report = self.synchronizer._sync_configuration(self.config, full_resync=True)
+        self.assertEqual((report["seen"], report["created"]), (ENVELOPES, 0))
+        self.assertEqual(
+            self.env["dehu.notification"].search_count(
+                [("configuration_id", "=", self.config.id)]
+            ),
+            ENVELOPES,
+        )
+
+    def test_fetch_prepares_notification_values(self):
+        self.synchronizer._sync_configuration(self.config, full_resync=True)
+        notification = self.env["dehu.notification"].search(
+            [("dehu_id", "=", self.lema.envelope_id(0))]
+        )
+        self.assertEqual(notification.origin_code, 1)
+        self.assertEqual(notification.status, "pending")
+        self.assertEqual(notification.holder_nif, self.lema.holder_nif)
+        self.assertEqual(
+            notification.available_date,
+            self.lema.envelope_date(0).replace(tzinfo=None),
+        )
+
+    def test_create_new_notifications_skips_repeated_envelopes(self):
+        notifications = self._localiza_all()
+        self.assertEqual(len(notifications), ENVELOPES)
+        created = self.synchronizer._create_new_notifications(
+            notifications + notifications[:10], self.config
+        )
+        self.assertEqual(len(created), ENVELOPES)
+        created = self.synchronizer._create_new_notifications(
+            notifications, self.config
+        )
+        self.assertFalse(created)
+
+    def test_create_new_notifications_single_lookup(self):
+        notifications = self._localiza_all()
+        self.synchronizer._create_new_notifications(notifications[:60], self.config)
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.env.cr.sql_log_count
+        created = self.synchronizer._create_new_notifications(
+            notifications, self.config
+        )
+        self.env.flush_all()
+        self.assertEqual(len(created), 60)
+        # La consulta de claves y el alta no dependen del número de envíos
+        self.assertLess(self.env.cr.sql_log_count - queries, 30)
+
+    @mute_logger("odoo.sql_db")
+    def test_notification_key_is_unique(self):
+        vals = {"dehu_id": "DUPLICATED", "origin_code": 1, "status": "pending"}
+        self.env["dehu.notification"].create(vals)
+        with self.assertRaises(IntegrityError), self.env.cr.savepoint():
+            self.env["dehu.notification"].create(vals)
+            self.env.flush_all()
+
+    def test_claim_takes_pending_notifications_by_deadline(self):
+        now = datetime.now()
+        vals = {"origin_code": 1, "processing_queued": True, "notification_type": "2"}
+        late, _accepted, urgent = self.env["dehu.notification"].create(
+            [
+                dict(vals, dehu_id="Q-1", status="pending", available_date=now),
+                dict(vals, dehu_id="Q-2", status="accepted", available_date=now),
+                dict(
+                    vals,
+                    dehu_id="Q-3",
+                    status="pending",
+                    available_date=now - timedelta(days=5),
+                ),
+            ]
+        )
+        claimed = self.synchronizer._claim_queue_batch(
+            [("dehu_id", "in", ["Q-1", "Q-2", "Q-3"])], 10
+        )
+        self.assertEqual(claimed.ids, [urgent.id, late.id])
+
+    def test_batches_are_not_committed_in_tests(self):
+        def forbidden():
+            raise AssertionError("the test transaction must not be ended")
+
+        self.patch(self.env.cr, "commit", forbidden)
+        self.patch(self.env.cr, "rollback", forbidden)
+        report = self.synchronizer._sync_configuration(self.config, full_resync=True)
+        self.assertFalse(report["error"])
+
+
+@tagged("post_install", "-at_install")
+class TestSyncWindows(DehuLemaCase):
+    lema_options = {"envelopes": 200, "page_size": 20}
+
+    def _sync_recording_windows(self, **kwargs):
+        """Sincroniza y devuelve las ventanas consultadas con su total."""
+        windows = []
+        synchronizer_class = type(self.synchronizer)
+        localiza = synchronizer_class._localiza
+
+        def recording_localiza(synchronizer, client, config, date_from, date_to, **kw):
+            notifications, total = localiza(
+                synchronizer, client, config, date_from, date_to, **kw
+            )
+            windows.append((date_from, date_to, total))
+            return notifications, total
+
+        with patch.object(synchronizer_class, "_localiza", recording_localiza):
+            report = self.synchronizer._sync_configuration(self.config, **kwargs)
+        return report, windows
+
+    def test_localiza_reads_every_page(self):
+        self.config.sync_window_max_envelopes = 0
+        report, windows = self._sync_recording_windows(full_resync=True)
+        self.assertEqual(report["created"], 200)
+        self.assertEqual(len(windows), 1)
+        self.assertEqual(self.lema.calls["localiza"], 10)
+
+    def test_window_is_halved_when_too_many_envelopes(self):
+        self.config.sync_window_max_envelopes = 50
+        report, windows = self._sync_recording_windows(full_resync=True)
+        self.assertFalse(report["error"])
+        self.assertEqual(report["created"], 200)
+
+        processed = [window for window in windows if window[2] < 50]
+        self.assertGreater(len(windows), len(processed))
+        self.assertGreater(len(processed), 4)
+        # Las ventanas procesadas cubren el rango sin huecos
+        for previous, window in zip(processed, processed[1:]):
+            self.assertEqual(previous[1], window[0])
+        self.assertEqual(self.config.last_sync_date, processed[-1][1])
+
+    def test_failed_window_resumes_from_last_committed_window(self):
+        self.config.write({"sync_window_hours": 24, "sync_window_max_envelopes": 0})
+        # Una sola página por ventana: el cuarto localiza() es la cuarta ventana
+        self.patch(self.lema, "page_size", 50)
+        self.lema.inject("ok", "ok", "ok", "fault:1201")
+        with mute_logger("odoo.addons.dehu_notifications.models.dehu_synchronizer"):
+            report, windows = self._sync_recording_windows(full_resync=True)
+        self.assertIn("1201", report["error"])
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(self.config.last_sync_date, windows[-1][1])
+        committed = self.env["dehu.notification"].search_count(
+            [("configuration_id", "=", self.config.id)]
+        )
+        self.assertEqual(committed, report["created"])
+
+        resumed_from = self.config.last_sync_date - timedelta(
+            minutes=self.config.sync_overlap_minutes
+        )
+        report, windows = self._sync_recording_windows()
+        self.assertFalse(report["error"])
+        self.assertEqual(windows[0][0], resumed_from)
+        self.assertEqual(
+            self.env["dehu.notification"].search_count(
+                [("configuration_id", "=", self.config.id)]
+            ),
+            200,
+        )
+
+
+class TestTransientErrors(BaseCase):
+    def test_network_errors_are_transient(self):
+        self.assertTrue(_is_transient_error(requests.ConnectionError()))
+        self.assertTrue(_is_transient_error(requests.Timeout()))
+
+    def test_http_status(self):
+        for status in (408, 429, 500, 502, 503, 504):
+            self.assertTrue(_is_transient_error(DehuTransportError("Error", status)))
+        for status in (None, 400, 401, 403, 404):
+            self.assertFalse(_is_transient_error(DehuTransportError("Error", status)))
+
+    def test_soap_fault_codes(self):
+        for code in ("3005", "3006", "4304", "4306"):
+            fault = DehuSoapFault(f"{code} Ha superado el límite de peticiones")
+            self.assertEqual(fault.code, code)
+            self.assertTrue(_is_transient_error(fault))
+        for message in ("4303 Límite diario", "1201 Valor NIF no válido", "Error"):
+            self.assertFalse(_is_transient_error(DehuSoapFault(message)))
+        self.assertIsNone(DehuSoapFault("Error interno").code)
+
+    def test_other_errors_are_permanent(self):
+        self.assertFalse(_is_transient_error(ValueError("3005")))
+        self.assertFalse(_is_transient_error(UserError("Error")))
+
+
+class TestCircuitBreaker(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.patch(dehu_synchronizer, "CIRCUIT_FAILURE_THRESHOLD", 3)
+        self.breaker = CircuitBreaker()
+
+    def _fail(self, times):
+        for _i in range(times):
+            self.breaker.before_call("endpoint")
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self._fail(3)
+        with self.assertRaises(DehuCircuitOpenError):
+            self.breaker.before_call("endpoint")
+
+    def test_success_resets_failures(self):
+        self._fail(2)
+        self.breaker.record_success()
+        self._fail(2)
+        self.breaker.before_call("endpoint")
+
+    def test_half_open_probe(self):
+        self._fail(3)
+        self.patch(dehu_synchronizer, "CIRCUIT_RESET_TIMEOUT", 0)
+        # Pasado el tiempo de espera se deja pasar una llamada de prueba...
+        self.breaker.before_call("endpoint")
+        # ...y si falla el circuito vuelve a abrirse
+        self.breaker.record_failure()
+        self.patch(dehu_synchronizer, "CIRCUIT_RESET_TIMEOUT", 60)
+        with self.assertRaises(DehuCircuitOpenError):
+            self.breaker.before_call("endpoint")
+
+    def test_half_open_success_closes(self):
+        self._fail(3)
+        self.patch(dehu_synchronizer, "CIRCUIT_RESET_TIMEOUT", 0)
+        self.breaker.before_call("endpoint")
+        self.breaker.record_success()
+        self.patch(dehu_synchronizer, "CIRCUIT_RESET_TIMEOUT", 60)
+        self._fail(2)
+        self.breaker.before_call("endpoint")
+
+
+@tagged("post_install", "-at_install")
+class TestCallResilience(DehuLemaCase):
+    """Reintentos y cortacircuitos frente a un servicio que inyecta fallos."""
+
+    lema_options = {"envelopes": 1, "annexes": 1}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.synchronizer.fetch_pending_notifications(full_resync=True)
+        cls.notification = cls.env["dehu.notification"].search(
+            [("configuration_id", "=", cls.config.id)]
+        )
+
+    def _call_receipt(self):
+        client = self.synchronizer._get_dehu_client(self.config)
+        return self.synchronizer._call_dehu(
+            client,
+            self.config.wsdl_url,
+            "consultaAcusePdf",
+            nifReceptor=self.lema.holder_nif,
+            Identificador=self.notification.dehu_id,
+            codigoOrigen=self.notification.origin_code,
+            identificadorAcusePdf={"csvResguardo": "CSV"},
+        )
+
+    def test_transient_failures_are_retried(self):
+        self.lema.inject("fault:3005", "http:503", "drop")
+        response = self._call_receipt()
+        self.assertEqual(response.codigoRespuesta, "200")
+        self.assertEqual(self.lema.calls["consultaAcusePdf"], 4)
+
+    def test_permanent_fault_is_not_retried(self):
+        self.lema.inject("fault:4303")
+        with self.assertRaises(DehuSoapFault) as error:
+            self._call_receipt()
+        self.assertEqual(error.exception.code, "4303")
+        self.assertEqual(self.lema.calls["consultaAcusePdf"], 1)
+
+    def test_retries_are_bounded(self):
+        self.lema.inject(*["http:503"] * dehu_synchronizer.MAX_CALL_ATTEMPTS)
+        with self.assertRaises(DehuTransportError):
+            self._call_receipt()
+        self.assertEqual(
+            self.lema.calls["consultaAcusePdf"], dehu_synchronizer.MAX_CALL_ATTEMPTS
+        )
+
+    def test_circuit_breaker_stops_calls(self):
+        self.patch(dehu_synchronizer, "CIRCUIT_FAILURE_THRESHOLD", 2)
+        self.lema.inject("http:503", "http:503")
+        with self.assertRaises(DehuCircuitOpenError):
+            self._call_receipt()
+        with self.assertRaises(DehuCircuitOpenError):
+            self._call_receipt()
+        self.assertEqual(self.lema.calls["consultaAcusePdf"], 2)
+
+    @mute_logger("odoo.addons.dehu_notifications.models.dehu_synchronizer")
+    def test_failed_annex_is_retried_later(self):
+        self.lema.inject("ok", *["http:503"] * dehu_synchronizer.MAX_CALL_ATTEMPTS)
+        self.synchronizer.process_notification(self.notification)
+        attachment = self.notification.attachment_ids
+        self.assertEqual(self.notification.status, "accepted")
+        self.assertEqual(attachment.download_state, "failed")
+        self.assertEqual(attachment.download_attempts, 1)
+
+        self.synchronizer.retry_failed_attachments()
+        self.assertEqual(attachment.download_state, "done")
+        self.assertEqual(attachment.download_attempts, 2)
+        self.assertEqual(
+            attachment.content_hash,
+            hashlib.sha256(base64.b64decode(attachment.content)).hexdigest(),
+        )
+
+
+@tagged("post_install", "-at_install")
+class TestCallResilienceZeep(TestCallResilience):
+    transport = "zeep"
+
+
+@tagged("post_install", "-at_install")
+class TestStoredContents(DehuLemaCase):
+    """Los contenidos descargados se guardan completos en el filestore."""
+
+    lema_options = {"envelopes": 1, "annexes": 1, "document_size": 300000}
+    storage = "file"
+
+    def setUp(self):
+        super().setUp()
+        self.env["ir.config_parameter"].sudo().set_param(
+            "ir_attachment.location", self.storage
+        )
+        self.synchronizer.fetch_pending_notifications(full_resync=True)
+        self.notification = self.env["dehu.notification"].search(
+            [("configuration_id", "=", self.config.id)]
+        )
+        self.synchronizer.process_notification(self.notification)
+        self.attachment = self.notification.attachment_ids
+        self.document = self.lema.payload(self.lema.document_size, "document", 0).read()
+        self.annex = self.lema.payload(
+            self.lema.annex_size, "annex", self.attachment.reference
+        ).read()
+
+    def _assert_contents(self):
+        self.assertEqual(
+            base64.b64decode(self.notification.document_content), self.document
+        )
+        self.assertEqual(base64.b64decode(self.attachment.content), self.annex)
+
+    def test_downloaded_contents_are_stored(self):
+        self._assert_contents()
+        self.assertEqual(
+            self.notification.document_hash, hashlib.sha256(self.document).hexdigest()
+        )
+        self.assertEqual(
+            self.attachment.content_hash, hashlib.sha256(self.annex).hexdigest()
+        )
+
+    def test_empty_payload_is_not_stored(self):
+        self.assertFalse(
+            self.synchronizer._store_payload(
+                self.notification, "document_content", SpooledPayload()
+            )
+        )
+        self.assertFalse(self.notification.document_content)
+
+    def test_archived_contents_are_rehydrated(self):
+        freed = self.notification._archive_contents()
+        self.assertEqual(freed, len(self.document) + len(self.annex))
+        self.assertEqual(self.notification.storage_tier, "cold")
+        self.assertFalse(self.notification.document_content)
+        self.assertFalse(self.attachment.content)
+
+        self.notification.action_rehydrate()
+        self.assertEqual(self.notification.storage_tier, "hot")
+        self._assert_contents()
+        self.assertFalse(
+            self.env["dehu.archive.blob"].search(
+                [("notification_id", "=", self.notification.id)]
+            )
+        )
+
+
+@tagged("post_install", "-at_install")
+class TestStoredContentsDb(TestStoredContents):
+    storage = "db"
+
+
+@tagged("post_install", "-at_install")
+class TestEmptyDocument(DehuLemaCase):
+    lema_options = {"envelopes": 1, "document_size": 0}
+
+    def test_empty_document_has_no_hash(self):
+        self.synchronizer.fetch_pending_notifications(full_resync=True)
+        notification = self.env["dehu.notification"].search(
+            [("configuration_id", "=", self.config.id)]
+        )
+        self.synchronizer.process_notification(notification)
+        self.assertEqual(notification.status, "accepted")
+        self.assertFalse(notification.document_content)
+        self.assertFalse(notification.document_hash)
@@ -0,0 +1,249 @@
+"""Tests de los transportes SOAP y del análisis de las respuestas LEMA."""
+
+import base64
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import requests
+from lxml import etree
+from odoo.tests.common import BaseCase
+
+from ..models.dehu_transport import (
+    SPOOL_MAX_MEMORY,
+    LxmlTransport,
+    SpooledPayload,
+    ZeepTransport,
+    _split_multipart,
+    _to_object,
+)
+from .common import LemaRequestsMixin
+from .fake_lema import FakeLemaService
+
+BOUNDARY = "uuid:0b1c2d3e"
+CONTENT_TYPE = (
+    f'multipart/related; type="application/xop+xml"; boundary="{BOUNDARY}"; '
+    'start="<root@test>"; start-info="text/xml"'
+)
+ROOT_XML = b'<?xml version="1.0"?><root><contenido/></root>'
+
+
+def _multipart(*parts):
+    """Construye un cuerpo MTOM con el XML raíz y las partes dadas."""
+    body = (
+        f"--{BOUNDARY}\r\n"
+        'Content-Type: application/xop+xml; type="text/xml"\r\n'
+        "Content-ID: <root@test>\r\n\r\n"
+    ).encode() + ROOT_XML
+    for content_id, content, encoding in parts:
+        body += (
+            f"\r\n--{BOUNDARY}\r\n"
+            "Content-Type: application/octet-stream\r\n"
+            f"Content-Transfer-Encoding: {encoding}\r\n"
+            f"Content-ID: <{content_id}>\r\n\r\n"
+        ).encode()
+        body += base64.encodebytes(content) if encoding == "base64" else content
+    return body + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _chunks(data, size):
+    return [data[offset : offset + size] for offset in range(0, len(data), size)]
+
+
+def _element(xml):
+    return etree.fromstring(xml)
+
+
+class TestSplitMultipart(BaseCase):
+    def setUp(self):
+        super().setUp()
+        # El contenido incluye CRLF y guiones para probar los delimitadores
+        self.binary = (b"\r\n--" + bytes(range(256))) * 64
+        self.body = _multipart(
+            ("doc@test", self.binary, "binary"),
+            ("b64@test", self.binary, "base64"),
+        )
+
+    def test_parts_are_split_for_any_chunk_size(self):
+        for size in (1, 3, 7, 64, 1000, len(self.body)):
+            with self.subTest(size=size):
+                root, parts = _split_multipart(CONTENT_TYPE, _chunks(self.body, size))
+                self.assertEqual(root, ROOT_XML)
+                self.assertEqual(set(parts), {"doc@test", "b64@test"})
+                for payload in parts.values():
+                    self.assertEqual(payload.read(), self.binary)
+                    self.assertEqual(
+                        payload.sha256, hashlib.sha256(self.binary).hexdigest()
+                    )
+                    self.assertEqual(payload.size, len(self.binary))
+
+    def test_large_part_is_spooled_to_disk(self):
+        content = b"x" * (SPOOL_MAX_MEMORY + 1)
+        _root, parts = _split_multipart(
+            CONTENT_TYPE, _chunks(_multipart(("doc@test", content, "binary")), 65536)
+        )
+        self.assertTrue(parts["doc@test"].file._rolled)
+        self.assertEqual(parts["doc@test"].size, len(content))
+
+    def test_invalid_multipart(self):
+        with self.assertRaisesRegex(ValueError, "without boundary"):
+            _split_multipart("multipart/related", [self.body])
+        with self.assertRaisesRegex(ValueError, "Truncated"):
+            _split_multipart(CONTENT_TYPE, [self.body[:-30]])
+
+
+class TestToObject(BaseCase):
+    def test_values(self):
+        response = _to_object(
+            _element(
+                b"<r xmlns:x='urn:x'>"
+                b"<codigoRespuesta> 200 </codigoRespuesta>"
+                b"<fechaPuestaDisposicion>2021-02-22T11:45:30+01:00"
+                b"</fechaPuestaDisposicion>"
+                b"<organismoEmisor><nombreOrganismo>AEAT</nombreOrganismo>"
+                b"</organismoEmisor>"
+                b"<opcion tipo='dehu.paginador.totalPag' x:other='1'>3</opcion>"
+                b"<opcion tipo='dehu.paginador.paginaActual'>1</opcion>"
+                b"<descripcion/>"
+                b"</r>"
+            ),
+            {},
+        )
+        self.assertEqual(response.codigoRespuesta, "200")
+        self.assertEqual(
+            response.fechaPuestaDisposicion,
+            datetime(2021, 2, 22, 11, 45, 30, tzinfo=timezone(timedelta(hours=1))),
+        )
+        self.assertEqual(response.organismoEmisor.nombreOrganismo, "AEAT")
+        self.assertEqual(
+            [(option.tipo, option._value_1) for option in response.opcion],
+            [("dehu.paginador.totalPag", "3"), ("dehu.paginador.paginaActual", "1")],
+        )
+        self.assertIsNone(response.descripcion)
+
+    def test_missing_elements(self):
+        response = _to_object(
+            _element(b"<r><codigoRespuesta>200</codigoRespuesta></r>"), {}
+        )
+        self.assertIsNone(response.hayMasResultados)
+        self.assertEqual(response.item, [])
+        self.assertFalse(hasattr(response, "__missing__"))
+
+    def test_repeated_elements_are_lists(self):
+        response = _to_object(
+            _element(b"<envios><item><identificador>1</identificador></item></envios>"),
+            {},
+        )
+        self.assertEqual([item.identificador for item in response.item], ["1"])
+
+    def test_binary_contents(self):
+        payload = SpooledPayload(b"pdf")
+        response = _to_object(
+            _element(
+                b"<documento xmlns:xop='http://www.w3.org/2004/08/xop/include'>"
+                b"<contenido><xop:Include href='cid:doc%40test'/></contenido>"
+                b"</documento>"
+            ),
+            {"doc@test": payload},
+        )
+        self.assertIs(response.contenido, payload)
+        response = _to_object(
+            _element(b"<documento><contenido>cGRm</contenido></documento>"), {}
+        )
+        self.assertEqual(response.contenido, b"pdf")
+        response = _to_object(
+            _element(b"<documento><contenido href='cid:doc@test'/></documento>"),
+            {"doc@test": payload},
+        )
+        self.assertIs(response.contenido, payload)
+
+
+class TestTransportParity(LemaRequestsMixin, BaseCase):
+    """El transporte lxml devuelve lo mismo que zeep con el mismo WSDL."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.lema = FakeLemaService(envelopes=60, annexes=2, document_size=4096)
+        cls.lema.start()
+        cls.addClassCleanup(cls.lema.stop)
+
+    def setUp(self):
+        super().setUp()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.transports = {
+            "lxml": LxmlTransport(
+                self.lema.wsdl_url, "test", requests.Session(), (5, 30)
+            ),
+            "zeep": ZeepTransport(
+                self.lema.wsdl_url,
+                "test",
+                requests.Session(),
+                5,
+                (5, 30),
+                os.path.join(cache_dir.name, "wsdl.db"),
+            ),
+        }
+        for transport in self.transports.values():
+            self.addCleanup(transport.close)
+
+    def _call(self, operation, **params):
+        return {
+            name: transport.call(operation, **params)
+            for name, transport in self.transports.items()
+        }
+
+    def test_localiza(self):
+        now = datetime.now(timezone.utc)
+        responses = self._call(
+            "localiza",
+            nifTitular=self.lema.holder_nif,
+            fechaDesde=(now - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%S"),
+            fechaHasta=now.strftime("%Y-%m-%dT%H:%M:%S"),
+            opcionesLocaliza={
+                "opcion": [{"tipo": "dehu.paginador.pagina", "_value_1": "2"}]
+            },
+        )
+        lxml, zeep = responses["lxml"], responses["zeep"]
+        self.assertEqual(lxml.hayMasResultados, zeep.hayMasResultados)
+        self.assertEqual(
+            [
+                (option.tipo, option._value_1)
+                for option in lxml.opcionesRespuestaLocaliza.opcion
+            ],
+            [
+                (option.tipo, option._value_1)
+                for option in zeep.opcionesRespuestaLocaliza.opcion
+            ],
+        )
+        self.assertEqual(len(lxml.envios.item), 10)
+        for lxml_item, zeep_item in zip(lxml.envios.item, zeep.envios.item):
+            for field in ("identificador", "codigoOrigen", "fechaPuestaDisposicion"):
+                self.assertEqual(getattr(lxml_item, field), getattr(zeep_item, field))
+            self.assertEqual(lxml_item.titular.nifTitular, zeep_item.titular.nifTitular)
+
+    def test_peticion_acceso(self):
+        responses = self._call(
+            "peticionAcceso",
+            identificador=self.lema.envelope_id(0),
+            codigoOrigen="1",
+            nifReceptor=self.lema.holder_nif,
+            nombreReceptor="Empresa de pruebas",
+            evento="1",
+            concepto="Notificación",
+        )
+        lxml, zeep = responses["lxml"], responses["zeep"]
+        self.assertEqual(lxml.documento.nombre, zeep.documento.nombre)
+        self.assertEqual(lxml.documento.contenido.read(), zeep.documento.contenido)
+        self.assertEqual(
+            [
+                anexo.referenciaDocumento
+                for anexo in lxml.anexos.anexosReferencia.anexoReferencia
+            ],
+            [
+                anexo.referenciaDocumento
+                for anexo in zeep.anexos.anexosReferencia.anexoReferencia
+            ],
+        )
@@ -0,0 +1,203 @@
+"""Tests de la ingesta de notificaciones por webhook."""
+
+import json
+from collections import OrderedDict
+from unittest.mock import patch
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase, HttpCase, TransactionCase
+from odoo.tools import mute_logger
+
+from ..models import dehu_webhook_batch
+from ..models.dehu_notification import STATUS_RANK
+from ..models.dehu_webhook_batch import _delivery_cache_add, _delivery_cache_hit
+
+
+def _webhook_item(identifier, status="pending", date="2026-10-01T10:00:00+02:00"):
+    return {
+        "identificador": identifier,
+        "codigoOrigen": "1",
+        "concepto": f"Notificación {identifier}",
+        "tipoEnvio": "2",
+        "fechaPuestaDisposicion": date,
+        "estado": status,
+        "titular": {"nifTitular": "B00000000"},
+    }
+
+
+@tagged("post_install", "-at_install")
+class TestWebhookUpsert(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.notification_model = cls.env["dehu.notification"]
+
+    def _upsert(self, *items):
+        return self.notification_model._upsert_from_webhook(list(items))
+
+    def _get(self, identifier):
+        return self.notification_model.search([("dehu_id", "=", identifier)])
+
+    def test_status_rank_is_monotonic(self):
+        self.assertEqual(STATUS_RANK["pending"], min(STATUS_RANK.values()))
+        self.assertEqual(STATUS_RANK["read"], max(STATUS_RANK.values()))
+        for status in ("accepted", "rejected", "expired"):
+            self.assertLess(STATUS_RANK["pending"], STATUS_RANK[status])
+            self.assertLess(STATUS_RANK[status], STATUS_RANK["read"])
+
+    def test_create_stores_utc_date(self):
+        created = self._upsert(_webhook_item("WH-1"))
+        self.assertEqual(len(created), 1)
+        self.assertEqual(str(created.available_date), "2026-10-01 08:00:00")
+        self.assertEqual(created.status, "pending")
+
+    def test_status_advances(self):
+        self._upsert(_webhook_item("WH-1"))
+        self.assertFalse(self._upsert(_webhook_item("WH-1", "accepted")))
+        self.assertEqual(self._get("WH-1").status, "accepted")
+        self._upsert(_webhook_item("WH-1", "read"))
+        self.assertEqual(self._get("WH-1").status, "read")
+
+    def test_out_of_order_retry_does_not_regress_status(self):
+        self._upsert(_webhook_item("WH-1", "read"))
+        self._upsert(_webhook_item("WH-1", "accepted"))
+        self._upsert(_webhook_item("WH-1", "pending"))
+        self.assertEqual(self._get("WH-1").status, "read")
+
+    def test_same_rank_status_is_applied(self):
+        self._upsert(_webhook_item("WH-1", "accepted"))
+        self._upsert(_webhook_item("WH-1", "rejected"))
+        self.assertEqual(self._get("WH-1").status, "rejected")
+
+    @mute_logger("odoo.addons.dehu_notifications.models.dehu_notification")
+    def test_unknown_status_is_ignored(self):
+        self._upsert(_webhook_item("WH-1", "accepted"))
+        self._upsert(_webhook_item("WH-1", "archived"))
+        self.assertEqual(self._get("WH-1").status, "accepted")
+
+    def test_unchanged_item_is_not_written(self):
+        notification = self._upsert(_webhook_item("WH-1", "accepted"))
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE dehu_notification SET write_date = '2000-01-01' WHERE id = %s",
+            [notification.id],
+        )
+        self.env.invalidate_all()
+        self._upsert(_webhook_item("WH-1", "accepted"))
+        self.env.flush_all()
+        self.env.invalidate_all()
+        self.assertEqual(str(notification.write_date), "2000-01-01 00:00:00")
+
+    def test_repeated_items_in_batch_create_one_notification(self):
+        created = self._upsert(_webhook_item("WH-1"), _webhook_item("WH-1"))
+        self.assertEqual(len(created), 1)
+
+
+@tagged("post_install", "-at_install")
+class TestWebhookDelivery(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.patch(dehu_webhook_batch, "_delivery_cache", OrderedDict())
+        self.batch_model = self.env["dehu.webhook.batch"]
+
+    def test_repeated_delivery_is_discarded(self):
+        items = [_webhook_item("WH-1")]
+        batch = self.batch_model._enqueue(items, delivery_id="D-1")
+        self.assertTrue(batch)
+        self.assertFalse(self.batch_model._enqueue(items, delivery_id="D-1"))
+        self.assertTrue(self.batch_model._enqueue(items, delivery_id="D-2"))
+
+    def test_payload_hash_identifies_delivery_without_id(self):
+        batch = self.batch_model._enqueue([_webhook_item("WH-1")])
+        self.assertTrue(batch.delivery_key.startswith("sha256:"))
+        self.assertFalse(self.batch_model._enqueue([_webhook_item("WH-1")]))
+        self.assertTrue(self.batch_model._enqueue([_webhook_item("WH-1", "read")]))
+
+    def test_pending_batches_are_applied(self):
+        self.batch_model._enqueue([_webhook_item("WH-1"), _webhook_item("WH-2")])
+        self.batch_model._process_pending_batches()
+        self.assertEqual(
+            self.env["dehu.notification"].search_count(
+                [("dehu_id", "in", ["WH-1", "WH-2"])]
+            ),
+            2,
+        )
+        self.assertFalse(self.batch_model.search([("state", "=", "pending")]))
+
+    @mute_logger("odoo.addons.dehu_notifications.models.dehu_webhook_batch")
+    def test_failed_batch_is_retried_then_released(self):
+        items = [_webhook_item("WH-1")]
+        batch = self.batch_model._enqueue(items, delivery_id="D-1")
+
+        def failing_upsert(*args, **kwargs):
+            raise ValueError("error")
+
+        notification_class = type(self.env["dehu.notification"])
+        with patch.object(notification_class, "_upsert_from_webhook", failing_upsert):
+            for attempt in range(1, dehu_webhook_batch.MAX_BATCH_ATTEMPTS):
+                self.batch_model._process_pending_batches()
+                self.assertEqual((batch.state, batch.attempts), ("pending", attempt))
+            self.batch_model._process_pending_batches()
+        self.assertEqual(batch.state, "error")
+        self.assertFalse(batch.delivery_key)
+        # El reenvío del emisor ya no se descarta como repetido
+        self.assertTrue(self.batch_model._enqueue(items, delivery_id="D-1"))
+
+        batch.action_retry()
+        self.assertEqual((batch.state, batch.attempts), ("pending", 0))
+        self.batch_model._process_pending_batches()
+        self.assertEqual(batch.state, "done")
+
+
+@tagged("post_install", "-at_install")
+class TestWebhookEndpoint(HttpCase):
+    def setUp(self):
+        super().setUp()
+        self.patch(dehu_webhook_batch, "_delivery_cache", OrderedDict())
+
+    def _post(self, body, delivery_id="D-1"):
+        return self.url_open(
+            "/dehu/notification/update",
+            data=body if isinstance(body, str) else json.dumps(body),
+            headers={"Content-Type": "application/json", "X-Delivery-Id": delivery_id},
+        )
+
+    def test_http_status(self):
+        body = {"notifications": [_webhook_item("WH-1")]}
+        response = self._post(body)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "accepted")
+        response = self._post(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "duplicate")
+
+    def test_invalid_payload(self):
+        self.assertEqual(self._post("not json").status_code, 400)
+        self.assertEqual(
+            self._post({"notifications": [{"estado": "read"}]}).status_code, 400
+        )
+
+
+class TestDeliveryCache(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.patch(dehu_webhook_batch, "_delivery_cache", OrderedDict())
+
+    def test_cache_hit_after_add(self):
+        self.assertFalse(_delivery_cache_hit(("db", "key")))
+        _delivery_cache_add(("db", "key"))
+        self.assertTrue(_delivery_cache_hit(("db", "key")))
+        self.assertFalse(_delivery_cache_hit(("other_db", "key")))
+
+    def test_cache_entries_expire(self):
+        _delivery_cache_add(("db", "key"))
+        self.patch(dehu_webhook_batch, "DELIVERY_CACHE_TTL", 0)
+        self.assertFalse(_delivery_cache_hit(("db", "key")))
+        self.assertNotIn(("db", "key"), dehu_webhook_batch._delivery_cache)
+
+    def test_cache_is_bounded(self):
+        self.patch(dehu_webhook_batch, "DELIVERY_CACHE_SIZE", 2)
+        for key in ("a", "b", "c"):
+            _delivery_cache_add(("db", key))
+        self.assertFalse(_delivery_cache_hit(("db", "a")))
+        self.assertTrue(_delivery_cache_hit(("db", "c")))